@@ -1,15 +1,19 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse
 import uvicorn
 import logging
 from contextlib import asynccontextmanager
 import os
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
+# Embedding lookups run in parallel on the embedding pool, so keep BLAS to one core per worker
+os.environ.setdefault("OMP_NUM_THREADS", "1")
+
 from routes import nutrition, ai, snacks, ingredients
 from services.nutrition_service import NutritionService
-from services.ai_service import AIService
+from services.ai_service import DEFAULT_OPENAI_MODEL, AIService
 from models.health_scorer import HealthScorer
 from models.ingredient_embeddings import IngredientEmbeddings
 
@@ -39,6 +43,7 @@ async def lifespan(app: FastAPI):
     nutrition_service = NutritionService(health_scorer)
     ai_service = AIService(
         openai_api_key=os.getenv("OPENAI_API_KEY"),
+        openai_model=os.getenv("OPENAI_MODEL", DEFAULT_OPENAI_MODEL),
         nutrition_service=nutrition_service,
         embeddings=ingredient_embeddings
     )
@@ -47,11 +52,18 @@ async def lifespan(app: FastAPI):
     app.state.ai_service = ai_service
     app.state.health_scorer = health_scorer
     app.state.ingredient_embeddings = ingredient_embeddings
+    app.state.ingredient_insights = ingredients.build_ingredient_insights(ingredient_embeddings)
+    app.state.embedding_pool = ThreadPoolExecutor(
+        max_workers=int(os.getenv("EMBEDDING_CONCURRENCY", os.cpu_count() or 1)),
+        thread_name_prefix="embeddings"
+    )
 
     logger.info("All services initialized successfully")
     yield
 
     logger.info("Shutting down services...")
+    app.state.embedding_pool.shutdown(wait=False)
+    await ai_service.aclose()
 
 
 app = FastAPI(
@@ -60,6 +72,7 @@ app = FastAPI(
     version="1.0.0",
     docs_url="/docs",
     redoc_url="/redoc",
+    default_response_class=ORJSONResponse,
     lifespan=lifespan
 )
 
@@ -2,22 +2,70 @@
 import numpy as np
 import pandas as pd
 import json
+import functools
+import heapq
+import operator
 import os
 import logging
+import threading
 from typing import Dict, List, Tuple, Optional, Any
 import asyncio
+from collections import Counter, OrderedDict
 from concurrent.futures import ThreadPoolExecutor
 
+from models.similarity import prefer_numba, topk_cosine
+
 logger = logging.getLogger(__name__)
 
+NUTRIENT_KEYS = (
+    "calories_per_100g", "protein_g", "total_fat_g", "saturated_fat_g", "carbohydrates_g", "sugars_g",
+    "fiber_g", "sodium_mg", "potassium_mg", "vitamin_c_mg", "calcium_mg", "iron_mg"
+)
+
+_SUBSTITUTION_CACHE_SIZE = 1024
+_RECIPE_PROFILE_CACHE_SIZE = 1024
+
 
 class IngredientEmbeddings:
     def __init__(self):
         self.model = None
         self.embeddings: Optional[np.ndarray] = None
+        self.normalized_embeddings: Optional[np.ndarray] = None
         self.ingredient_index: Dict[str, int] = {}
         self.ingredients: List[str] = []
         self.ingredient_data: Dict[str, Dict[str, Any]] = {}
+        self.sorted_ingredients: List[Dict[str, Any]] = []
+        self.ingredients_by_category: Dict[str, List[Dict[str, Any]]] = {}
+        self.sorted_ingredients_detailed: List[Dict[str, Any]] = []
+        self.ingredients_by_category_detailed: Dict[str, List[Dict[str, Any]]] = {}
+        self.category_counts: Dict[str, int] = {}
+        self.allergens_by_ingredient: Dict[str, frozenset] = {}
+        self.flavors_by_ingredient: Dict[str, frozenset] = {}
+        # One bit per flavor token so profiles can be combined and tested with integer ops
+        self.flavor_bits: Dict[str, int] = {}
+        self.flavor_masks_by_ingredient: Dict[str, int] = {}
+        self.use_numba = False
+        # Struct-of-arrays view of per-ingredient attributes, one row per ingredient plus a
+        # trailing row of defaults that unknown names resolve to
+        self.attribute_rows: Dict[str, int] = {}
+        self.missing_row = 0
+        self.nutrient_column: Dict[str, int] = {key: col for col, key in enumerate(NUTRIENT_KEYS)}
+        self.nutrition_matrix = np.zeros((1, len(NUTRIENT_KEYS)))
+        self.protein_g = self.nutrition_matrix[:, self.nutrient_column["protein_g"]]
+        self.calories_per_100g = self.nutrition_matrix[:, self.nutrient_column["calories_per_100g"]]
+        self.categories: List[Optional[str]] = [None]
+        self.category_codes = np.full(1, -1, dtype=np.int32)
+        self.category_code_by_name: Dict[Optional[str], int] = {}
+        self.textures: List[Optional[str]] = [None]
+        self.flavor_sets: List[frozenset] = [frozenset()]
+        # Substitutions keyed on (name, restrictions, top_n); only valid for the currently loaded embeddings
+        self._substitution_cache: "OrderedDict[Tuple, List[Dict[str, Any]]]" = OrderedDict()
+        # Lookups run on the embedding pool, so cache bookkeeping is serialized
+        self._substitution_cache_lock = threading.Lock()
+        # Combined (flavor mask, allergens) of ingredient sets keyed on their sorted names; same lifetime
+        self._recipe_profile_cache: "OrderedDict[Tuple[str, ...], Tuple[int, frozenset]]" = OrderedDict()
+        self._recipe_profile_cache_lock = threading.Lock()
+        self._flavor_pair_masks: Dict[Tuple[Tuple[str, str], ...], Tuple[Tuple[int, int, Tuple[str, str]], ...]] = {}
         self.embeddings_path = "data/models/ingredient_embeddings.npy"
         self.index_path = "data/models/ingredient_index.json"
         self.data_path = "data/ingredients.json"
@@ -44,6 +92,96 @@ class IngredientEmbeddings:
             self.ingredient_data = self._generate_minimal_database()
             await self._create_simple_embeddings()
 
+        self._build_lookup_tables()
+
+    def _build_lookup_tables(self):
+        """Precompute read-only views of the ingredient data used by listing endpoints"""
+        self.sorted_ingredients = []
+        self.ingredients_by_category = {}
+        self.sorted_ingredients_detailed = []
+        self.ingredients_by_category_detailed = {}
+        self.category_counts = dict(Counter(data.get("category", "unknown") for data in self.ingredient_data.values()))
+        self.allergens_by_ingredient = {
+            name: frozenset(data.get("allergens", [])) for name, data in self.ingredient_data.items()
+        }
+        self.flavors_by_ingredient = {
+            name: frozenset(data.get("flavor_profile", [])) for name, data in self.ingredient_data.items()
+        }
+        self.flavor_bits = {
+            flavor: 1 << bit
+            for bit, flavor in enumerate(sorted(frozenset().union(*self.flavors_by_ingredient.values())))
+        }
+        self.flavor_masks_by_ingredient = {
+            name: sum(self.flavor_bits[flavor] for flavor in flavors)
+            for name, flavors in self.flavors_by_ingredient.items()
+        }
+
+        if self.embeddings is not None:
+            norms = np.linalg.norm(self.embeddings, axis=1, keepdims=True)
+            self.normalized_embeddings = self.embeddings / np.maximum(norms, 1e-12)
+            self.use_numba = prefer_numba(self.normalized_embeddings)
+            logger.info(f"Using {'Numba' if self.use_numba else 'NumPy'} similarity kernel")
+
+        for name in sorted(self.ingredient_data):
+            data = self.ingredient_data[name]
+            summary = {
+                "name": name,
+                "category": data.get("category"),
+                "description": data.get("description"),
+                "flavor_profile": data.get("flavor_profile", []),
+                "texture": data.get("texture"),
+                "color": data.get("color"),
+                "allergens": data.get("allergens", [])
+            }
+            detailed = {
+                **summary,
+                "nutrition": data.get("nutrition", {}),
+                "properties": data.get("properties", {})
+            }
+            self.sorted_ingredients.append(summary)
+            self.sorted_ingredients_detailed.append(detailed)
+            self.ingredients_by_category.setdefault(data.get("category"), []).append(summary)
+            self.ingredients_by_category_detailed.setdefault(data.get("category"), []).append(detailed)
+
+        self._build_attribute_arrays()
+
+        with self._substitution_cache_lock:
+            self._substitution_cache.clear()
+        with self._recipe_profile_cache_lock:
+            self._recipe_profile_cache.clear()
+        self._flavor_pair_masks = {}
+
+    def _build_attribute_arrays(self):
+        names = list(self.ingredient_data)
+        records = [self.ingredient_data[name] for name in names]
+        nutrition = [data.get("nutrition", {}) for data in records]
+
+        self.attribute_rows = {name: row for row, name in enumerate(names)}
+        self.missing_row = len(names)
+
+        self.nutrition_matrix = np.array(
+            [[n.get(key, 0) for key in NUTRIENT_KEYS] for n in nutrition] + [[0] * len(NUTRIENT_KEYS)],
+            dtype=np.float64
+        )
+        self.protein_g = self.nutrition_matrix[:, self.nutrient_column["protein_g"]]
+        self.calories_per_100g = self.nutrition_matrix[:, self.nutrient_column["calories_per_100g"]]
+
+        self.categories = [data.get("category") for data in records] + [None]
+        self.category_code_by_name = {
+            category: code for code, category in enumerate(dict.fromkeys(self.categories[:-1]))
+        }
+        # The default row gets its own code so it never matches a real category
+        self.category_codes = np.array(
+            [self.category_code_by_name[category] for category in self.categories[:-1]] + [-1], dtype=np.int32
+        )
+
+        self.textures = [data.get("texture") for data in records] + [None]
+        self.flavor_sets = [self.flavors_by_ingredient[name] for name in names] + [frozenset()]
+
+    def attribute_row(self, ingredient_name: str) -> int:
+        """Row of an ingredient in the attribute arrays, or the default row if unknown"""
+        return self.attribute_rows.get(ingredient_name, self.missing_row)
+
     async def _load_ingredient_data(self):
         try:
             with open(self.data_path, 'r', encoding='utf-8') as f:
@@ -319,67 +457,206 @@ class IngredientEmbeddings:
             },
         }
 
-        async def _save_ingredient_data(self):
-            """Save ingredient data to JSON file"""
-            try:
-                os.makedirs(os.path.dirname(self.data_path), exist_ok=True)
-                with open(self.data_path, "w", encoding="utf-8") as f:
-                    json.dump(self.ingredient_data, f, indent=4)
-            except Exception as e:
-                logger.error(f"Error saving ingredient data: {str(e)}")
+    async def _save_ingredient_data(self):
+        """Save ingredient data to JSON file"""
+        try:
+            os.makedirs(os.path.dirname(self.data_path), exist_ok=True)
+            with open(self.data_path, "w", encoding="utf-8") as f:
+                json.dump(self.ingredient_data, f, indent=4)
+        except Exception as e:
+            logger.error(f"Error saving ingredient data: {str(e)}")
 
-        async def _save_embeddings(self):
-            try:
-                os.makedirs(os.path.dirname(self.embeddings_path), exist_ok=True)
-                np.save(self.embeddings_path, self.embeddings)
-                with open(self.index_path, "w", encoding="utf-8") as f:
-                    json.dump(self.ingredient_index, f)
-            except Exception as e:
-                logger.error(f"Error saving embeddings: {str(e)}")
-
-        def get_embedding(self, ingredient_name: str) -> Optional[np.ndarray]:
-            if self.embeddings is not None and ingredient_name in self.ingredient_index:
-                idx = self.ingredient_index[ingredient_name]
-                return self.embeddings[idx]
-            return None
-
-        def suggest_substitutions(
-                self,
-                ingredient_name: str,
-                dietary_restrictions: List[str] = [],
-                top_n: int = 5,
-        ) -> List[Dict[str, Any]]:
-            if self.embeddings is None:
-                return []
-
-            ingredient_embedding = self.get_embedding(ingredient_name)
-            if ingredient_embedding is None:
-                return []
-
-            similarities = np.dot(self.embeddings, ingredient_embedding) / (
-                    np.linalg.norm(self.embeddings, axis=1)
-                    * np.linalg.norm(ingredient_embedding)
+    async def _save_embeddings(self):
+        try:
+            os.makedirs(os.path.dirname(self.embeddings_path), exist_ok=True)
+            np.save(self.embeddings_path, self.embeddings)
+            with open(self.index_path, "w", encoding="utf-8") as f:
+                json.dump(self.ingredient_index, f)
+        except Exception as e:
+            logger.error(f"Error saving embeddings: {str(e)}")
+
+    def get_embedding(self, ingredient_name: str) -> Optional[np.ndarray]:
+        """Return the unit-normalized embedding for an ingredient"""
+        if self.normalized_embeddings is not None and ingredient_name in self.ingredient_index:
+            idx = self.ingredient_index[ingredient_name]
+            return self.normalized_embeddings[idx]
+        return None
+
+    def similarity_to(self, ingredient_name: str, other_ingredients: List[str]) -> np.ndarray:
+        """Cosine similarity between one ingredient and each of the others in a single matrix product"""
+        similarities = np.zeros(len(other_ingredients), dtype=np.float32)
+
+        ingredient_embedding = self.get_embedding(ingredient_name)
+        if ingredient_embedding is None:
+            return similarities
+
+        rows = [
+            (i, self.ingredient_index[name]) for i, name in enumerate(other_ingredients)
+            if name in self.ingredient_index
+        ]
+        if rows:
+            positions, indices = zip(*rows)
+            similarities[list(positions)] = self.normalized_embeddings[list(indices)] @ ingredient_embedding
+
+        return similarities
+
+    def batch_similar(self, ingredient_names: List[str], top_k: int = 5) -> Dict[str, List[Tuple[str, float]]]:
+        """Top-k similar ingredients for several ingredients from one similarity matrix"""
+        results: Dict[str, List[Tuple[str, float]]] = {name: [] for name in ingredient_names}
+        if self.normalized_embeddings is None:
+            return results
+
+        known = [name for name in results if name in self.ingredient_index]
+        if not known:
+            return results
+
+        row_indices = [self.ingredient_index[name] for name in known]
+        similarities = self.normalized_embeddings[row_indices] @ self.normalized_embeddings.T
+        similarities[np.arange(len(known)), row_indices] = -np.inf
+
+        k = min(top_k, len(self.ingredients) - 1)
+        if k <= 0:
+            return results
+
+        top_indices = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+        for name, row, candidates in zip(known, similarities, top_indices):
+            ordered = candidates[np.argsort(-row[candidates])]
+            results[name] = [(self.ingredients[idx], float(row[idx])) for idx in ordered]
+
+        return results
+
+    def get_ingredient_data(self, ingredient_name: str) -> Optional[Dict[str, Any]]:
+        return self.ingredient_data.get(ingredient_name)
+
+    def recipe_profile(self, ingredient_names: Tuple[str, ...]) -> Tuple[int, frozenset]:
+        """Union of the flavor masks and of the allergens of known ingredients"""
+        with self._recipe_profile_cache_lock:
+            profile = self._recipe_profile_cache.get(ingredient_names)
+            if profile is not None:
+                self._recipe_profile_cache.move_to_end(ingredient_names)
+
+        if profile is None:
+            profile = (
+                functools.reduce(
+                    operator.or_, (self.flavor_masks_by_ingredient[name] for name in ingredient_names), 0
+                ),
+                frozenset().union(*(self.allergens_by_ingredient[name] for name in ingredient_names))
+            )
+            with self._recipe_profile_cache_lock:
+                self._recipe_profile_cache[ingredient_names] = profile
+                if len(self._recipe_profile_cache) > _RECIPE_PROFILE_CACHE_SIZE:
+                    self._recipe_profile_cache.popitem(last=False)
+
+        return profile
+
+    def flavor_pair_masks(self, pairs: Tuple[Tuple[str, str], ...]) -> Tuple[Tuple[int, int, Tuple[str, str]], ...]:
+        """(first flavor bit, second flavor bit, pair) for both orders of every flavor pair"""
+        masks = self._flavor_pair_masks.get(pairs)
+        if masks is None:
+            masks = []
+            for flavor_a, flavor_b in pairs:
+                bit_a = self.flavor_bits.get(flavor_a, 0)
+                bit_b = self.flavor_bits.get(flavor_b, 0)
+                masks.append((bit_a, bit_b, (flavor_a, flavor_b)))
+                masks.append((bit_b, bit_a, (flavor_b, flavor_a)))
+            masks = self._flavor_pair_masks[pairs] = tuple(masks)
+        return masks
+
+    def suggest_substitutions(
+            self,
+            ingredient_name: str,
+            dietary_restrictions: List[str] = [],
+            top_n: int = 5,
+    ) -> List[Dict[str, Any]]:
+        # Restrictions are only checked for overlap, so their order does not matter
+        key = (ingredient_name, frozenset(dietary_restrictions or ()), top_n)
+
+        with self._substitution_cache_lock:
+            suggestions = self._substitution_cache.get(key)
+            if suggestions is not None:
+                self._substitution_cache.move_to_end(key)
+
+        if suggestions is None:
+            suggestions = self._compute_substitutions(ingredient_name, dietary_restrictions, top_n)
+            with self._substitution_cache_lock:
+                self._substitution_cache[key] = suggestions
+                if len(self._substitution_cache) > _SUBSTITUTION_CACHE_SIZE:
+                    self._substitution_cache.popitem(last=False)
+
+        # Callers extend the suggestion dicts, so never hand out the cached ones
+        return [dict(suggestion) for suggestion in suggestions]
+
+    def _compute_substitutions(self, ingredient_name: str, dietary_restrictions: List[str],
+                               top_n: int) -> List[Dict[str, Any]]:
+        if self.embeddings is None:
+            return []
+
+        ingredient_embedding = self.get_embedding(ingredient_name)
+        if ingredient_embedding is None:
+            return []
+
+        similarities = self.normalized_embeddings @ ingredient_embedding
+        similar_indices = np.argsort(similarities)[::-1][1: top_n * 2]
+
+        suggestions = []
+        for idx in similar_indices:
+            if len(suggestions) >= top_n:
+                break
+
+            sub_name = self.ingredients[idx]
+
+            if dietary_restrictions:
+                allergens = self.allergens_by_ingredient.get(sub_name, frozenset())
+                if not allergens.isdisjoint(dietary_restrictions):
+                    continue
+
+            suggestions.append(
+                {
+                    "name": sub_name,
+                    "similarity": float(similarities[idx]),
+                    "reason": f"Similar nutritional profile to {ingredient_name}",
+                }
             )
-            similar_indices = np.argsort(similarities)[::-1][1: top_n * 2]
-
-            suggestions = []
-            for idx in similar_indices:
-                if len(suggestions) >= top_n:
-                    break
-
-                sub_name = self.ingredients[idx]
-                sub_data = self.ingredient_data.get(sub_name, {})
-
-                if dietary_restrictions:
-                    allergens = sub_data.get("allergens", [])
-                    if any(restriction in allergens for restriction in dietary_restrictions):
-                        continue
-
-                suggestions.append(
-                    {
-                        "name": sub_name,
-                        "similarity": similarities[idx],
-                        "reason": f"Similar nutritional profile to {ingredient_name}",
-                    }
-                )
-            return suggestions
\ No newline at end of file
+        return suggestions
+
+    def find_similar_ingredients(self, ingredient_name: str, top_k: int = 5) -> List[Tuple[str, float]]:
+        if self.embeddings is None:
+            return []
+
+        ingredient_embedding = self.get_embedding(ingredient_name)
+        if ingredient_embedding is None:
+            return []
+
+        indices, scores = topk_cosine(
+            self.normalized_embeddings, ingredient_embedding, top_k,
+            exclude=self.ingredient_index[ingredient_name], use_numba=self.use_numba
+        )
+        return [(self.ingredients[idx], score) for idx, score in zip(indices.tolist(), scores.tolist())]
+
+    def search_ingredients(self, query: str, top_k: int = 10) -> List[Tuple[str, float]]:
+        query_terms = query.lower().replace("_", " ").split()
+        if not query_terms:
+            return []
+
+        results = []
+        for name in self.ingredients:
+            data = self.ingredient_data.get(name, {})
+            readable_name = name.replace("_", " ")
+            searchable_text = " ".join([
+                readable_name,
+                data.get("category", "").replace("_", " "),
+                data.get("description", ""),
+                " ".join(data.get("flavor_profile", []))
+            ]).lower()
+
+            matched_terms = sum(1 for term in query_terms if term in searchable_text)
+            if not matched_terms:
+                continue
+
+            score = matched_terms / len(query_terms)
+            if any(term in readable_name for term in query_terms):
+                score = min(1.0, score + 0.5)
+
+            results.append((name, score))
+
+        return heapq.nlargest(top_k, results, key=lambda x: x[1])
@@ -0,0 +1,175 @@
+# backend/models/similarity.py
+import logging
+import time
+from typing import Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+try:
+    from numba import njit
+    numba_available = True
+except ImportError:
+    numba_available = False
+
+
+if numba_available:
+    # Single-threaded on purpose: requests already fan out over the embedding pool,
+    # so a parallel kernel would only oversubscribe cores
+    @njit(fastmath=True, cache=True)
+    def _cosine_scores_numba(embeddings, query):
+        n_rows, n_dims = embeddings.shape
+        scores = np.empty(n_rows, dtype=embeddings.dtype)
+        for i in range(n_rows):
+            acc = 0.0
+            for j in range(n_dims):
+                acc += embeddings[i, j] * query[j]
+            scores[i] = acc
+        return scores
+
+
+    @njit(fastmath=True, cache=True)
+    def _cosine_matrix_numba(a, b):
+        norms_b = np.sqrt((b * b).sum(axis=1))
+        out = np.zeros((a.shape[0], b.shape[0]))
+        for i in range(a.shape[0]):
+            norm_a = np.sqrt((a[i] * a[i]).sum())
+            if norm_a == 0.0:
+                continue
+            for j in range(b.shape[0]):
+                if norms_b[j] == 0.0:
+                    continue
+                acc = 0.0
+                for k in range(a.shape[1]):
+                    acc += a[i, k] * b[j, k]
+                out[i, j] = acc / (norm_a * norms_b[j])
+        return out
+
+
+    @njit(fastmath=True, cache=True)
+    def _best_match_numba(embeddings, query):
+        # Fused dot product and running max, without the score array NumPy materializes;
+        # accumulating in the matrix dtype keeps float32 rows in float32 SIMD lanes
+        zero = np.zeros(1, dtype=embeddings.dtype)[0]
+        best_row = -1
+        best_score = -np.inf
+        for i in range(embeddings.shape[0]):
+            acc = zero
+            for j in range(embeddings.shape[1]):
+                acc += embeddings[i, j] * query[j]
+            if acc > best_score:
+                best_row = i
+                best_score = acc
+        return best_row, best_score
+
+
+    @njit(cache=True)
+    def _popcount64(x):
+        x = x - ((x >> np.uint64(1)) & np.uint64(0x5555555555555555))
+        x = (x & np.uint64(0x3333333333333333)) + ((x >> np.uint64(2)) & np.uint64(0x3333333333333333))
+        x = (x + (x >> np.uint64(4))) & np.uint64(0x0F0F0F0F0F0F0F0F)
+        return (x * np.uint64(0x0101010101010101)) >> np.uint64(56)
+
+
+    @njit(cache=True)
+    def _jaccard_bits_numba(bits, row):
+        n_rows, n_words = bits.shape
+        scores = np.zeros(n_rows)
+        for i in range(n_rows):
+            shared = 0
+            union = 0
+            for w in range(n_words):
+                shared += _popcount64(bits[i, w] & bits[row, w])
+                union += _popcount64(bits[i, w] | bits[row, w])
+            if union > 0:
+                scores[i] = shared / union
+        return scores
+
+
+# Below this many pairs the NumPy version wins over the Numba call overhead
+NUMBA_MIN_PAIRS = 256
+
+
+def cosine_scores(embeddings: np.ndarray, query: np.ndarray, use_numba: bool = False) -> np.ndarray:
+    """Dot product of each unit-normalized row with a unit-normalized query"""
+    if use_numba and numba_available:
+        return _cosine_scores_numba(embeddings, query.astype(embeddings.dtype, copy=False))
+    return embeddings @ query
+
+
+def cosine_matrix(a: np.ndarray, b: np.ndarray, use_numba: Optional[bool] = None) -> np.ndarray:
+    """Pairwise cosine similarity between the rows of two matrices, zero for all-zero rows"""
+    a = np.ascontiguousarray(a, dtype=np.float64)
+    b = np.ascontiguousarray(b, dtype=np.float64)
+    if use_numba is None:
+        use_numba = a.shape[0] * b.shape[0] >= NUMBA_MIN_PAIRS
+    if use_numba and numba_available:
+        return _cosine_matrix_numba(a, b)
+
+    norms_a = np.linalg.norm(a, axis=1)
+    norms_b = np.linalg.norm(b, axis=1)
+    return (a @ b.T) / np.outer(np.maximum(norms_a, 1e-12), np.maximum(norms_b, 1e-12))
+
+
+def best_match(embeddings: np.ndarray, query: np.ndarray, use_numba: bool = True) -> Tuple[int, float]:
+    """Row of a unit-normalized matrix most similar to a unit-normalized query and its score, (-1, -inf) if empty"""
+    # The fused loop matches BLAS on large matrices and skips its call overhead on small ones
+    if use_numba and numba_available:
+        row, score = _best_match_numba(embeddings, query.astype(embeddings.dtype, copy=False))
+        return int(row), float(score)
+
+    if len(embeddings) == 0:
+        return -1, float("-inf")
+    scores = embeddings @ query
+    row = int(np.argmax(scores))
+    return row, float(scores[row])
+
+
+def jaccard_scores(bits: np.ndarray, row: int, use_numba: bool = True) -> np.ndarray:
+    """Jaccard similarity of every row of a uint64 set bitmap against one of its rows, zero for two empty sets"""
+    # Unlike cosine, the compiled popcount loop beats the temporaries NumPy allocates at every size
+    if use_numba and numba_available:
+        return _jaccard_bits_numba(bits, row)
+
+    shared = np.bitwise_count(bits & bits[row]).sum(axis=1, dtype=np.int64)
+    union = np.bitwise_count(bits | bits[row]).sum(axis=1, dtype=np.int64)
+    return np.divide(shared, union, out=np.zeros(len(bits)), where=union > 0)
+
+
+def topk_cosine(embeddings: np.ndarray, query: np.ndarray, k: int, exclude: Optional[int] = None,
+                use_numba: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+    """Indices and scores of the k rows most similar to the query, best first"""
+    scores = cosine_scores(embeddings, query, use_numba)
+    if exclude is not None:
+        scores[exclude] = -np.inf
+
+    k = min(k, len(scores) - (exclude is not None))
+    if k <= 0:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=scores.dtype)
+
+    candidates = np.argpartition(-scores, k - 1)[:k]
+    order = candidates[np.argsort(-scores[candidates], kind="stable")]
+    return order, scores[order]
+
+
+def prefer_numba(embeddings: np.ndarray, repeats: int = 20) -> bool:
+    """Time both kernels on the loaded matrix and report whether Numba is faster"""
+    if not numba_available or embeddings is None or len(embeddings) == 0:
+        return False
+
+    query = embeddings[0]
+    try:
+        cosine_scores(embeddings, query, use_numba=True)  # compile outside the timing
+    except Exception as e:
+        logger.warning(f"Numba similarity kernel unavailable: {str(e)}")
+        return False
+
+    timings = {}
+    for use_numba in (False, True):
+        start = time.perf_counter()
+        for _ in range(repeats):
+            cosine_scores(embeddings, query, use_numba)
+        timings[use_numba] = time.perf_counter() - start
+
+    return timings[True] < timings[False]
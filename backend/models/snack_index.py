@@ -0,0 +1,381 @@
+import bisect
+import itertools
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+
+from models.similarity import jaccard_scores
+
+# Sortable views of a snack: sort field -> (record key, default when missing)
+ORDER_FIELDS = {
+    "created_date": ("created_date", ""),
+    "health_score": ("health_score", 0),
+    "rating": ("rating_average", 0),
+    "name": ("name", "")
+}
+
+# Numeric record fields mirrored into NumPy columns for vectorized scans
+_SCALAR_FIELDS = ("health_score", "prep_time_minutes", "rating_average", "rating_count")
+# Per-100g nutrients dietary limits can apply to, mirrored as "<nutrient>_per_100g" columns
+PER_100G_FIELDS = ("carbohydrates_g", "sugars_g")
+_COLUMN_FIELDS = _SCALAR_FIELDS + tuple(f"{nutrient}_per_100g" for nutrient in PER_100G_FIELDS)
+# Set-valued fields also kept as bitmaps, for similarity scoring and dietary filtering
+_BITMAP_KINDS = ("ingredients", "tags", "allergens")
+
+
+class _IndexEntry:
+    """What one snack was indexed under"""
+
+    __slots__ = ("sequence", "creator", "created_us", "ingredients", "tags", "masks", "order_values", "scalars")
+
+    def __init__(self, sequence: int, creator: Optional[str], created_us: int, ingredients: frozenset,
+                 tags: frozenset, masks: Dict[str, int], order_values: Dict[str, Any], scalars: Dict[str, float]):
+        self.sequence = sequence
+        self.creator = creator
+        self.created_us = created_us
+        self.ingredients = ingredients
+        self.tags = tags
+        # _BITMAP_KINDS kind -> int with the bit of each of the snack's values set
+        self.masks = masks
+        self.order_values = order_values
+        self.scalars = scalars
+
+
+class SnackIndex:
+    """Secondary indexes over the saved snack records, kept in step with the record store"""
+
+    def __init__(self):
+        self.by_ingredient: Dict[str, Set[str]] = defaultdict(set)
+        self.by_tag: Dict[str, Set[str]] = defaultdict(set)
+        self.by_creator: Dict[str, Set[str]] = defaultdict(set)
+        # Per sort field, (value, insertion sequence, snack_id) kept sorted; the sequence keeps
+        # save order among equal values
+        self.orders: Dict[str, List[Tuple[Any, int, str]]] = {field: [] for field in ORDER_FIELDS}
+        # Lowercased name, description and tags per snack for free-text search; NUL keeps a
+        # query from matching across two fields
+        self.search_text: Dict[str, str] = {}
+        self._sequence = itertools.count()
+        # What each snack was indexed under, since records are updated in place before reindexing
+        self._entries: Dict[str, _IndexEntry] = {}
+        # Bitmap kind -> value -> bit position, assigned on first sight and never reused, so each
+        # snack's masks are computed once when it is indexed
+        self._bit_positions: Dict[str, Dict[str, int]] = {kind: {} for kind in _BITMAP_KINDS}
+        # Save-ordered snack ids with one NumPy column per scalar field, and one uint64 bitmap row
+        # per snack for each bitmap kind; both rebuilt on first use after any change
+        self._columns: Optional[Tuple[List[str], Dict[str, np.ndarray]]] = None
+        self._bitmaps: Optional[Dict[str, np.ndarray]] = None
+        # Every snack's search text in save order as one string, with each snack's start offset
+        self._search_corpus: Optional[Tuple[str, List[int], List[str]]] = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, snack: Dict[str, Any]):
+        """Index a new snack, or reindex one whose record changed"""
+        snack_id = snack["id"]
+        previous = self._entries.get(snack_id)
+
+        # Everything derived from the record is computed before the old entry is dropped, so a
+        # record that cannot be indexed leaves the index as it was
+        creator = snack.get("created_by")
+        # Creation time parsed once, as datetime64 microseconds, so trending never parses dates;
+        # created_date cannot be updated, so a reindex keeps the parsed value
+        if previous is not None:
+            created_us = previous.created_us
+        else:
+            created_at = datetime.fromisoformat(snack["created_date"].replace('Z', '+00:00'))
+            created_us = int(np.datetime64(created_at, "us").astype(np.int64))
+        ingredients = frozenset(ing["name"] for ing in snack.get("ingredients") or () if "name" in ing)
+        tags = frozenset(snack.get("tags") or ())
+        allergens = frozenset((snack.get("nutrition_analysis") or {}).get("allergens") or ())
+        masks = {
+            kind: self._mask(kind, values)
+            for kind, values in (("ingredients", ingredients), ("tags", tags), ("allergens", allergens))
+        }
+        order_values = {
+            field: _order_value(snack.get(key), default) for field, (key, default) in ORDER_FIELDS.items()
+        }
+        search_text = "\0".join((
+            (snack.get("name") or "").lower(),
+            (snack.get("description") or "").lower(),
+            " ".join(snack.get("tags") or ()).lower()
+        ))
+        scalars = _scalar_values(snack)
+
+        if previous is not None:
+            self.remove(snack_id)
+        sequence = previous.sequence if previous is not None else next(self._sequence)
+
+        if creator is not None:
+            self.by_creator[creator].add(snack_id)
+        for name in ingredients:
+            self.by_ingredient[name].add(snack_id)
+        for tag in tags:
+            self.by_tag[tag].add(snack_id)
+        for field, value in order_values.items():
+            bisect.insort(self.orders[field], (value, sequence, snack_id))
+
+        self.search_text[snack_id] = search_text
+        self._entries[snack_id] = _IndexEntry(
+            sequence, creator, created_us, ingredients, tags, masks, order_values, scalars
+        )
+        self._invalidate_arrays()
+
+    def remove(self, snack_id: str):
+        entry = self._entries.pop(snack_id, None)
+        if entry is None:
+            return
+
+        del self.search_text[snack_id]
+        self._invalidate_arrays()
+        if entry.creator is not None:
+            _discard(self.by_creator, entry.creator, snack_id)
+        for name in entry.ingredients:
+            _discard(self.by_ingredient, name, snack_id)
+        for tag in entry.tags:
+            _discard(self.by_tag, tag, snack_id)
+        for field, value in entry.order_values.items():
+            _remove_sorted(self.orders[field], (value, entry.sequence, snack_id))
+
+    def ingredients_of(self, snack_id: str) -> frozenset:
+        return self._entries[snack_id].ingredients
+
+    def tags_of(self, snack_id: str) -> frozenset:
+        return self._entries[snack_id].tags
+
+    def candidates(self, ingredients: Optional[Iterable[str]] = None, tags: Optional[Iterable[str]] = None,
+                   exclude_ingredients: Optional[Iterable[str]] = None) -> Optional[Set[str]]:
+        """Snack ids holding every ingredient and tag and none of the excluded ingredients,
+        or None when no set-based constraint was given"""
+        required = [self.by_ingredient.get(name) for name in ingredients or ()]
+        required += [self.by_tag.get(tag) for tag in tags or ()]
+        # Posting sets only exist for values some snack has, so one missing set means no match
+        if None in required:
+            return set()
+        excluded = [self.by_ingredient[name] for name in exclude_ingredients or () if name in self.by_ingredient]
+
+        if required:
+            # Smallest posting set first keeps every intersection step bounded by it
+            matches = set.intersection(*sorted(required, key=len))
+        elif exclude_ingredients:
+            matches = set(self._entries)
+        else:
+            return None
+
+        return matches.difference(*excluded) if excluded else matches
+
+    def ordered(self, field: str, descending: bool = False, snack_ids: Optional[Set[str]] = None) -> Iterator[str]:
+        """Snack ids sorted on an ORDER_FIELDS field, in save order among equal values either way,
+        matching a stable list.sort(reverse=descending) over the records in save order"""
+        # Sorting k ids costs about k log k; past the size of the whole index, filtering the
+        # presorted walk is cheaper and yields the same order
+        if snack_ids is not None and len(snack_ids) * len(snack_ids).bit_length() < len(self._entries):
+            entries = self._entries
+            in_save_order = sorted(snack_ids, key=lambda snack_id: entries[snack_id].sequence)
+            return iter(sorted(in_save_order, key=lambda snack_id: entries[snack_id].order_values[field],
+                               reverse=descending))
+
+        entries = self.orders[field]
+        walk = (snack_id for _, _, snack_id in entries) if not descending else _descending_stable(entries)
+        if snack_ids is not None:
+            return (snack_id for snack_id in walk if snack_id in snack_ids)
+        return walk
+
+    def scalar_matches(self, min_health_score: Optional[float] = None,
+                       max_prep_time: Optional[float] = None) -> Optional[Set[str]]:
+        """Snack ids passing the numeric search bounds, or None when no bound was given.
+        A snack without a prep time is never excluded by max_prep_time"""
+        if min_health_score is None and max_prep_time is None:
+            return None
+
+        snack_ids, columns = self._build_columns()
+        mask = np.ones(len(snack_ids), dtype=bool)
+        if min_health_score is not None:
+            mask &= columns["health_score"] >= min_health_score
+        if max_prep_time is not None:
+            mask &= ~(columns["prep_time_minutes"] > max_prep_time)
+        return {snack_ids[row] for row in np.flatnonzero(mask).tolist()}
+
+    def dietary_matches(self, is_forbidden: Callable[[str], bool], max_per_100g: Dict[str, float]) -> Set[str]:
+        """Snack ids with no allergen is_forbidden accepts and no PER_100G_FIELDS nutrient above its limit"""
+        snack_ids, columns = self._build_columns()
+        allergen_bits = self._build_bitmaps()["allergens"]
+
+        positions = self._bit_positions["allergens"]
+        forbidden = _bitmap([self._mask("allergens", filter(is_forbidden, positions))], len(positions))[0]
+        mask = ~(allergen_bits & forbidden).any(axis=1)
+        for nutrient, limit in max_per_100g.items():
+            mask &= ~(columns[f"{nutrient}_per_100g"] > limit)
+        return {snack_ids[row] for row in np.flatnonzero(mask).tolist()}
+
+    def text_matches(self, query: str, snack_ids: Optional[Set[str]] = None) -> Set[str]:
+        """Snack ids, out of snack_ids when given, whose name, description or tags contain
+        the already lowercased query"""
+        search_text = self.search_text
+        if snack_ids is not None or "\0" in query:
+            pool = search_text if snack_ids is None else snack_ids
+            return {snack_id for snack_id in pool if query in search_text[snack_id]}
+
+        # One substring scan over every snack's text, jumping to the next snack after each hit
+        corpus, starts, row_ids = self._build_search_corpus()
+        matches = set()
+        position = corpus.find(query) if row_ids else -1
+        while position != -1:
+            row = bisect.bisect_right(starts, position) - 1
+            matches.add(row_ids[row])
+            if row + 1 == len(starts):
+                break
+            position = corpus.find(query, starts[row + 1])
+        return matches
+
+    def trending(self, since: datetime, limit: int) -> List[Tuple[str, float]]:
+        """Snacks created at or after `since`, ranked by rating average * 20 + health score * 0.5
+        + rating count * 5, best first and in save order among equal scores"""
+        snack_ids, columns = self._build_columns()
+        recent = np.flatnonzero(columns["created_at"] >= np.datetime64(since))
+        scores = (
+            columns["rating_average"][recent] * 20
+            + columns["health_score"][recent] * 0.5
+            + columns["rating_count"][recent] * 5
+        )
+        rows, scores = _top_stable(recent, scores, limit)
+        return list(zip([snack_ids[row] for row in rows], scores))
+
+    def similar(self, snack_id: str, limit: int) -> List[Tuple[str, float]]:
+        """Most similar other snacks by ingredient Jaccard (50%), tag Jaccard (30%) and
+        health score closeness (20%), best first and in save order among equal scores"""
+        snack_ids, columns = self._build_columns()
+        bitmaps = self._build_bitmaps()
+        ingredient_bits, tag_bits = bitmaps["ingredients"], bitmaps["tags"]
+        health_scores = columns["health_score"]
+        row = snack_ids.index(snack_id)
+
+        scores = (
+            jaccard_scores(ingredient_bits, row) * 0.5
+            + jaccard_scores(tag_bits, row) * 0.3
+            + np.maximum(0, 1 - (np.abs(health_scores[row] - health_scores) / 100)) * 0.2
+        )
+        others = np.delete(np.arange(len(snack_ids)), row)
+        rows, scores = _top_stable(others, scores[others], limit)
+        return list(zip([snack_ids[i] for i in rows], scores))
+
+    def _invalidate_arrays(self):
+        self._columns = None
+        self._bitmaps = None
+        self._search_corpus = None
+
+    def _build_search_corpus(self) -> Tuple[str, List[int], List[str]]:
+        if self._search_corpus is None:
+            snack_ids, _ = self._build_columns()
+            texts = [self.search_text[snack_id] for snack_id in snack_ids]
+            starts = list(itertools.accumulate((len(text) + 1 for text in texts[:-1]), initial=0))
+            # NUL also separates snacks, so a query without one never matches across two of them
+            self._search_corpus = ("\0".join(texts), starts, snack_ids)
+        return self._search_corpus
+
+    def _build_columns(self) -> Tuple[List[str], Dict[str, np.ndarray]]:
+        if self._columns is None:
+            snack_ids = sorted(self._entries, key=lambda snack_id: self._entries[snack_id].sequence)
+            scalars = [self._entries[snack_id].scalars for snack_id in snack_ids]
+            columns = {
+                field: np.array([values[field] for values in scalars], dtype=np.float64)
+                for field in _COLUMN_FIELDS
+            }
+            columns["created_at"] = np.fromiter(
+                (self._entries[snack_id].created_us for snack_id in snack_ids), dtype=np.int64, count=len(snack_ids)
+            ).view("datetime64[us]")
+            self._columns = (snack_ids, columns)
+        return self._columns
+
+    def _mask(self, kind: str, values: Iterable[str]) -> int:
+        positions = self._bit_positions[kind]
+        mask = 0
+        for value in values:
+            mask |= 1 << positions.setdefault(value, len(positions))
+        return mask
+
+    def _build_bitmaps(self) -> Dict[str, np.ndarray]:
+        if self._bitmaps is None:
+            snack_ids, _ = self._build_columns()
+            entries = [self._entries[snack_id] for snack_id in snack_ids]
+            self._bitmaps = {
+                kind: _bitmap([entry.masks[kind] for entry in entries], len(self._bit_positions[kind]))
+                for kind in _BITMAP_KINDS
+            }
+        return self._bitmaps
+
+
+def _is_number(value: Any) -> bool:
+    # NaN is excluded because it compares false both ways and would break sorted order
+    return isinstance(value, (int, float)) and value == value
+
+
+def _order_value(value: Any, default: Any) -> Any:
+    """Sort key for a record value; anything not of the field's type sorts as the default, so all keys
+    of a field stay mutually comparable"""
+    if isinstance(default, str):
+        return value if isinstance(value, str) else default
+    return value if _is_number(value) else default
+
+
+def _scalar_values(snack: Dict[str, Any]) -> Dict[str, float]:
+    # A missing or non-numeric prep time becomes NaN, which no bound comparison matches
+    values = {field: snack.get(field, 0) for field in _SCALAR_FIELDS}
+    for field, value in values.items():
+        if not _is_number(value):
+            values[field] = np.nan if field == "prep_time_minutes" else 0
+
+    per_100g = (snack.get("nutrition_analysis") or {}).get("nutrition_per_100g") or {}
+    for nutrient in PER_100G_FIELDS:
+        value = per_100g.get(nutrient, 0)
+        values[f"{nutrient}_per_100g"] = value if _is_number(value) else 0
+    return values
+
+
+def _top_stable(rows: np.ndarray, scores: np.ndarray, limit: int) -> Tuple[List[int], List[float]]:
+    """The `limit` best rows by score, best first and in row order among equal scores"""
+    if limit <= 0 or len(rows) == 0:
+        return [], []
+
+    if limit < len(rows):
+        # Keep every row tied with the limit-th best so the stable sort can break ties by row order
+        threshold = np.partition(scores, len(rows) - limit)[len(rows) - limit]
+        keep = scores >= threshold
+        rows, scores = rows[keep], scores[keep]
+    best = np.argsort(-scores, kind="stable")[:limit]
+
+    return rows[best].tolist(), scores[best].tolist()
+
+
+def _bitmap(masks: List[int], n_bits: int) -> np.ndarray:
+    """Python int bit masks as rows of little-endian uint64 words"""
+    # At least one word per row so empty vocabularies still give a well-formed matrix
+    n_words = max(1, -(-n_bits // 64))
+    data = b"".join(mask.to_bytes(n_words * 8, "little") for mask in masks)
+    return np.frombuffer(data, dtype="<u8").astype(np.uint64).reshape(len(masks), n_words)
+
+
+def _descending_stable(entries: List[Tuple[Any, int, str]]) -> Iterator[str]:
+    # Walk runs of equal values from the top, each run front to back
+    end = len(entries)
+    while end > 0:
+        start = bisect.bisect_left(entries, (entries[end - 1][0],))
+        for _, _, snack_id in entries[start:end]:
+            yield snack_id
+        end = start
+
+
+def _discard(index: Dict[str, Set[str]], key: str, snack_id: str):
+    ids = index.get(key)
+    if ids is not None:
+        ids.discard(snack_id)
+        if not ids:
+            del index[key]
+
+
+def _remove_sorted(entries: List[Tuple], entry: Tuple):
+    position = bisect.bisect_left(entries, entry)
+    if position < len(entries) and entries[position] == entry:
+        del entries[position]
@@ -1,8 +1,11 @@
 from fastapi import APIRouter, HTTPException, Depends, Request
-from typing import List, Dict, Any, Optional
+from fastapi.responses import StreamingResponse
+from typing import List, Dict, Any, Optional, Tuple
 from pydantic import BaseModel, Field
 import logging
 import json
+import math
+import numpy as np
 
 logger = logging.getLogger(__name__)
 
@@ -99,23 +102,14 @@ async def improve_recipe(
         if not request.current_recipe:
             raise HTTPException(status_code=400, detail="Current recipe is required")
 
-        formatted_recipe = []
-        for ingredient in request.current_recipe:
-            if isinstance(ingredient, dict) and 'name' in ingredient and 'amount_g' in ingredient:
-                formatted_recipe.append({
-                    'name': str(ingredient['name']),
-                    'amount_g': float(ingredient['amount_g'])
-                })
-            else:
-                logger.warning(f"Invalid ingredient format: {ingredient}")
-                continue
-
-        if not formatted_recipe:
+        names, amounts = _recipe_arrays(request.current_recipe)
+
+        if not names:
             raise HTTPException(status_code=400, detail="No valid ingredients found in recipe")
 
         try:
             improvements = await ai_service.improve_snack_recipe(
-                formatted_recipe, request.improvement_goals
+                (names, amounts), request.improvement_goals
             )
         except Exception as e:
             logger.error(f"AI improvement error: {str(e)}")
@@ -130,7 +124,7 @@ async def improve_recipe(
             "success": True,
             "data": {
                 "improvements": improvements,
-                "original_recipe": formatted_recipe,
+                "original_recipe": _recipe_items(names, amounts),
                 "goals": request.improvement_goals,
                 "implementation_tips": _generate_implementation_tips(improvements)
             },
@@ -182,6 +176,28 @@ async def chat_with_nutritionist(
         raise HTTPException(status_code=500, detail=f"Chat response failed: {str(e)}")
 
 
+@router.post("/chat/stream")
+async def stream_chat_with_nutritionist(
+        request: ChatRequest,
+        ai_service=Depends(get_ai_service)
+):
+    try:
+        if not request.message or not request.message.strip():
+            raise HTTPException(status_code=400, detail="Message cannot be empty")
+
+        # Plain text as it is generated, so clients can render the first words without waiting for the rest
+        return StreamingResponse(
+            ai_service.stream_chat_about_nutrition(request.message, request.snack_context),
+            media_type="text/plain; charset=utf-8"
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Chat stream error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Chat response failed: {str(e)}")
+
+
 @router.post("/substitute")
 async def suggest_substitutions(
         request: IngredientSubstitutionRequest,
@@ -191,13 +207,7 @@ async def suggest_substitutions(
         if not request.ingredient_name or not request.ingredient_name.strip():
             raise HTTPException(status_code=400, detail="Ingredient name is required")
 
-        formatted_context = []
-        for item in request.recipe_context:
-            if isinstance(item, dict) and 'name' in item:
-                formatted_context.append({
-                    'name': str(item['name']),
-                    'amount_g': float(item.get('amount_g', 25))
-                })
+        formatted_context = _recipe_items(*_recipe_arrays(request.recipe_context, default_amount_g=25))
 
         try:
             substitutions = await ai_service.suggest_ingredient_substitutions(
@@ -289,6 +299,39 @@ async def get_available_goals():
     }
 
 
+def _recipe_arrays(items: List[Dict[str, Any]],
+                   default_amount_g: Optional[float] = None) -> Tuple[List[str], np.ndarray]:
+    """Names and amounts of the well-formed ingredients, in the (names, amounts) form the services take"""
+    names = []
+    amounts = []
+    for item in items:
+        amount = _amount_g(item.get('amount_g'), default_amount_g) if isinstance(item, dict) else None
+        if amount is not None and 'name' in item:
+            names.append(str(item['name']))
+            amounts.append(amount)
+        else:
+            logger.warning(f"Invalid ingredient format: {item}")
+
+    return names, np.array(amounts, dtype=np.float64)
+
+
+def _recipe_items(names: List[str], amounts: np.ndarray) -> List[Dict[str, Any]]:
+    return [{'name': name, 'amount_g': amount} for name, amount in zip(names, amounts.tolist())]
+
+
+def _amount_g(value: Any, default_amount_g: Optional[float]) -> Optional[float]:
+    """Finite gram amount of an ingredient, the default when it has none, or None when it is not a number"""
+    if value is None:
+        return default_amount_g
+    if isinstance(value, bool):
+        return None
+    try:
+        amount = float(value)
+    except (TypeError, ValueError):
+        return None
+    return amount if math.isfinite(amount) else None
+
+
 # Helper functions for fallback responses
 
 def _create_fallback_recommendation(preferences: Dict[str, Any], goals: List[str]) -> Dict[str, Any]:
@@ -489,11 +532,12 @@ def _generate_follow_up_suggestions(user_message: str, ai_response: str) -> List
 
 def _analyze_substitution_context(ingredient: str, recipe: List[Dict[str, Any]], reason: Optional[str]) -> Dict[
     str, Any]:
+    recipe_names = {ing["name"] for ing in recipe}
 
     analysis = {
         "recipe_size": len(recipe),
         "substitution_impact": "low" if len(recipe) > 5 else "medium",
-        "ingredient_role": "primary" if any(ing["name"] == ingredient for ing in recipe) else "secondary"
+        "ingredient_role": "primary" if ingredient in recipe_names else "secondary"
     }
 
     if reason:
@@ -1,11 +1,18 @@
 from fastapi import APIRouter, HTTPException, Depends, Request, Query
-from typing import List, Dict, Any, Optional
-from pydantic import BaseModel, Field
+from fastapi.responses import ORJSONResponse
+from typing import Callable, List, Dict, Any, Optional, Tuple
+from pydantic import BaseModel, ConfigDict, Field
+import asyncio
+import functools
+import operator
+import numpy as np
 import logging
 
+from utils.response_cache import cached_response
+
 logger = logging.getLogger(__name__)
 
-router = APIRouter()
+router = APIRouter(default_response_class=ORJSONResponse)
 
 
 class IngredientSearchRequest(BaseModel):
@@ -31,6 +38,12 @@ class SimilarIngredientsRequest(BaseModel):
     dietary_restrictions: List[str] = Field(default=[], description="Dietary restrictions to consider")
 
 
+class BatchIngredientRequest(BaseModel):
+    names: List[str] = Field(..., min_length=1, max_length=50, description="Ingredient names to look up")
+    include: List[str] = Field(default=["details", "similar"], description="Sections to include (details/similar)")
+    top_k: int = Field(5, ge=1, le=20, description="Number of similar ingredients per name")
+
+
 class SubstitutionRequest(BaseModel):
     ingredient_name: str = Field(..., description="Ingredient to substitute")
     dietary_restrictions: List[str] = Field(default=[], description="Dietary requirements")
@@ -38,15 +51,178 @@ class SubstitutionRequest(BaseModel):
     substitution_reason: Optional[str] = Field(default=None, description="Reason for substitution")
 
 
+class SimilarIngredient(BaseModel):
+    name: str
+    similarity: float
+    category: Optional[str] = None
+    description: Optional[str] = None
+
+
+class SubstitutionSuggestion(BaseModel):
+    name: str
+    similarity: float
+    reason: str
+
+
+class IngredientDetails(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    name: str
+    category: Optional[str] = None
+    description: Optional[str] = None
+    nutrition: Dict[str, Any]
+    properties: Dict[str, Any]
+    flavor_profile: List[str]
+    texture: Optional[str] = None
+    color: Optional[str] = None
+    allergens: List[str]
+    health_benefits: List[str]
+    usage_tips: List[str]
+    similar_ingredients: Optional[List[SimilarIngredient]] = None
+    substitutions: Optional[List[SubstitutionSuggestion]] = None
+
+
+class IngredientDetailsResponse(BaseModel):
+    success: bool
+    data: IngredientDetails
+    message: str
+
+
+class IngredientCompatibilityScore(BaseModel):
+    existing_ingredient: str
+    compatibility_score: float
+    compatibility_level: str
+
+
+class CompatibilityAnalysis(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    new_ingredient: str
+    existing_ingredients: List[str]
+    overall_compatibility: float
+    compatibility_level: str
+    individual_compatibility: List[IngredientCompatibilityScore]
+    flavor_conflicts: List[Tuple[str, str]]
+    allergen_additions: List[str]
+    recommendations: List[str]
+
+
+class CompatibilityResponse(BaseModel):
+    success: bool
+    data: CompatibilityAnalysis
+    message: str
+
+
+# Restriction -> which allergens it rules out; the same rules as the snack search's _DIETARY_RULES
+_RESTRICTION_ALLERGEN_RULES: Dict[str, Callable[[str], bool]] = {
+    "vegan": lambda allergen: allergen in ("milk", "eggs", "honey"),
+    "gluten_free": lambda allergen: allergen == "gluten",
+    "nut_free": lambda allergen: "nut" in allergen,
+    "dairy_free": lambda allergen: allergen == "milk",
+    "soy_free": lambda allergen: allergen == "soy"
+}
+
+
+KEY_NUTRIENTS = ("calories_per_100g", "protein_g", "total_fat_g", "carbohydrates_g",
+                 "sugars_g", "fiber_g", "sodium_mg", "potassium_mg", "calcium_mg", "iron_mg")
+
+_FLAVOR_CONFLICT_PAIRS = (
+    ("sweet", "bitter"),
+    ("mild", "intense"),
+    ("floral", "earthy")
+)
+
+# (original tag, substitute tag, message), checked in order; tags are substrings of ingredient names
+_SUBSTITUTION_RATIO_RULES = (
+    ("powder", "powder", "1:1 ratio"),
+    ("honey", "maple_syrup", "Use 3/4 amount of maple syrup"),
+    ("dates", "honey", "Use 1/2 the amount"),
+    ("dates", "maple", "Use 1/2 the amount")
+)
+_PREPARATION_NOTE_RULES = (
+    ("liquid", "powder", "May need to add extra liquid to maintain consistency"),
+    ("powder", "liquid", "May need to reduce other liquids slightly"),
+    ("nuts", "seeds", "Consider soaking seeds for softer texture")
+)
+
+_BRIEF_NUTRIENTS = ("protein_g", "calories_per_100g")
+_BRIEF_THRESHOLDS = np.array([1.5, 1.2])
+_BRIEF_LABELS = (
+    ("Higher protein content", "Lower protein content"),
+    ("Higher calorie density", "Lower calorie density")
+)
+
+_CATEGORY_DESCRIPTIONS = {
+    "nuts_seeds": "Nutrient-dense nuts and seeds, rich in healthy fats and protein",
+    "fruits": "Fresh and dried fruits providing natural sweetness and vitamins",
+    "chocolate": "Various forms of chocolate and cocoa products",
+    "grains": "Whole grains and cereals providing complex carbohydrates",
+    "protein": "Concentrated protein sources and supplements",
+    "sweeteners": "Natural and alternative sweetening options",
+    "coconut": "Coconut-derived products with unique nutritional profiles",
+    "spices": "Flavor enhancers with potential health benefits",
+    "flavorings": "Natural extracts and flavoring agents"
+}
+_DEFAULT_CATEGORY_DESCRIPTION = "Various ingredients in this category"
+
+# (section, field, default, compare, threshold, benefit)
+_HEALTH_BENEFIT_RULES = (
+    ("nutrition", "protein_g", 0, operator.gt, 10, "Supports muscle building and repair"),
+    ("nutrition", "fiber_g", 0, operator.gt, 5, "Promotes digestive health"),
+    ("properties", "antioxidant_score", 0, operator.gt, 60, "Provides antioxidant protection"),
+    ("nutrition", "potassium_mg", 0, operator.gt, 300, "Supports heart health"),
+    ("properties", "glycemic_index", 100, operator.lt, 35, "Helps maintain stable blood sugar")
+)
+
+_CATEGORY_USAGE_TIPS = {
+    "nuts_seeds": ("Soak overnight for easier blending", "Toast lightly to enhance flavor"),
+    "fruits": ("Combine with protein for balanced nutrition",),
+    "protein": ("Mix gradually to avoid clumping", "Combine with liquid ingredients first"),
+    "spices": ("Start with small amounts and adjust to taste", "Mix well to distribute evenly")
+}
+_TEXTURE_USAGE_TIPS = {
+    "powdery": "Sift to prevent lumps",
+    "sticky": "Wet hands when handling"
+}
+
+
 def get_ingredient_embeddings(request: Request):
     return request.app.state.ingredient_embeddings
 
 
+def get_ingredient_insights(request: Request):
+    """Dependency to get precomputed ingredient highlights, benefits and tips"""
+    return request.app.state.ingredient_insights
+
+
+def get_embedding_pool(request: Request):
+    """Dependency to get the thread pool reserved for embedding computations"""
+    return request.app.state.embedding_pool
+
+
+async def _run_embedding_task(pool, func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(pool, functools.partial(func, *args, **kwargs))
+
+
+def build_ingredient_insights(embeddings) -> Dict[str, Dict[str, List[str]]]:
+    """Precompute the static per-ingredient text shown by search and detail endpoints"""
+    return {
+        name: {
+            "highlights": _get_nutrition_highlights(data),
+            "benefits": _generate_health_benefits(data),
+            "tips": _generate_usage_tips(name, data)
+        }
+        for name, data in embeddings.ingredient_data.items()
+    }
+
+
 def get_nutrition_service(request: Request):
     return request.app.state.nutrition_service
 
 
 @router.get("/")
+@cached_response(expire=300)
 async def get_all_ingredients(
         category: Optional[str] = Query(None, description="Filter by category"),
         limit: int = Query(50, ge=1, le=200, description="Maximum ingredients to return"),
@@ -54,30 +230,14 @@ async def get_all_ingredients(
         embeddings=Depends(get_ingredient_embeddings)
 ):
     try:
-        all_ingredients = []
-
-        for name, data in embeddings.ingredient_data.items():
-            if category and data.get("category") != category:
-                continue
-
-            ingredient_info = {
-                "name": name,
-                "category": data.get("category"),
-                "description": data.get("description"),
-                "flavor_profile": data.get("flavor_profile", []),
-                "texture": data.get("texture"),
-                "color": data.get("color"),
-                "allergens": data.get("allergens", [])
-            }
-
-            if include_nutrition:
-                ingredient_info["nutrition"] = data.get("nutrition", {})
-                ingredient_info["properties"] = data.get("properties", {})
-
-            all_ingredients.append(ingredient_info)
-
-        all_ingredients.sort(key=lambda x: x["name"])
+        if include_nutrition:
+            by_category = embeddings.ingredients_by_category_detailed
+            listing = embeddings.sorted_ingredients_detailed
+        else:
+            by_category = embeddings.ingredients_by_category
+            listing = embeddings.sorted_ingredients
 
+        all_ingredients = by_category.get(category, []) if category else listing
         limited_ingredients = all_ingredients[:limit]
 
         return {
@@ -97,19 +257,14 @@ async def get_all_ingredients(
 
 
 @router.get("/categories")
+@cached_response()
 async def get_ingredient_categories(
         embeddings=Depends(get_ingredient_embeddings)
 ):
     try:
-        categories = {}
-
-        for data in embeddings.ingredient_data.values():
-            category = data.get("category", "unknown")
-            categories[category] = categories.get(category, 0) + 1
-
         category_list = [
-            {"name": cat, "count": count, "description": _get_category_description(cat)}
-            for cat, count in categories.items()
+            {"name": cat, "count": count, "description": _CATEGORY_DESCRIPTIONS.get(cat, _DEFAULT_CATEGORY_DESCRIPTION)}
+            for cat, count in embeddings.category_counts.items()
         ]
 
         category_list.sort(key=lambda x: x["count"], reverse=True)
@@ -131,31 +286,40 @@ async def get_ingredient_categories(
 @router.post("/search")
 async def search_ingredients(
         request: IngredientSearchRequest,
-        embeddings=Depends(get_ingredient_embeddings)
+        embeddings=Depends(get_ingredient_embeddings),
+        insights=Depends(get_ingredient_insights),
+        pool=Depends(get_embedding_pool)
 ):
     try:
-        search_results = embeddings.search_ingredients(request.query, top_k=request.limit * 2)
+        search_results = await _run_embedding_task(
+            pool, embeddings.search_ingredients, request.query, top_k=request.limit * 2
+        )
+
+        get_data = embeddings.ingredient_data.get
+        get_allergens = embeddings.allergens_by_ingredient.get
+        restrictions = request.dietary_restrictions
 
         filtered_results = []
         for ingredient_name, similarity in search_results:
-            ingredient_data = embeddings.ingredient_data.get(ingredient_name)
+            ingredient_data = get_data(ingredient_name)
             if not ingredient_data:
                 continue
 
-            if request.category and ingredient_data.get("category") != request.category:
+            category = ingredient_data.get("category")
+            if request.category and category != request.category:
                 continue
 
-            if request.dietary_restrictions:
-                if not _meets_dietary_restrictions_ingredient(ingredient_data, request.dietary_restrictions):
-                    continue
+            if restrictions and not _meets_dietary_restrictions_ingredient(
+                    get_allergens(ingredient_name, frozenset()), restrictions):
+                continue
 
             result = {
                 "name": ingredient_name,
                 "similarity_score": similarity,
-                "category": ingredient_data.get("category"),
+                "category": category,
                 "description": ingredient_data.get("description"),
                 "flavor_profile": ingredient_data.get("flavor_profile", []),
-                "nutrition_highlights": _get_nutrition_highlights(ingredient_data),
+                "nutrition_highlights": insights[ingredient_name]["highlights"],
                 "allergens": ingredient_data.get("allergens", [])
             }
 
@@ -182,12 +346,15 @@ async def search_ingredients(
         raise HTTPException(status_code=500, detail=f"Ingredient search failed: {str(e)}")
 
 
-@router.get("/{ingredient_name}")
+@router.get("/{ingredient_name}", response_model=IngredientDetailsResponse, response_model_exclude_unset=True)
+@cached_response(expire=300)
 async def get_ingredient_details(
         ingredient_name: str,
         include_similar: bool = Query(True, description="Include similar ingredients"),
         include_substitutions: bool = Query(True, description="Include substitution suggestions"),
-        embeddings=Depends(get_ingredient_embeddings)
+        embeddings=Depends(get_ingredient_embeddings),
+        insights=Depends(get_ingredient_insights),
+        pool=Depends(get_embedding_pool)
 ):
     try:
         ingredient_data = embeddings.get_ingredient_data(ingredient_name)
@@ -195,34 +362,14 @@ async def get_ingredient_details(
         if not ingredient_data:
             raise HTTPException(status_code=404, detail=f"Ingredient '{ingredient_name}' not found")
 
-        response_data = {
-            "name": ingredient_name,
-            "category": ingredient_data.get("category"),
-            "description": ingredient_data.get("description"),
-            "nutrition": ingredient_data.get("nutrition", {}),
-            "properties": ingredient_data.get("properties", {}),
-            "flavor_profile": ingredient_data.get("flavor_profile", []),
-            "texture": ingredient_data.get("texture"),
-            "color": ingredient_data.get("color"),
-            "allergens": ingredient_data.get("allergens", []),
-            "health_benefits": _generate_health_benefits(ingredient_data),
-            "usage_tips": _generate_usage_tips(ingredient_name, ingredient_data)
-        }
+        response_data = _build_ingredient_details(ingredient_name, ingredient_data, insights[ingredient_name])
 
         if include_similar:
-            similar = embeddings.find_similar_ingredients(ingredient_name, top_k=8)
-            response_data["similar_ingredients"] = [
-                {
-                    "name": name,
-                    "similarity": float(similarity),
-                    "category": embeddings.ingredient_data.get(name, {}).get("category"),
-                    "description": embeddings.ingredient_data.get(name, {}).get("description")
-                }
-                for name, similarity in similar
-            ]
+            similar = await _run_embedding_task(pool, embeddings.find_similar_ingredients, ingredient_name, top_k=8)
+            response_data["similar_ingredients"] = _format_similar_ingredients(similar, embeddings)
 
         if include_substitutions:
-            substitutions = embeddings.suggest_substitutions(ingredient_name)
+            substitutions = await _run_embedding_task(pool, embeddings.suggest_substitutions, ingredient_name)
             response_data["substitutions"] = substitutions
 
         return {
@@ -241,10 +388,13 @@ async def get_ingredient_details(
 @router.post("/similar")
 async def find_similar_ingredients(
         request: SimilarIngredientsRequest,
-        embeddings=Depends(get_ingredient_embeddings)
+        embeddings=Depends(get_ingredient_embeddings),
+        pool=Depends(get_embedding_pool)
 ):
     try:
-        similar_ingredients = embeddings.find_similar_ingredients(request.ingredient_name, top_k=request.count * 2)
+        similar_ingredients = await _run_embedding_task(
+            pool, embeddings.find_similar_ingredients, request.ingredient_name, top_k=request.count * 2
+        )
 
         if not similar_ingredients:
             return {
@@ -253,19 +403,23 @@ async def find_similar_ingredients(
                 "message": f"No similar ingredients found for '{request.ingredient_name}'"
             }
 
+        get_data = embeddings.ingredient_data.get
+        get_allergens = embeddings.allergens_by_ingredient.get
+        restrictions = request.dietary_restrictions
+
         filtered_similar = []
         for name, similarity in similar_ingredients:
-            ingredient_data = embeddings.ingredient_data.get(name)
+            ingredient_data = get_data(name)
             if not ingredient_data:
                 continue
 
-            if request.dietary_restrictions:
-                if not _meets_dietary_restrictions_ingredient(ingredient_data, request.dietary_restrictions):
-                    continue
+            if restrictions and not _meets_dietary_restrictions_ingredient(
+                    get_allergens(name, frozenset()), restrictions):
+                continue
 
             filtered_similar.append({
                 "name": name,
-                "similarity_score": float(similarity),
+                "similarity_score": similarity,
                 "category": ingredient_data.get("category"),
                 "reason": _generate_similarity_reason(request.ingredient_name, name, embeddings),
                 "nutrition_comparison": _compare_nutrition_brief(request.ingredient_name, name, embeddings)
@@ -289,29 +443,65 @@ async def find_similar_ingredients(
         raise HTTPException(status_code=500, detail=f"Failed to find similar ingredients: {str(e)}")
 
 
+@router.post("/batch")
+async def batch_ingredient_lookup(
+        request: BatchIngredientRequest,
+        embeddings=Depends(get_ingredient_embeddings),
+        insights=Depends(get_ingredient_insights),
+        pool=Depends(get_embedding_pool)
+):
+    try:
+        names = list(dict.fromkeys(request.names))
+        found = [name for name in names if name in embeddings.ingredient_data]
+        not_found = [name for name in names if name not in embeddings.ingredient_data]
+
+        similar_by_name = {}
+        if "similar" in request.include and found:
+            similar_by_name = await _run_embedding_task(
+                pool, embeddings.batch_similar, found, top_k=request.top_k
+            )
+
+        results = []
+        for name in found:
+            result = {"name": name}
+            if "details" in request.include:
+                result["details"] = _build_ingredient_details(name, embeddings.ingredient_data[name], insights[name])
+            if "similar" in request.include:
+                result["similar_ingredients"] = _format_similar_ingredients(similar_by_name[name], embeddings)
+            results.append(result)
+
+        return {
+            "success": True,
+            "data": {
+                "results": results,
+                "not_found": not_found,
+                "include": request.include
+            },
+            "message": f"Retrieved {len(results)} of {len(names)} ingredients"
+        }
+
+    except Exception as e:
+        logger.error(f"Batch ingredient lookup error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Batch ingredient lookup failed: {str(e)}")
+
+
 @router.post("/substitute")
 async def get_substitution_suggestions(
         request: SubstitutionRequest,
-        embeddings=Depends(get_ingredient_embeddings)
+        embeddings=Depends(get_ingredient_embeddings),
+        pool=Depends(get_embedding_pool)
 ):
     try:
-        substitutions = embeddings.suggest_substitutions(request.ingredient_name, request.dietary_restrictions)
-
-        if request.recipe_context:
-            for substitution in substitutions:
-                substitution["context_analysis"] = _analyze_recipe_context(
-                    substitution["name"], request.recipe_context, embeddings
-                )
-
-        enhanced_substitutions = []
-        for sub in substitutions:
-            enhanced_sub = sub.copy()
-            enhanced_sub.update({
-                "substitution_ratio": _get_substitution_ratio(request.ingredient_name, sub["name"]),
-                "preparation_notes": _get_preparation_notes(request.ingredient_name, sub["name"]),
-                "expected_changes": _predict_recipe_changes(request.ingredient_name, sub["name"], embeddings)
-            })
-            enhanced_substitutions.append(enhanced_sub)
+        substitutions = await _run_embedding_task(
+            pool, embeddings.suggest_substitutions, request.ingredient_name, request.dietary_restrictions
+        )
+
+        enhanced_substitutions = await asyncio.gather(*(
+            _run_embedding_task(
+                pool, _build_enhanced_sub, sub, request.ingredient_name, request.recipe_context, embeddings
+            )
+            for sub in substitutions
+        ))
 
         return {
             "success": True,
@@ -330,7 +520,7 @@ async def get_substitution_suggestions(
         raise HTTPException(status_code=500, detail=f"Failed to get substitutions: {str(e)}")
 
 
-@router.post("/compatibility")
+@router.post("/compatibility", response_model=CompatibilityResponse)
 async def check_ingredient_compatibility(
         request: IngredientCompatibilityRequest,
         embeddings=Depends(get_ingredient_embeddings)
@@ -343,44 +533,28 @@ async def check_ingredient_compatibility(
             raise HTTPException(status_code=404, detail=f"Ingredient '{new_ingredient}' not found")
 
         compatibility_scores = []
-        flavor_conflicts = []
         allergen_additions = []
 
         new_ingredient_data = embeddings.ingredient_data[new_ingredient]
-        new_allergens = set(new_ingredient_data.get("allergens", []))
-        new_flavors = set(new_ingredient_data.get("flavor_profile", []))
-
-        for existing_ingredient in existing_ingredients:
-            if existing_ingredient not in embeddings.ingredient_data:
-                continue
-
-            similar_ingredients = embeddings.find_similar_ingredients(existing_ingredient, top_k=20)
-            similarity_score = 0
+        new_allergens = embeddings.allergens_by_ingredient[new_ingredient]
+        new_flavor_mask = embeddings.flavor_masks_by_ingredient[new_ingredient]
 
-            for similar_name, similarity in similar_ingredients:
-                if similar_name == new_ingredient:
-                    similarity_score = similarity
-                    break
+        known_ingredients = [
+            ingredient for ingredient in existing_ingredients if ingredient in embeddings.ingredient_data
+        ]
+        similarity_scores = embeddings.similarity_to(new_ingredient, known_ingredients).tolist()
 
+        for existing_ingredient, similarity_score in zip(known_ingredients, similarity_scores):
             compatibility_scores.append({
                 "existing_ingredient": existing_ingredient,
-                "compatibility_score": float(similarity_score),
+                "compatibility_score": similarity_score,
                 "compatibility_level": _get_compatibility_level(similarity_score)
             })
 
-        existing_flavors = set()
-        for ingredient in existing_ingredients:
-            if ingredient in embeddings.ingredient_data:
-                existing_flavors.update(embeddings.ingredient_data[ingredient].get("flavor_profile", []))
-
-        conflicting_flavors = _find_flavor_conflicts(existing_flavors, new_flavors)
-        if conflicting_flavors:
-            flavor_conflicts = list(conflicting_flavors)
+        recipe_key = tuple(sorted(set(known_ingredients)))
+        existing_flavor_mask, existing_allergens = embeddings.recipe_profile(recipe_key)
 
-        existing_allergens = set()
-        for ingredient in existing_ingredients:
-            if ingredient in embeddings.ingredient_data:
-                existing_allergens.update(embeddings.ingredient_data[ingredient].get("allergens", []))
+        flavor_conflicts = _find_flavor_conflicts(embeddings, existing_flavor_mask, new_flavor_mask)
 
         added_allergens = new_allergens - existing_allergens
         if added_allergens:
@@ -398,7 +572,7 @@ async def check_ingredient_compatibility(
             "data": {
                 "new_ingredient": new_ingredient,
                 "existing_ingredients": existing_ingredients,
-                "overall_compatibility": float(avg_compatibility),
+                "overall_compatibility": avg_compatibility,
                 "compatibility_level": _get_compatibility_level(avg_compatibility),
                 "individual_compatibility": compatibility_scores,
                 "flavor_conflicts": flavor_conflicts,
@@ -416,6 +590,7 @@ async def check_ingredient_compatibility(
 
 
 @router.post("/compare")
+@cached_response(expire=300)
 async def compare_ingredients(
         request: NutritionComparisonRequest,
         embeddings=Depends(get_ingredient_embeddings)
@@ -432,32 +607,30 @@ async def compare_ingredients(
         nutrition_a = ingredient_a_data.get("nutrition", {})
         nutrition_b = ingredient_b_data.get("nutrition", {})
 
-        nutrition_comparison = {}
-        key_nutrients = ["calories_per_100g", "protein_g", "total_fat_g", "carbohydrates_g",
-                         "sugars_g", "fiber_g", "sodium_mg", "potassium_mg", "calcium_mg", "iron_mg"]
-
-        for nutrient in key_nutrients:
-            val_a = nutrition_a.get(nutrient, 0)
-            val_b = nutrition_b.get(nutrient, 0)
-
-            if val_a == 0 and val_b == 0:
-                difference = "equal"
-                percent_diff = 0
-            else:
-                percent_diff = ((val_b - val_a) / max(val_a, 0.1)) * 100
-                if abs(percent_diff) < 10:
-                    difference = "similar"
-                elif val_b > val_a:
-                    difference = "higher_in_b"
-                else:
-                    difference = "higher_in_a"
-
-            nutrition_comparison[nutrient] = {
+        values_a = [nutrition_a.get(nutrient, 0) for nutrient in KEY_NUTRIENTS]
+        values_b = [nutrition_b.get(nutrient, 0) for nutrient in KEY_NUTRIENTS]
+        a = np.asarray(values_a, dtype=np.float64)
+        b = np.asarray(values_b, dtype=np.float64)
+
+        both_zero = (a == 0) & (b == 0)
+        percent_diffs = np.where(both_zero, 0.0, (b - a) / np.maximum(a, 0.1) * 100)
+        differences = np.select(
+            [both_zero, np.abs(percent_diffs) < 10, b > a],
+            ["equal", "similar", "higher_in_b"],
+            default="higher_in_a"
+        )
+
+        nutrition_comparison = {
+            nutrient: {
                 "ingredient_a_value": val_a,
                 "ingredient_b_value": val_b,
                 "percent_difference": round(percent_diff, 1),
                 "comparison": difference
             }
+            for nutrient, val_a, val_b, percent_diff, difference in zip(
+                KEY_NUTRIENTS, values_a, values_b, percent_diffs.tolist(), differences.tolist()
+            )
+        }
 
         properties_a = ingredient_a_data.get("properties", {})
         properties_b = ingredient_b_data.get("properties", {})
@@ -477,8 +650,8 @@ async def compare_ingredients(
             }
         }
 
-        allergens_a = set(ingredient_a_data.get("allergens", []))
-        allergens_b = set(ingredient_b_data.get("allergens", []))
+        allergens_a = embeddings.allergens_by_ingredient[request.ingredient_a]
+        allergens_b = embeddings.allergens_by_ingredient[request.ingredient_b]
 
         allergen_comparison = {
             "common_allergens": list(allergens_a & allergens_b),
@@ -520,6 +693,7 @@ async def compare_ingredients(
 
 
 @router.get("/recommendations/trending")
+@cached_response(expire=300)
 async def get_trending_ingredients(
         category: Optional[str] = Query(None, description="Filter by category"),
         period: str = Query("week", description="Time period (week/month/quarter)"),
@@ -583,40 +757,43 @@ async def get_trending_ingredients(
 
 
 
-def _get_category_description(category: str) -> str:
-    descriptions = {
-        "nuts_seeds": "Nutrient-dense nuts and seeds, rich in healthy fats and protein",
-        "fruits": "Fresh and dried fruits providing natural sweetness and vitamins",
-        "chocolate": "Various forms of chocolate and cocoa products",
-        "grains": "Whole grains and cereals providing complex carbohydrates",
-        "protein": "Concentrated protein sources and supplements",
-        "sweeteners": "Natural and alternative sweetening options",
-        "coconut": "Coconut-derived products with unique nutritional profiles",
-        "spices": "Flavor enhancers with potential health benefits",
-        "flavorings": "Natural extracts and flavoring agents"
+def _build_ingredient_details(ingredient_name: str, ingredient_data: Dict[str, Any],
+                              ingredient_insights: Dict[str, List[str]]) -> Dict[str, Any]:
+    return {
+        "name": ingredient_name,
+        "category": ingredient_data.get("category"),
+        "description": ingredient_data.get("description"),
+        "nutrition": ingredient_data.get("nutrition", {}),
+        "properties": ingredient_data.get("properties", {}),
+        "flavor_profile": ingredient_data.get("flavor_profile", []),
+        "texture": ingredient_data.get("texture"),
+        "color": ingredient_data.get("color"),
+        "allergens": ingredient_data.get("allergens", []),
+        "health_benefits": ingredient_insights["benefits"],
+        "usage_tips": ingredient_insights["tips"]
     }
-    return descriptions.get(category, "Various ingredients in this category")
 
 
-def _meets_dietary_restrictions_ingredient(ingredient_data: Dict[str, Any], restrictions: List[str]) -> bool:
-    allergens = set(ingredient_data.get("allergens", []))
+def _format_similar_ingredients(similar: List, embeddings) -> List[Dict[str, Any]]:
+    get_data = embeddings.ingredient_data.get
+    similar_ingredients = []
+    for name, similarity in similar:
+        similar_data = get_data(name, {})
+        similar_ingredients.append({
+            "name": name,
+            "similarity": similarity,
+            "category": similar_data.get("category"),
+            "description": similar_data.get("description")
+        })
+
+    return similar_ingredients
 
+
+def _meets_dietary_restrictions_ingredient(allergens: frozenset, restrictions: List[str]) -> bool:
     for restriction in restrictions:
-        if restriction == "vegan":
-            if any(allergen in allergens for allergen in ["milk", "eggs", "honey"]):
-                return False
-        elif restriction == "gluten_free":
-            if "gluten" in allergens:
-                return False
-        elif restriction == "nut_free":
-            if any("nut" in allergen for allergen in allergens):
-                return False
-        elif restriction == "dairy_free":
-            if "milk" in allergens:
-                return False
-        elif restriction == "soy_free":
-            if "soy" in allergens:
-                return False
+        forbids = _RESTRICTION_ALLERGEN_RULES.get(restriction)
+        if forbids and any(forbids(allergen) for allergen in allergens):
+            return False
 
     return True
 
@@ -640,146 +817,127 @@ def _get_nutrition_highlights(ingredient_data: Dict[str, Any]) -> List[str]:
 
 
 def _generate_health_benefits(ingredient_data: Dict[str, Any]) -> List[str]:
-    benefits = []
-    nutrition = ingredient_data.get("nutrition", {})
-    properties = ingredient_data.get("properties", {})
-
-    if nutrition.get("protein_g", 0) > 10:
-        benefits.append("Supports muscle building and repair")
-    if nutrition.get("fiber_g", 0) > 5:
-        benefits.append("Promotes digestive health")
-    if properties.get("antioxidant_score", 0) > 60:
-        benefits.append("Provides antioxidant protection")
-    if nutrition.get("potassium_mg", 0) > 300:
-        benefits.append("Supports heart health")
-    if properties.get("glycemic_index", 100) < 35:
-        benefits.append("Helps maintain stable blood sugar")
+    sections = {
+        "nutrition": ingredient_data.get("nutrition", {}),
+        "properties": ingredient_data.get("properties", {})
+    }
 
-    return benefits
+    return [
+        benefit
+        for section, field, default, compare, threshold, benefit in _HEALTH_BENEFIT_RULES
+        if compare(sections[section].get(field, default), threshold)
+    ]
 
 
 def _generate_usage_tips(ingredient_name: str, ingredient_data: Dict[str, Any]) -> List[str]:
-    tips = []
     category = ingredient_data.get("category", "")
-    texture = ingredient_data.get("texture", "")
-
-    if category == "nuts_seeds":
-        tips.append("Soak overnight for easier blending")
-        tips.append("Toast lightly to enhance flavor")
-    elif category == "fruits":
-        tips.append("Combine with protein for balanced nutrition")
-        if "dried" in ingredient_name:
-            tips.append("Use sparingly as natural sweetener")
-    elif category == "protein":
-        tips.append("Mix gradually to avoid clumping")
-        tips.append("Combine with liquid ingredients first")
-    elif category == "spices":
-        tips.append("Start with small amounts and adjust to taste")
-        tips.append("Mix well to distribute evenly")
+    tips = list(_CATEGORY_USAGE_TIPS.get(category, ()))
 
-    if texture == "powdery":
-        tips.append("Sift to prevent lumps")
-    elif texture == "sticky":
-        tips.append("Wet hands when handling")
+    if category == "fruits" and "dried" in ingredient_name:
+        tips.append("Use sparingly as natural sweetener")
+
+    texture_tip = _TEXTURE_USAGE_TIPS.get(ingredient_data.get("texture", ""))
+    if texture_tip:
+        tips.append(texture_tip)
 
     return tips[:3]  # Limit to 3 tips
 
 
 def _generate_similarity_reason(ingredient_a: str, ingredient_b: str, embeddings) -> str:
-    data_a = embeddings.ingredient_data.get(ingredient_a, {})
-    data_b = embeddings.ingredient_data.get(ingredient_b, {})
+    row_a = embeddings.attribute_row(ingredient_a)
+    row_b = embeddings.attribute_row(ingredient_b)
 
-    if data_a.get("category") == data_b.get("category"):
-        return f"Same category ({data_a.get('category')})"
+    if embeddings.categories[row_a] == embeddings.categories[row_b]:
+        return f"Same category ({embeddings.categories[row_a]})"
 
-    flavors_a = set(data_a.get("flavor_profile", []))
-    flavors_b = set(data_b.get("flavor_profile", []))
-    common_flavors = flavors_a & flavors_b
+    common_flavors = embeddings.flavor_sets[row_a] & embeddings.flavor_sets[row_b]
 
     if common_flavors:
         return f"Similar {', '.join(common_flavors)} flavor"
 
-    if data_a.get("texture") == data_b.get("texture"):
-        return f"Similar {data_a.get('texture')} texture"
+    if embeddings.textures[row_a] == embeddings.textures[row_b]:
+        return f"Similar {embeddings.textures[row_a]} texture"
 
     return "Complementary nutritional profile"
 
 
 def _compare_nutrition_brief(ingredient_a: str, ingredient_b: str, embeddings) -> str:
-    data_a = embeddings.ingredient_data.get(ingredient_a, {})
-    data_b = embeddings.ingredient_data.get(ingredient_b, {})
-
-    nutrition_a = data_a.get("nutrition", {})
-    nutrition_b = data_b.get("nutrition", {})
-
-    protein_a = nutrition_a.get("protein_g", 0)
-    protein_b = nutrition_b.get("protein_g", 0)
+    columns = [embeddings.nutrient_column[key] for key in _BRIEF_NUTRIENTS]
+    values_a = embeddings.nutrition_matrix[embeddings.attribute_row(ingredient_a), columns]
+    values_b = embeddings.nutrition_matrix[embeddings.attribute_row(ingredient_b), columns]
 
-    if protein_b > protein_a * 1.5:
-        return "Higher protein content"
-    elif protein_a > protein_b * 1.5:
-        return "Lower protein content"
+    higher_in_b = values_b > values_a * _BRIEF_THRESHOLDS
+    differs = higher_in_b | (values_a > values_b * _BRIEF_THRESHOLDS)
+    if not differs.any():
+        return "Similar nutritional profile"
 
-    calories_a = nutrition_a.get("calories_per_100g", 0)
-    calories_b = nutrition_b.get("calories_per_100g", 0)
-
-    if calories_b > calories_a * 1.2:
-        return "Higher calorie density"
-    elif calories_a > calories_b * 1.2:
-        return "Lower calorie density"
-
-    return "Similar nutritional profile"
+    # Nutrients are listed by priority, so the first difference decides the label
+    first = int(np.argmax(differs))
+    higher_label, lower_label = _BRIEF_LABELS[first]
+    return higher_label if higher_in_b[first] else lower_label
 
 
 def _analyze_recipe_context(ingredient_name: str, recipe_context: List[str], embeddings) -> str:
-    ingredient_data = embeddings.ingredient_data.get(ingredient_name, {})
-    category = ingredient_data.get("category", "")
+    row = embeddings.attribute_row(ingredient_name)
+    category = embeddings.categories[row] if row != embeddings.missing_row else ""
 
-    context_categories = []
-    for context_ingredient in recipe_context:
-        if context_ingredient in embeddings.ingredient_data:
-            context_categories.append(embeddings.ingredient_data[context_ingredient].get("category"))
+    context_rows = [embeddings.attribute_rows[name] for name in recipe_context if name in embeddings.attribute_rows]
+    context_codes = embeddings.category_codes[context_rows]
+    has_nuts_seeds = bool(np.any(context_codes == embeddings.category_code_by_name.get("nuts_seeds", -2)))
 
-    if category in context_categories:
+    if np.any(context_codes == embeddings.category_codes[row]):
         return f"Complements existing {category} ingredients"
-    elif category == "protein" and "nuts_seeds" in context_categories:
+    elif category == "protein" and has_nuts_seeds:
         return "Adds protein to existing healthy fats"
-    elif category == "fruits" and "nuts_seeds" in context_categories:
+    elif category == "fruits" and has_nuts_seeds:
         return "Adds natural sweetness to nutty base"
     else:
         return "Adds nutritional variety to recipe"
 
 
+def _build_enhanced_sub(sub: Dict[str, Any], ingredient_name: str,
+                        recipe_context: Optional[List[str]], embeddings) -> Dict[str, Any]:
+    enhanced_sub = sub.copy()
+
+    if recipe_context:
+        enhanced_sub["context_analysis"] = _analyze_recipe_context(sub["name"], recipe_context, embeddings)
+
+    enhanced_sub.update({
+        "substitution_ratio": _get_substitution_ratio(ingredient_name, sub["name"]),
+        "preparation_notes": _get_preparation_notes(ingredient_name, sub["name"]),
+        "expected_changes": _predict_recipe_changes(ingredient_name, sub["name"], embeddings)
+    })
+
+    return enhanced_sub
+
+
+def _match_pair_rule(rules: Tuple, original: str, substitute: str, default: str) -> str:
+    for original_tag, substitute_tag, message in rules:
+        if original_tag in original and substitute_tag in substitute:
+            return message
+    return default
+
+
+@functools.lru_cache(maxsize=4096)
 def _get_substitution_ratio(original: str, substitute: str) -> str:
-    if "powder" in original and "powder" in substitute:
-        return "1:1 ratio"
-    elif "honey" in original and "maple_syrup" in substitute:
-        return "Use 3/4 amount of maple syrup"
-    elif "dates" in original and any(sweetener in substitute for sweetener in ["honey", "maple"]):
-        return "Use 1/2 the amount"
-    else:
-        return "Start with 3/4 amount and adjust"
+    return _match_pair_rule(_SUBSTITUTION_RATIO_RULES, original, substitute, "Start with 3/4 amount and adjust")
 
 
+@functools.lru_cache(maxsize=4096)
 def _get_preparation_notes(original: str, substitute: str) -> str:
-    if "liquid" in original and "powder" in substitute:
-        return "May need to add extra liquid to maintain consistency"
-    elif "powder" in original and "liquid" in substitute:
-        return "May need to reduce other liquids slightly"
-    elif "nuts" in original and "seeds" in substitute:
-        return "Consider soaking seeds for softer texture"
-    else:
-        return "Monitor texture and adjust other ingredients as needed"
+    return _match_pair_rule(
+        _PREPARATION_NOTE_RULES, original, substitute, "Monitor texture and adjust other ingredients as needed"
+    )
 
 
 def _predict_recipe_changes(original: str, substitute: str, embeddings) -> Dict[str, str]:
-    orig_data = embeddings.ingredient_data.get(original, {})
-    sub_data = embeddings.ingredient_data.get(substitute, {})
+    orig_row = embeddings.attribute_row(original)
+    sub_row = embeddings.attribute_row(substitute)
 
     changes = {}
 
-    orig_flavors = set(orig_data.get("flavor_profile", []))
-    sub_flavors = set(sub_data.get("flavor_profile", []))
+    orig_flavors = embeddings.flavor_sets[orig_row]
+    sub_flavors = embeddings.flavor_sets[sub_row]
 
     if orig_flavors != sub_flavors:
         new_flavors = sub_flavors - orig_flavors
@@ -788,14 +946,14 @@ def _predict_recipe_changes(original: str, substitute: str, embeddings) -> Dict[
         else:
             changes["flavor"] = "Similar flavor profile"
 
-    orig_texture = orig_data.get("texture", "")
-    sub_texture = sub_data.get("texture", "")
+    orig_texture = embeddings.textures[orig_row] or ""
+    sub_texture = embeddings.textures[sub_row] or ""
 
     if orig_texture != sub_texture:
         changes["texture"] = f"Texture will be more {sub_texture}"
 
-    orig_protein = orig_data.get("nutrition", {}).get("protein_g", 0)
-    sub_protein = sub_data.get("nutrition", {}).get("protein_g", 0)
+    orig_protein = embeddings.protein_g[orig_row]
+    sub_protein = embeddings.protein_g[sub_row]
 
     if sub_protein > orig_protein * 1.2:
         changes["nutrition"] = "Will increase protein content"
@@ -816,23 +974,11 @@ def _get_compatibility_level(score: float) -> str:
         return "low"
 
 
-def _find_flavor_conflicts(existing_flavors: set, new_flavors: set) -> set:
-    conflicts = set()
-
-    conflict_pairs = {
-        ("sweet", "bitter"),
-        ("mild", "intense"),
-        ("floral", "earthy")
-    }
-
-    for existing_flavor in existing_flavors:
-        for new_flavor in new_flavors:
-            for pair in conflict_pairs:
-                if (existing_flavor in pair and new_flavor in pair and
-                        existing_flavor != new_flavor):
-                    conflicts.add((existing_flavor, new_flavor))
-
-    return conflicts
+def _find_flavor_conflicts(embeddings, existing_mask: int, new_mask: int) -> List[Tuple[str, str]]:
+    return [
+        conflict for existing_bit, new_bit, conflict in embeddings.flavor_pair_masks(_FLAVOR_CONFLICT_PAIRS)
+        if existing_mask & existing_bit and new_mask & new_bit
+    ]
 
 
 def _generate_compatibility_recommendations(avg_score: float, conflicts: List, allergens: List,
@@ -848,16 +994,13 @@ def _generate_compatibility_recommendations(avg_score: float, conflicts: List, a
 
     if conflicts:
         recommendations.append("Be mindful of potential flavor conflicts - start with small amounts")
-
     if allergens:
         recommendations.append(f"Note: This will add {', '.join(allergens)} allergen(s) to your recipe")
-
     category = new_ingredient_data.get("category", "")
     if category == "spices":
         recommendations.append("Use sparingly - a little goes a long way with spices")
     elif category == "protein":
         recommendations.append("This will boost the protein content significantly")
-
     return recommendations
 
 
@@ -867,9 +1010,8 @@ def _generate_comparison_summary(ingredient_a: str, ingredient_b: str, nutrition
 
     protein_comparison = nutrition_comp.get("protein_g", {}).get("comparison", "equal")
     fiber_comparison = nutrition_comp.get("fiber_g", {}).get("comparison", "equal")
-    sugar_comparison = nutrition_comp.get("sugars_g", {}).get("comparison", "equal")
 
-    nutrition_winner = "tie"
+    # Protein decides unless fiber points the other way, then fiber under the same condition
     if protein_comparison == "higher_in_b" and fiber_comparison != "higher_in_a":
         nutrition_winner = ingredient_b
     elif protein_comparison == "higher_in_a" and fiber_comparison != "higher_in_b":
@@ -878,6 +1020,8 @@ def _generate_comparison_summary(ingredient_a: str, ingredient_b: str, nutrition
         nutrition_winner = ingredient_b
     elif fiber_comparison == "higher_in_a" and protein_comparison != "higher_in_b":
         nutrition_winner = ingredient_a
+    else:
+        nutrition_winner = "tie"
 
     if nutrition_winner == "tie":
         summary["nutrition"] = f"Both {ingredient_a} and {ingredient_b} offer similar nutritional benefits"
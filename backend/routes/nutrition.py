@@ -1,11 +1,18 @@
 from fastapi import APIRouter, HTTPException, Depends, Request
-from typing import List, Dict, Any, Optional
+from fastapi.responses import ORJSONResponse
+from typing import List, Dict, Any, Optional, Tuple
 from pydantic import BaseModel, Field
+import numpy as np
+import functools
 import logging
+from types import MappingProxyType
+
+from utils.request_body import json_body, json_body_openapi
+from utils.static_response import StaticJSONResponse
 
 logger = logging.getLogger(__name__)
 
-router = APIRouter()
+router = APIRouter(default_response_class=ORJSONResponse)
 
 
 class IngredientInput(BaseModel):
@@ -29,34 +36,36 @@ class IngredientContributionRequest(BaseModel):
     ingredients: List[IngredientInput]
 
 
+def _to_soa(ingredients: List[IngredientInput]) -> Tuple[List[str], np.ndarray]:
+    return (
+        [ing.name for ing in ingredients],
+        np.fromiter((ing.amount_g for ing in ingredients), dtype=np.float64, count=len(ingredients))
+    )
+
+
 def get_nutrition_service(request: Request):
     """Dependency to get nutrition service from app state"""
     return request.app.state.nutrition_service
 
 
-@router.post("/calculate")
+@router.post("/calculate", openapi_extra=json_body_openapi(NutritionCalculationRequest))
 async def calculate_nutrition(
-        request: NutritionCalculationRequest,
+        request: NutritionCalculationRequest = Depends(json_body(NutritionCalculationRequest)),
         nutrition_service=Depends(get_nutrition_service)
 ):
     try:
-        ingredients_dict = [
-            {"name": ing.name, "amount_g": ing.amount_g}
-            for ing in request.ingredients
-        ]
-
-        nutrition_analysis = nutrition_service.calculate_snack_nutrition(ingredients_dict)
+        nutrition_analysis = nutrition_service.calculate_nutrition_from_arrays(*_to_soa(request.ingredients))
 
         if request.serving_size_g:
             serving_multiplier = request.serving_size_g / nutrition_analysis["total_weight_g"]
-            nutrition_per_serving = {}
-
-            for nutrient, value in nutrition_analysis["nutrition_per_serving"].items():
-                nutrition_per_serving[nutrient] = value * serving_multiplier
+            nutrition_per_serving = nutrition_analysis["nutrition_per_serving"]
+            scaled = np.fromiter(
+                nutrition_per_serving.values(), dtype=np.float64, count=len(nutrition_per_serving)
+            ) * serving_multiplier
 
             nutrition_analysis["custom_serving"] = {
                 "serving_size_g": request.serving_size_g,
-                "nutrition": nutrition_per_serving
+                "nutrition": dict(zip(nutrition_per_serving, scaled.tolist()))
             }
 
         return {
@@ -70,22 +79,13 @@ async def calculate_nutrition(
         raise HTTPException(status_code=500, detail=f"Nutrition calculation failed: {str(e)}")
 
 
-@router.post("/compare")
+@router.post("/compare", openapi_extra=json_body_openapi(NutritionComparisonRequest))
 async def compare_recipes(
-        request: NutritionComparisonRequest,
+        request: NutritionComparisonRequest = Depends(json_body(NutritionComparisonRequest)),
         nutrition_service=Depends(get_nutrition_service)
 ):
     try:
-        recipe_a_dict = [
-            {"name": ing.name, "amount_g": ing.amount_g}
-            for ing in request.recipe_a
-        ]
-        recipe_b_dict = [
-            {"name": ing.name, "amount_g": ing.amount_g}
-            for ing in request.recipe_b
-        ]
-
-        comparison = nutrition_service.compare_snack_versions(recipe_a_dict, recipe_b_dict)
+        comparison = nutrition_service.compare_snack_versions(_to_soa(request.recipe_a), _to_soa(request.recipe_b))
 
         comparison["recipe_names"] = {
             "recipe_a": request.comparison_name_a,
@@ -103,18 +103,13 @@ async def compare_recipes(
         raise HTTPException(status_code=500, detail=f"Recipe comparison failed: {str(e)}")
 
 
-@router.post("/ingredient-contribution")
+@router.post("/ingredient-contribution", openapi_extra=json_body_openapi(IngredientContributionRequest))
 async def analyze_ingredient_contribution(
-        request: IngredientContributionRequest,
+        request: IngredientContributionRequest = Depends(json_body(IngredientContributionRequest)),
         nutrition_service=Depends(get_nutrition_service)
 ):
     try:
-        ingredients_dict = [
-            {"name": ing.name, "amount_g": ing.amount_g}
-            for ing in request.ingredients
-        ]
-
-        contribution_analysis = nutrition_service.analyze_ingredient_contribution(ingredients_dict)
+        contribution_analysis = nutrition_service.analyze_ingredient_contribution(_to_soa(request.ingredients))
 
         return {
             "success": True,
@@ -165,184 +160,192 @@ async def explain_health_score(
         raise HTTPException(status_code=500, detail=f"Explanation generation failed: {str(e)}")
 
 
-def generate_score_explanation(score: int, nutrition: Dict[str, float]) -> str:
-
-    explanations = []
+# Indexed by band: below the low edge, between the edges (inclusive), above the high edge
+_SCORE_EXPLANATIONS = (
+    "This score suggests significant nutritional improvements are needed.",
+    "This is a moderate health score with room for improvement.",
+    "This is a good health score showing solid nutritional value.",
+    "This is an excellent health score indicating a very nutritious snack."
+)
+_PROTEIN_EXPLANATIONS = ("Low protein content reduces the score.", None,
+                         "High protein content significantly boosts the score.")
+_FIBER_EXPLANATIONS = ("Low fiber content limits the score.", None,
+                       "Excellent fiber content contributes positively.")
+_SUGAR_EXPLANATIONS = ("Low sugar content helps maintain a good score.", None,
+                       "High sugar content significantly reduces the score.")
 
-    if score >= 80:
-        explanations.append("This is an excellent health score indicating a very nutritious snack.")
-    elif score >= 60:
-        explanations.append("This is a good health score showing solid nutritional value.")
-    elif score >= 40:
-        explanations.append("This is a moderate health score with room for improvement.")
-    else:
-        explanations.append("This score suggests significant nutritional improvements are needed.")
 
-    protein = nutrition.get("protein_g", 0)
-    fiber = nutrition.get("fiber_g", 0)
-    sugar = nutrition.get("sugars_g", 0)
+def _band(value: float, low: float, high: float) -> int:
+    return 1 + (value > high) - (value < low)
 
-    if protein > 15:
-        explanations.append("High protein content significantly boosts the score.")
-    elif protein < 5:
-        explanations.append("Low protein content reduces the score.")
 
-    if fiber > 8:
-        explanations.append("Excellent fiber content contributes positively.")
-    elif fiber < 3:
-        explanations.append("Low fiber content limits the score.")
+def generate_score_explanation(score: int, nutrition: Dict[str, float]) -> str:
+    return _explain_score(
+        (score >= 40) + (score >= 60) + (score >= 80),
+        _band(nutrition.get("protein_g", 0), 5, 15),
+        _band(nutrition.get("fiber_g", 0), 3, 8),
+        _band(nutrition.get("sugars_g", 0), 8, 25)
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def _explain_score(score_band: int, protein_band: int, fiber_band: int, sugar_band: int) -> str:
+    explanations = (
+        _SCORE_EXPLANATIONS[score_band],
+        _PROTEIN_EXPLANATIONS[protein_band],
+        _FIBER_EXPLANATIONS[fiber_band],
+        _SUGAR_EXPLANATIONS[sugar_band]
+    )
+    return " ".join(explanation for explanation in explanations if explanation)
+
+
+_NUTRITION_TARGETS = StaticJSONResponse({
+    "success": True,
+    "data": {
+        "daily_targets": {
+            "protein_g": {"min": 46, "max": 56, "description": "For average adult"},
+            "fiber_g": {"min": 25, "max": 35, "description": "Daily recommendation"},
+            "sugar_g": {"max": 50, "description": "Added sugars limit"},
+            "sodium_mg": {"max": 2300, "description": "Daily limit"},
+            "calories": {"range": [1800, 2400], "description": "Average adult range"}
+        },
+        "per_snack_targets": {
+            "protein_g": {"ideal": "8-15", "description": "Good protein snack"},
+            "fiber_g": {"ideal": "3-8", "description": "Contributes to daily needs"},
+            "sugar_g": {"limit": "15", "description": "Moderate sweetness"},
+            "calories": {"range": "150-300", "description": "Satisfying snack portion"}
+        },
+        "health_score_ranges": {
+            "excellent": {"range": "80-100", "description": "Nutritionally optimal"},
+            "good": {"range": "60-79", "description": "Solid nutrition"},
+            "moderate": {"range": "40-59", "description": "Room for improvement"},
+            "poor": {"range": "0-39", "description": "Needs significant improvement"}
+        }
+    },
+    "message": "Nutrition targets and guidelines"
+})
 
-    if sugar > 25:
-        explanations.append("High sugar content significantly reduces the score.")
-    elif sugar < 8:
-        explanations.append("Low sugar content helps maintain a good score.")
 
-    return " ".join(explanations)
+@router.get("/targets")
+async def get_nutrition_targets(request: Request):
+    return _NUTRITION_TARGETS.respond(request)
+
+
+_NUTRIENT_INFO = MappingProxyType({
+    "protein": {
+        "function": "Building and repairing tissues, immune function, energy",
+        "good_sources": ["nuts", "seeds", "protein powder", "quinoa"],
+        "daily_needs": "0.8g per kg body weight",
+        "benefits": ["Muscle building", "Satiety", "Metabolic support"]
+    },
+    "fiber": {
+        "function": "Digestive health, blood sugar control, cholesterol management",
+        "good_sources": ["chia seeds", "flax seeds", "oats", "berries"],
+        "daily_needs": "25-35g per day",
+        "benefits": ["Digestive health", "Blood sugar stability", "Heart health"]
+    },
+    "iron": {
+        "function": "Oxygen transport, energy production, immune function",
+        "good_sources": ["dark chocolate", "pumpkin seeds", "quinoa"],
+        "daily_needs": "8-18mg per day",
+        "benefits": ["Energy levels", "Immune support", "Cognitive function"]
+    },
+    "calcium": {
+        "function": "Bone health, muscle function, nerve transmission",
+        "good_sources": ["almonds", "sesame seeds", "fortified foods"],
+        "daily_needs": "1000-1200mg per day",
+        "benefits": ["Bone strength", "Muscle function", "Heart health"]
+    },
+    "potassium": {
+        "function": "Fluid balance, muscle contractions, nerve signals",
+        "good_sources": ["dates", "nuts", "coconut"],
+        "daily_needs": "3500-4700mg per day",
+        "benefits": ["Heart health", "Blood pressure", "Muscle function"]
+    }
+})
 
 
-@router.get("/targets")
-async def get_nutrition_targets():
-    return {
+@functools.lru_cache(maxsize=64)
+def _nutrient_info_response(nutrient: str) -> StaticJSONResponse:
+    # Keyed on the name as requested since the message echoes its original casing
+    nutrient_key = nutrient.lower()
+    return StaticJSONResponse({
         "success": True,
         "data": {
-            "daily_targets": {
-                "protein_g": {"min": 46, "max": 56, "description": "For average adult"},
-                "fiber_g": {"min": 25, "max": 35, "description": "Daily recommendation"},
-                "sugar_g": {"max": 50, "description": "Added sugars limit"},
-                "sodium_mg": {"max": 2300, "description": "Daily limit"},
-                "calories": {"range": [1800, 2400], "description": "Average adult range"}
-            },
-            "per_snack_targets": {
-                "protein_g": {"ideal": "8-15", "description": "Good protein snack"},
-                "fiber_g": {"ideal": "3-8", "description": "Contributes to daily needs"},
-                "sugar_g": {"limit": "15", "description": "Moderate sweetness"},
-                "calories": {"range": "150-300", "description": "Satisfying snack portion"}
-            },
-            "health_score_ranges": {
-                "excellent": {"range": "80-100", "description": "Nutritionally optimal"},
-                "good": {"range": "60-79", "description": "Solid nutrition"},
-                "moderate": {"range": "40-59", "description": "Room for improvement"},
-                "poor": {"range": "0-39", "description": "Needs significant improvement"}
-            }
+            "nutrient": nutrient_key,
+            "info": _NUTRIENT_INFO[nutrient_key]
         },
-        "message": "Nutrition targets and guidelines"
-    }
+        "message": f"Information about {nutrient}"
+    })
+
+
+# goal -> (nutrient_per_100g key, threshold, improvable when above threshold, improvement, already met)
+_GOAL_IMPROVEMENT_RULES = MappingProxyType({
+    "increase_protein": ("protein_g", 15, False, "Could increase health score by 5-10 points", "Protein already optimal"),
+    "reduce_sugar": ("sugars_g", 20, True, "Could increase health score by 8-15 points", "Sugar content already moderate"),
+    "increase_fiber": ("fiber_g", 8, False, "Could increase health score by 6-12 points", "Fiber content already good"),
+})
+_DEFAULT_GOAL_IMPROVEMENT = "Potential for 3-8 point improvement"
 
 
 @router.get("/nutrients/info/{nutrient}")
-async def get_nutrient_info(nutrient: str):
-
-    nutrient_info = {
-        "protein": {
-            "function": "Building and repairing tissues, immune function, energy",
-            "good_sources": ["nuts", "seeds", "protein powder", "quinoa"],
-            "daily_needs": "0.8g per kg body weight",
-            "benefits": ["Muscle building", "Satiety", "Metabolic support"]
-        },
-        "fiber": {
-            "function": "Digestive health, blood sugar control, cholesterol management",
-            "good_sources": ["chia seeds", "flax seeds", "oats", "berries"],
-            "daily_needs": "25-35g per day",
-            "benefits": ["Digestive health", "Blood sugar stability", "Heart health"]
-        },
-        "iron": {
-            "function": "Oxygen transport, energy production, immune function",
-            "good_sources": ["dark chocolate", "pumpkin seeds", "quinoa"],
-            "daily_needs": "8-18mg per day",
-            "benefits": ["Energy levels", "Immune support", "Cognitive function"]
-        },
-        "calcium": {
-            "function": "Bone health, muscle function, nerve transmission",
-            "good_sources": ["almonds", "sesame seeds", "fortified foods"],
-            "daily_needs": "1000-1200mg per day",
-            "benefits": ["Bone strength", "Muscle function", "Heart health"]
-        },
-        "potassium": {
-            "function": "Fluid balance, muscle contractions, nerve signals",
-            "good_sources": ["dates", "nuts", "coconut"],
-            "daily_needs": "3500-4700mg per day",
-            "benefits": ["Heart health", "Blood pressure", "Muscle function"]
-        }
-    }
+async def get_nutrient_info(nutrient: str, request: Request):
 
-    if nutrient.lower() not in nutrient_info:
+    nutrient_key = nutrient.lower()
+    if nutrient_key not in _NUTRIENT_INFO:
         raise HTTPException(status_code = 404, detail = f"Information for nutrient '{nutrient}' not found")
-    return {
-        "success": True,
-        "data": {
-            "nutrient": nutrient.lower(),
-            "info": nutrient_info[nutrient.lower()]
-        },
-        "message": f"Information about {nutrient}"
-    }
+    return _nutrient_info_response(nutrient).respond(request)
 
-    @router.post("/optimize")
-    async def optimize_nutrition(
-            current_recipe: List[IngredientInput],
-            optimization_goals: List[str],
-            nutrition_service=Depends(get_nutrition_service)
-    ):
-        """Optimize a recipe for specific nutritional goals"""
-        try:
-            ingredients_dict = [
-                {"name": ing.name, "amount_g": ing.amount_g}
-                for ing in current_recipe
-            ]
-
-            # Get current nutrition
-            current_nutrition = nutrition_service.calculate_snack_nutrition(ingredients_dict)
-
-            # Generate optimization suggestions
-            suggestions = nutrition_service.suggest_nutritional_improvements(
-                current_nutrition, optimization_goals
-            )
-
-            return {
-                "success": True,
-                "data": {
-                    "current_nutrition": current_nutrition,
-                    "optimization_goals": optimization_goals,
-                    "suggestions": suggestions,
-                    "potential_improvements": _calculate_potential_improvements(
-                        current_nutrition, optimization_goals
-                    )
-                },
-                "message": f"Optimization suggestions generated for {len(optimization_goals)} goals"
-            }
 
-        except Exception as e:
-            logger.error(f"Nutrition optimization error: {str(e)}")
-            raise HTTPException(status_code=500, detail=f"Optimization failed: {str(e)}")
-
-    def _calculate_potential_improvements(nutrition: Dict[str, Any], goals: List[str]) -> Dict[str, str]:
-        """Calculate potential improvements for optimization goals"""
-
-        improvements = {}
-        current_score = nutrition.get("health_score", 0)
-
-        for goal in goals:
-            if goal == "increase_protein":
-                current_protein = nutrition.get("nutrition_per_100g", {}).get("protein_g", 0)
-                if current_protein < 15:
-                    improvements[goal] = f"Could increase health score by 5-10 points"
-                else:
-                    improvements[goal] = f"Protein already optimal"
-
-            elif goal == "reduce_sugar":
-                current_sugar = nutrition.get("nutrition_per_100g", {}).get("sugars_g", 0)
-                if current_sugar > 20:
-                    improvements[goal] = f"Could increase health score by 8-15 points"
-                else:
-                    improvements[goal] = f"Sugar content already moderate"
-
-            elif goal == "increase_fiber":
-                current_fiber = nutrition.get("nutrition_per_100g", {}).get("fiber_g", 0)
-                if current_fiber < 8:
-                    improvements[goal] = f"Could increase health score by 6-12 points"
-                else:
-                    improvements[goal] = f"Fiber content already good"
-
-            else:
-                improvements[goal] = f"Potential for 3-8 point improvement"
-
-        return improvements
\ No newline at end of file
+@router.post("/optimize")
+async def optimize_nutrition(
+        current_recipe: List[IngredientInput],
+        optimization_goals: List[str],
+        nutrition_service=Depends(get_nutrition_service)
+):
+    """Optimize a recipe for specific nutritional goals"""
+    try:
+        # Get current nutrition
+        current_nutrition = nutrition_service.calculate_snack_nutrition(_to_soa(current_recipe))
+
+        # Generate optimization suggestions
+        suggestions = nutrition_service.suggest_nutritional_improvements(
+            current_nutrition, optimization_goals
+        )
+
+        return {
+            "success": True,
+            "data": {
+                "current_nutrition": current_nutrition,
+                "optimization_goals": optimization_goals,
+                "suggestions": suggestions,
+                "potential_improvements": _calculate_potential_improvements(
+                    current_nutrition, optimization_goals
+                )
+            },
+            "message": f"Optimization suggestions generated for {len(optimization_goals)} goals"
+        }
+
+    except Exception as e:
+        logger.error(f"Nutrition optimization error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Optimization failed: {str(e)}")
+
+
+def _calculate_potential_improvements(nutrition: Dict[str, Any], goals: List[str]) -> Dict[str, str]:
+    """Calculate potential improvements for optimization goals"""
+
+    improvements = {}
+    per_100g = nutrition.get("nutrition_per_100g", {})
+
+    for goal in goals:
+        rule = _GOAL_IMPROVEMENT_RULES.get(goal)
+        if rule is None:
+            improvements[goal] = _DEFAULT_GOAL_IMPROVEMENT
+            continue
+
+        nutrient_key, threshold, improve_when_above, improvement, already_met = rule
+        value = per_100g.get(nutrient_key, 0)
+        needs_work = value > threshold if improve_when_above else value < threshold
+        improvements[goal] = improvement if needs_work else already_met
+
+    return improvements
\ No newline at end of file
@@ -1,14 +1,21 @@
 from fastapi import APIRouter, HTTPException, Depends, Request, Query
-from typing import List, Dict, Any, Optional
-from pydantic import BaseModel, Field
+from fastapi.responses import ORJSONResponse
+from starlette.concurrency import run_in_threadpool
+from typing import Callable, List, Dict, Any, Optional, Tuple
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError
+import itertools
 import logging
 import json
 from datetime import datetime, timedelta
 import uuid
 
+from models.snack_index import ORDER_FIELDS, SnackIndex
+from utils.request_body import json_body, json_body_openapi
+from utils.response_cache import cached_response
+
 logger = logging.getLogger(__name__)
 
-router = APIRouter()
+router = APIRouter(default_response_class=ORJSONResponse)
 
 
 class SnackRecipe(BaseModel):
@@ -22,6 +29,10 @@ class SnackRecipe(BaseModel):
     difficulty_level: Optional[str] = Field(default="easy", description="Difficulty level")
 
 
+# Updates to recipe fields are checked against the same types a save is
+_RECIPE_FIELD_ADAPTERS = {name: TypeAdapter(field.annotation) for name, field in SnackRecipe.model_fields.items()}
+
+
 class SnackSaveRequest(BaseModel):
     recipe: SnackRecipe
     user_id: Optional[str] = Field(None, description="User identifier")
@@ -40,6 +51,18 @@ class SnackRatingRequest(BaseModel):
     user_id: Optional[str] = Field(None, description="User identifier")
 
 
+class SnackBatchSaveRequest(BaseModel):
+    snacks: List[SnackSaveRequest] = Field(..., min_length=1, max_length=100, description="Snacks to save")
+
+
+class SnackBulkUpdateRequest(BaseModel):
+    updates: List[SnackUpdateRequest] = Field(..., min_length=1, max_length=100, description="Snack updates to apply")
+
+
+class SnackBatchRatingRequest(BaseModel):
+    ratings: List[SnackRatingRequest] = Field(..., min_length=1, max_length=100, description="Ratings to save")
+
+
 class SnackSearchRequest(BaseModel):
     query: Optional[str] = Field(None, description="Search query")
     ingredients: Optional[List[str]] = Field(None, description="Must contain ingredients")
@@ -59,66 +82,69 @@ def get_ai_service(request: Request):
 
 
 snack_database = {}
+snack_index = SnackIndex()
+# user_id -> {snack_id: None}, an insertion-ordered set of favorites, and the reverse mapping
 user_favorites = {}
+favorited_by = {}
+# snack_id -> {user_id: rating record}, with a running rating total per snack
 snack_ratings = {}
+rating_sums = {}
 
 
-@router.post("/save")
+@router.post("/save", openapi_extra=json_body_openapi(SnackSaveRequest))
 async def save_snack_recipe(
-        request: SnackSaveRequest,
+        request: SnackSaveRequest = Depends(json_body(SnackSaveRequest)),
         nutrition_service=Depends(get_nutrition_service)
 ):
     try:
-        snack_id = str(uuid.uuid4())
-
-        nutrition_analysis = nutrition_service.calculate_snack_nutrition(
-            request.recipe.ingredients
+        nutrition_analysis = await run_in_threadpool(
+            nutrition_service.calculate_snack_nutrition, request.recipe.ingredients
         )
 
-        snack_record = {
-            "id": snack_id,
-            "name": request.recipe.name,
-            "description": request.recipe.description,
-            "ingredients": request.recipe.ingredients,
-            "instructions": request.recipe.instructions or [],
-            "tags": request.recipe.tags,
-            "prep_time_minutes": request.recipe.prep_time_minutes,
-            "servings": request.recipe.servings,
-            "difficulty_level": request.recipe.difficulty_level,
-            "nutrition_analysis": nutrition_analysis,
-            "health_score": nutrition_analysis["health_score"],
-            "created_date": datetime.now().isoformat(),
-            "updated_date": datetime.now().isoformat(),
-            "created_by": request.user_id,
-            "is_public": True,
-            "version": 1,
-            "rating_average": 0,
-            "rating_count": 0
-        }
+        return ORJSONResponse({
+            "success": True,
+            "data": _store_snack(request, nutrition_analysis, datetime.now().isoformat()),
+            "message": f"Snack '{request.recipe.name}' saved successfully"
+        })
 
-        snack_database[snack_id] = snack_record
+    except Exception as e:
+        logger.error(f"Save snack error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to save snack: {str(e)}")
 
-        if request.is_favorite and request.user_id:
-            if request.user_id not in user_favorites:
-                user_favorites[request.user_id] = []
-            user_favorites[request.user_id].append(snack_id)
 
-        return {
+@router.post("/save/batch", openapi_extra=json_body_openapi(SnackBatchSaveRequest))
+async def save_snack_recipes_batch(
+        request: SnackBatchSaveRequest = Depends(json_body(SnackBatchSaveRequest)),
+        nutrition_service=Depends(get_nutrition_service)
+):
+    try:
+        # One worker-thread hop for the whole batch rather than one per snack
+        nutrition_analyses = await run_in_threadpool(
+            nutrition_service.calculate_snack_nutrition_batch, [item.recipe.ingredients for item in request.snacks]
+        )
+
+        # The whole batch shares one timestamp
+        now_iso = datetime.now().isoformat()
+        saved = [
+            _store_snack(item, analysis, now_iso) for item, analysis in zip(request.snacks, nutrition_analyses)
+        ]
+
+        return ORJSONResponse({
             "success": True,
             "data": {
-                "snack_id": snack_id,
-                "snack": snack_record,
-                "added_to_favorites": request.is_favorite
+                "saved": saved,
+                "count": len(saved)
             },
-            "message": f"Snack '{request.recipe.name}' saved successfully"
-        }
+            "message": f"Saved {len(saved)} snacks successfully"
+        })
 
     except Exception as e:
-        logger.error(f"Save snack error: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Failed to save snack: {str(e)}")
+        logger.error(f"Batch save snack error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to save snacks: {str(e)}")
 
 
 @router.get("/library")
+@cached_response(maxsize=128)
 async def get_snack_library(
         user_id: Optional[str] = Query(None, description="User ID for personalized results"),
         limit: int = Query(20, ge=1, le=100, description="Number of snacks to return"),
@@ -128,28 +154,19 @@ async def get_snack_library(
         include_nutrition: bool = Query(True, description="Include nutrition analysis")
 ):
     try:
-        all_snacks = list(snack_database.values())
-
-        if user_id:
-            all_snacks = [s for s in all_snacks if s.get("created_by") == user_id]
-
-        if sort_by == "health_score":
-            all_snacks.sort(key=lambda x: x.get("health_score", 0), reverse=reverse_sort)
-        elif sort_by == "rating":
-            all_snacks.sort(key=lambda x: x.get("rating_average", 0), reverse=reverse_sort)
-        elif sort_by == "name":
-            all_snacks.sort(key=lambda x: x.get("name", ""), reverse=reverse_sort)
-        else:  # created_date
-            all_snacks.sort(key=lambda x: x.get("created_date", ""), reverse=reverse_sort)
-
-        total_count = len(all_snacks)
-        paginated_snacks = all_snacks[offset:offset + limit]
+        order_field = sort_by if sort_by in ORDER_FIELDS else "created_date"
+        # A user's library sorts only their own snacks rather than filtering the whole ordering
+        user_snack_ids = snack_index.by_creator.get(user_id, set()) if user_id else None
+        ordered_ids = snack_index.ordered(order_field, descending=sort_order == "desc", snack_ids=user_snack_ids)
+        total_count = len(user_snack_ids) if user_id else len(snack_index)
+        paginated_snacks = [
+            snack_database[snack_id] for snack_id in itertools.islice(ordered_ids, offset, offset + limit)
+        ]
 
         if not include_nutrition:
-            for snack in paginated_snacks:
-                snack.pop("nutrition_analysis", None)
+            paginated_snacks = [_snack_view(snack, include_nutrition=False) for snack in paginated_snacks]
 
-        return {
+        return ORJSONResponse({
             "success": True,
             "data": {
                 "snacks": paginated_snacks,
@@ -166,13 +183,44 @@ async def get_snack_library(
                 }
             },
             "message": f"Retrieved {len(paginated_snacks)} snacks"
-        }
+        })
 
     except Exception as e:
         logger.error(f"Get library error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to retrieve library: {str(e)}")
 
 
+# Registered ahead of /{snack_id}, which would otherwise capture "trending" as an id
+@router.get("/trending")
+@cached_response(expire=60, maxsize=128)
+async def get_trending_snacks(
+        period_days: int = Query(7, ge=1, le=365, description="Period in days"),
+        limit: int = Query(10, ge=1, le=50, description="Number of snacks to return")
+):
+    try:
+        cutoff_date = datetime.now() - timedelta(days=period_days)
+
+        # Scored column-wise over the index; only the top entries get a view built
+        trending_snacks = [
+            _snack_view(snack_database[snack_id], trend_score=trend_score)
+            for snack_id, trend_score in snack_index.trending(cutoff_date, limit)
+        ]
+
+        return ORJSONResponse({
+            "success": True,
+            "data": {
+                "trending_snacks": trending_snacks,
+                "period_days": period_days,
+                "count": len(trending_snacks)
+            },
+            "message": f"Retrieved {len(trending_snacks)} trending snacks"
+        })
+
+    except Exception as e:
+        logger.error(f"Get trending error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to get trending snacks: {str(e)}")
+
+
 @router.get("/{snack_id}")
 async def get_snack_details(
         snack_id: str,
@@ -183,14 +231,14 @@ async def get_snack_details(
         if snack_id not in snack_database:
             raise HTTPException(status_code=404, detail="Snack not found")
 
-        snack = snack_database[snack_id].copy()
+        snack = snack_database[snack_id]
 
         if user_id:
-            snack["is_favorite"] = (
-                    user_id in user_favorites and
-                    snack_id in user_favorites[user_id]
+            snack = _snack_view(
+                snack,
+                is_favorite=snack_id in user_favorites.get(user_id, ()),
+                user_rating=_get_user_rating(snack_id, user_id)
             )
-            snack["user_rating"] = _get_user_rating(snack_id, user_id)
 
         response_data = {"snack": snack}
 
@@ -198,11 +246,11 @@ async def get_snack_details(
             similar_snacks = _find_similar_snacks(snack, limit=5)
             response_data["similar_snacks"] = similar_snacks
 
-        return {
+        return ORJSONResponse({
             "success": True,
             "data": response_data,
             "message": f"Retrieved snack '{snack['name']}'"
-        }
+        })
 
     except HTTPException:
         raise
@@ -211,104 +259,83 @@ async def get_snack_details(
         raise HTTPException(status_code=500, detail=f"Failed to get snack details: {str(e)}")
 
 
-@router.post("/search")
+@router.post("/search", openapi_extra=json_body_openapi(SnackSearchRequest))
 async def search_snacks(
-        request: SnackSearchRequest,
+        request: SnackSearchRequest = Depends(json_body(SnackSearchRequest)),
+        echo_criteria: bool = Query(False, description="Include the search criteria in the response"),
         nutrition_service=Depends(get_nutrition_service)
 ):
     try:
-        all_snacks = list(snack_database.values())
-        filtered_snacks = []
-
-        for snack in all_snacks:
-            if request.query:
-                query_lower = request.query.lower()
-                if not any(query_lower in field.lower() for field in [
-                    snack.get("name", ""),
-                    snack.get("description", ""),
-                    " ".join(snack.get("tags", []))
-                ]):
-                    continue
-
-            if request.ingredients:
-                snack_ingredients = [ing["name"] for ing in snack["ingredients"]]
-                if not all(req_ing in snack_ingredients for req_ing in request.ingredients):
-                    continue
-
-            if request.exclude_ingredients:
-                snack_ingredients = [ing["name"] for ing in snack["ingredients"]]
-                if any(excl_ing in snack_ingredients for excl_ing in request.exclude_ingredients):
-                    continue
-
-            if request.dietary_restrictions:
-                if not _meets_dietary_restrictions(snack, request.dietary_restrictions):
-                    continue
-
-            if request.max_prep_time:
-                prep_time = snack.get("prep_time_minutes", 0)
-                if prep_time > request.max_prep_time:
-                    continue
-
-            if request.min_health_score:
-                health_score = snack.get("health_score", 0)
-                if health_score < request.min_health_score:
-                    continue
-
-            if request.tags:
-                snack_tags = snack.get("tags", [])
-                if not all(req_tag in snack_tags for req_tag in request.tags):
-                    continue
-
-            filtered_snacks.append(snack)
-
-        filtered_snacks.sort(key=lambda x: x.get("health_score", 0), reverse=True)
-
-        return {
+        # Every filter is answered by the index, cheapest and most selective first: ingredient and tag
+        # sets, then numeric bounds and dietary rules as column masks, then the text match; only
+        # survivors are sorted and hydrated
+        candidate_ids = snack_index.candidates(request.ingredients, request.tags, request.exclude_ingredients)
+        scalar_ids = snack_index.scalar_matches(
+            min_health_score=request.min_health_score or None,
+            max_prep_time=request.max_prep_time or None
+        )
+        if scalar_ids is not None:
+            candidate_ids = scalar_ids if candidate_ids is None else candidate_ids & scalar_ids
+        dietary_rules = _dietary_rules(request.dietary_restrictions or [])
+        if dietary_rules is not None:
+            dietary_ids = snack_index.dietary_matches(*dietary_rules)
+            candidate_ids = dietary_ids if candidate_ids is None else candidate_ids & dietary_ids
+        if request.query:
+            candidate_ids = snack_index.text_matches(request.query.lower(), candidate_ids)
+
+        filtered_snacks = [
+            snack_database[snack_id]
+            for snack_id in snack_index.ordered("health_score", descending=True, snack_ids=candidate_ids)
+        ]
+
+        response_data = {
+            "snacks": filtered_snacks,
+            "results_count": len(filtered_snacks)
+        }
+        if echo_criteria:
+            response_data["search_criteria"] = request.model_dump()
+
+        return ORJSONResponse({
             "success": True,
-            "data": {
-                "snacks": filtered_snacks,
-                "search_criteria": request.dict(),
-                "results_count": len(filtered_snacks)
-            },
+            "data": response_data,
             "message": f"Found {len(filtered_snacks)} matching snacks"
-        }
+        })
 
     except Exception as e:
         logger.error(f"Search snacks error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
 
 
-@router.put("/update")
+@router.put("/update", openapi_extra=json_body_openapi(SnackUpdateRequest))
 async def update_snack(
-        request: SnackUpdateRequest,
+        request: SnackUpdateRequest = Depends(json_body(SnackUpdateRequest)),
         nutrition_service=Depends(get_nutrition_service)
 ):
     try:
         if request.snack_id not in snack_database:
             raise HTTPException(status_code=404, detail="Snack not found")
 
-        snack = snack_database[request.snack_id]
+        updates = _allowed_updates(request.updates)
 
-        for field, value in request.updates.items():
-            if field in ["id", "created_date", "created_by"]:
-                continue  # Don't allow updating these fields
-            snack[field] = value
-
-        if "ingredients" in request.updates:
-            nutrition_analysis = nutrition_service.calculate_snack_nutrition(
-                snack["ingredients"]
+        # Handlers only touch the store on the event loop, so the record is changed in one step after
+        # the only await; other requests never see it half-updated and no lock is needed
+        if "ingredients" in updates:
+            nutrition_analysis = await run_in_threadpool(
+                nutrition_service.calculate_snack_nutrition, updates["ingredients"]
             )
-            snack["nutrition_analysis"] = nutrition_analysis
-            snack["health_score"] = nutrition_analysis["health_score"]
+            if request.snack_id not in snack_database:
+                raise HTTPException(status_code=404, detail="Snack not found")
+            updates["nutrition_analysis"] = nutrition_analysis
+            updates["health_score"] = nutrition_analysis["health_score"]
 
-        snack["updated_date"] = datetime.now().isoformat()
-        snack["version"] = snack.get("version", 1) + 1
+        snack = _apply_update(request.snack_id, updates, datetime.now().isoformat())
+        _invalidate_listings()
 
-        return {
+        return ORJSONResponse({
             "success": True,
             "data": {"snack": snack},
             "message": f"Snack '{snack['name']}' updated successfully"
-        }
+        })
 
     except HTTPException:
         raise
@@ -317,6 +344,58 @@ async def update_snack(
         raise HTTPException(status_code=500, detail=f"Failed to update snack: {str(e)}")
 
 
+@router.put("/update/bulk", openapi_extra=json_body_openapi(SnackBulkUpdateRequest))
+async def update_snacks_bulk(
+        request: SnackBulkUpdateRequest = Depends(json_body(SnackBulkUpdateRequest)),
+        nutrition_service=Depends(get_nutrition_service)
+):
+    try:
+        # Checked up front, and again after the await, so a batch is applied entirely or not at all
+        missing = [item.snack_id for item in request.updates if item.snack_id not in snack_database]
+        if missing:
+            raise HTTPException(status_code=404, detail=f"Snacks not found: {', '.join(missing)}")
+
+        updates = [
+            _allowed_updates(item.updates, ("body", "updates", position, "updates"))
+            for position, item in enumerate(request.updates)
+        ]
+
+        # Every changed ingredient list is analyzed in one worker-thread hop
+        recalculated = [position for position, item_updates in enumerate(updates) if "ingredients" in item_updates]
+        if recalculated:
+            nutrition_analyses = await run_in_threadpool(
+                nutrition_service.calculate_snack_nutrition_batch,
+                [updates[position]["ingredients"] for position in recalculated]
+            )
+            missing = [item.snack_id for item in request.updates if item.snack_id not in snack_database]
+            if missing:
+                raise HTTPException(status_code=404, detail=f"Snacks not found: {', '.join(missing)}")
+            for position, nutrition_analysis in zip(recalculated, nutrition_analyses):
+                updates[position]["nutrition_analysis"] = nutrition_analysis
+                updates[position]["health_score"] = nutrition_analysis["health_score"]
+
+        now_iso = datetime.now().isoformat()
+        snacks = _apply_updates(
+            [(item.snack_id, item_updates) for item, item_updates in zip(request.updates, updates)], now_iso
+        )
+        _invalidate_listings()
+
+        return ORJSONResponse({
+            "success": True,
+            "data": {
+                "snacks": snacks,
+                "count": len(snacks)
+            },
+            "message": f"Updated {len(snacks)} snacks successfully"
+        })
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Bulk update snack error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to update snacks: {str(e)}")
+
+
 @router.delete("/{snack_id}")
 async def delete_snack(
         snack_id: str,
@@ -332,18 +411,20 @@ async def delete_snack(
             raise HTTPException(status_code=403, detail="Not authorized to delete this snack")
 
         deleted_snack = snack_database.pop(snack_id)
+        snack_index.remove(snack_id)
 
-        for user_favs in user_favorites.values():
-            if snack_id in user_favs:
-                user_favs.remove(snack_id)
+        for favorite_user_id in favorited_by.pop(snack_id, ()):
+            del user_favorites[favorite_user_id][snack_id]
 
         snack_ratings.pop(snack_id, None)
+        rating_sums.pop(snack_id, None)
+        _invalidate_listings()
 
-        return {
+        return ORJSONResponse({
             "success": True,
             "data": {"deleted_snack_name": deleted_snack["name"]},
             "message": f"Snack '{deleted_snack['name']}' deleted successfully"
-        }
+        })
 
     except HTTPException:
         raise
@@ -352,52 +433,59 @@ async def delete_snack(
         raise HTTPException(status_code=500, detail=f"Failed to delete snack: {str(e)}")
 
 
-@router.post("/rate")
-async def rate_snack(request: SnackRatingRequest):
+@router.post("/rate", openapi_extra=json_body_openapi(SnackRatingRequest))
+async def rate_snack(request: SnackRatingRequest = Depends(json_body(SnackRatingRequest))):
     try:
         if request.snack_id not in snack_database:
             raise HTTPException(status_code=404, detail="Snack not found")
 
-        if request.snack_id not in snack_ratings:
-            snack_ratings[request.snack_id] = []
+        result = _apply_rating(request, datetime.now().isoformat())
+        snack_index.add(snack_database[request.snack_id])
+        _invalidate_listings()
 
-        rating_record = {
-            "user_id": request.user_id,
-            "rating": request.rating,
-            "review": request.review,
-            "created_date": datetime.now().isoformat()
-        }
+        return ORJSONResponse({
+            "success": True,
+            "data": result,
+            "message": "Rating saved successfully"
+        })
 
-        user_rating_index = None
-        for i, rating in enumerate(snack_ratings[request.snack_id]):
-            if rating.get("user_id") == request.user_id:
-                user_rating_index = i
-                break
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Rate snack error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to rate snack: {str(e)}")
 
-        if user_rating_index is not None:
-            snack_ratings[request.snack_id][user_rating_index] = rating_record
-        else:
-            snack_ratings[request.snack_id].append(rating_record)
 
-        all_ratings = [r["rating"] for r in snack_ratings[request.snack_id]]
-        snack_database[request.snack_id]["rating_average"] = sum(all_ratings) / len(all_ratings)
-        snack_database[request.snack_id]["rating_count"] = len(all_ratings)
+@router.post("/rate/batch", openapi_extra=json_body_openapi(SnackBatchRatingRequest))
+async def rate_snacks_batch(request: SnackBatchRatingRequest = Depends(json_body(SnackBatchRatingRequest))):
+    try:
+        # Checked up front so a batch is applied entirely or not at all
+        missing = [item.snack_id for item in request.ratings if item.snack_id not in snack_database]
+        if missing:
+            raise HTTPException(status_code=404, detail=f"Snacks not found: {', '.join(missing)}")
+
+        now_iso = datetime.now().isoformat()
+        results = [_apply_rating(item, now_iso) for item in request.ratings]
+
+        # Each rated snack is reindexed once, however many ratings it received
+        for snack_id in dict.fromkeys(item.snack_id for item in request.ratings):
+            snack_index.add(snack_database[snack_id])
+        _invalidate_listings()
 
-        return {
+        return ORJSONResponse({
             "success": True,
             "data": {
-                "rating": rating_record,
-                "new_average": snack_database[request.snack_id]["rating_average"],
-                "total_ratings": len(all_ratings)
+                "ratings": results,
+                "count": len(results)
             },
-            "message": "Rating saved successfully"
-        }
+            "message": f"Saved {len(results)} ratings successfully"
+        })
 
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Rate snack error: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Failed to rate snack: {str(e)}")
+        logger.error(f"Batch rate snack error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to rate snacks: {str(e)}")
 
 
 @router.post("/{snack_id}/favorite")
@@ -409,27 +497,27 @@ async def toggle_favorite(
         if snack_id not in snack_database:
             raise HTTPException(status_code=404, detail="Snack not found")
 
-        if user_id not in user_favorites:
-            user_favorites[user_id] = []
-
-        is_favorite = snack_id in user_favorites[user_id]
+        favorites = user_favorites.setdefault(user_id, {})
+        is_favorite = snack_id in favorites
 
         if is_favorite:
-            user_favorites[user_id].remove(snack_id)
+            del favorites[snack_id]
+            _discard_favorited_by(snack_id, user_id)
             action = "removed from"
         else:
-            user_favorites[user_id].append(snack_id)
+            favorites[snack_id] = None
+            favorited_by.setdefault(snack_id, set()).add(user_id)
             action = "added to"
 
-        return {
+        return ORJSONResponse({
             "success": True,
             "data": {
                 "snack_id": snack_id,
                 "is_favorite": not is_favorite,
-                "favorites_count": len(user_favorites[user_id])
+                "favorites_count": len(favorites)
             },
             "message": f"Snack {action} favorites"
-        }
+        })
 
     except HTTPException:
         raise
@@ -444,69 +532,27 @@ async def get_user_favorites(
         include_nutrition: bool = Query(True, description="Include nutrition analysis")
 ):
     try:
-        favorite_ids = user_favorites.get(user_id, [])
+        favorite_ids = user_favorites.get(user_id, {})
         favorite_snacks = []
 
         for snack_id in favorite_ids:
             if snack_id in snack_database:
-                snack = snack_database[snack_id].copy()
-                if not include_nutrition:
-                    snack.pop("nutrition_analysis", None)
-                favorite_snacks.append(snack)
+                favorite_snacks.append(_snack_view(snack_database[snack_id], include_nutrition))
 
-        return {
+        return ORJSONResponse({
             "success": True,
             "data": {
                 "favorites": favorite_snacks,
                 "count": len(favorite_snacks)
             },
             "message": f"Retrieved {len(favorite_snacks)} favorite snacks"
-        }
+        })
 
     except Exception as e:
         logger.error(f"Get favorites error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to get favorites: {str(e)}")
 
 
-@router.get("/trending")
-async def get_trending_snacks(
-        period_days: int = Query(7, ge=1, le=365, description="Period in days"),
-        limit: int = Query(10, ge=1, le=50, description="Number of snacks to return")
-):
-    try:
-        cutoff_date = datetime.now() - timedelta(days=period_days)
-
-        trending_snacks = []
-        for snack in snack_database.values():
-            created_date = datetime.fromisoformat(snack["created_date"].replace('Z', '+00:00'))
-            if created_date >= cutoff_date:
-                trend_score = (
-                        snack.get("rating_average", 0) * 20 +
-                        snack.get("health_score", 0) * 0.5 +
-                        snack.get("rating_count", 0) * 5
-                )
-                snack_copy = snack.copy()
-                snack_copy["trend_score"] = trend_score
-                trending_snacks.append(snack_copy)
-
-        trending_snacks.sort(key=lambda x: x["trend_score"], reverse=True)
-        trending_snacks = trending_snacks[:limit]
-
-        return {
-            "success": True,
-            "data": {
-                "trending_snacks": trending_snacks,
-                "period_days": period_days,
-                "count": len(trending_snacks)
-            },
-            "message": f"Retrieved {len(trending_snacks)} trending snacks"
-        }
-
-    except Exception as e:
-        logger.error(f"Get trending error: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Failed to get trending snacks: {str(e)}")
-
-
 @router.post("/{snack_id}/duplicate")
 async def duplicate_snack(
         snack_id: str,
@@ -519,14 +565,15 @@ async def duplicate_snack(
 
         original_snack = snack_database[snack_id]
 
-        new_snack_id = str(uuid.uuid4())
+        new_snack_id = uuid.uuid4().hex
         duplicate_snack = original_snack.copy()
+        now_iso = datetime.now().isoformat()
 
         duplicate_snack.update({
             "id": new_snack_id,
             "name": original_snack["name"] + name_suffix,
-            "created_date": datetime.now().isoformat(),
-            "updated_date": datetime.now().isoformat(),
+            "created_date": now_iso,
+            "updated_date": now_iso,
             "created_by": user_id,
             "version": 1,
             "rating_average": 0,
@@ -534,8 +581,10 @@ async def duplicate_snack(
         })
 
         snack_database[new_snack_id] = duplicate_snack
+        snack_index.add(duplicate_snack)
+        _invalidate_listings()
 
-        return {
+        return ORJSONResponse({
             "success": True,
             "data": {
                 "original_snack_id": snack_id,
@@ -543,7 +592,7 @@ async def duplicate_snack(
                 "duplicate_snack": duplicate_snack
             },
             "message": f"Snack duplicated as '{duplicate_snack['name']}'"
-        }
+        })
 
     except HTTPException:
         raise
@@ -553,81 +602,189 @@ async def duplicate_snack(
 
 
 
-def _get_user_rating(snack_id: str, user_id: str) -> Optional[Dict[str, Any]]:
-    if snack_id not in snack_ratings:
-        return None
+def _snack_view(snack: Dict[str, Any], include_nutrition: bool = True, **extra_fields) -> Dict[str, Any]:
+    """Response view of a stored snack; the record itself when nothing is dropped or added.
+    Views are read-only, so callers must never mutate what this returns"""
+    if include_nutrition:
+        return {**snack, **extra_fields} if extra_fields else snack
 
-    for rating in snack_ratings[snack_id]:
-        if rating.get("user_id") == user_id:
-            return rating
+    view = {field: value for field, value in snack.items() if field != "nutrition_analysis"}
+    view.update(extra_fields)
+    return view
 
-    return None
 
+def _get_user_rating(snack_id: str, user_id: str) -> Optional[Dict[str, Any]]:
+    return snack_ratings.get(snack_id, {}).get(user_id)
 
-def _find_similar_snacks(target_snack: Dict[str, Any], limit: int = 5) -> List[Dict[str, Any]]:
-    target_ingredients = set(ing["name"] for ing in target_snack["ingredients"])
-    target_tags = set(target_snack.get("tags", []))
-    target_health_score = target_snack.get("health_score", 0)
 
+def _find_similar_snacks(target_snack: Dict[str, Any], limit: int = 5) -> List[Dict[str, Any]]:
     similar_snacks = []
-
-    for snack_id, snack in snack_database.items():
-        if snack_id == target_snack["id"]:
+    for snack_id, similarity_score in snack_index.similar(target_snack["id"], limit):
+        similar_snacks.append(_snack_view(snack_database[snack_id], similarity_score=similarity_score))
+
+    return similar_snacks
+
+
+def _store_snack(request: SnackSaveRequest, nutrition_analysis: Dict[str, Any], now_iso: str) -> Dict[str, Any]:
+    """Build, store and index a new snack record; returns the save response data"""
+    snack_id = uuid.uuid4().hex
+
+    snack_record = {
+        "id": snack_id,
+        "name": request.recipe.name,
+        "description": request.recipe.description,
+        "ingredients": request.recipe.ingredients,
+        "instructions": request.recipe.instructions or [],
+        "tags": request.recipe.tags,
+        "prep_time_minutes": request.recipe.prep_time_minutes,
+        "servings": request.recipe.servings,
+        "difficulty_level": request.recipe.difficulty_level,
+        "nutrition_analysis": nutrition_analysis,
+        "health_score": nutrition_analysis["health_score"],
+        "created_date": now_iso,
+        "updated_date": now_iso,
+        "created_by": request.user_id,
+        "is_public": True,
+        "version": 1,
+        "rating_average": 0,
+        "rating_count": 0
+    }
+
+    snack_database[snack_id] = snack_record
+    snack_index.add(snack_record)
+    _invalidate_listings()
+
+    if request.is_favorite and request.user_id:
+        user_favorites.setdefault(request.user_id, {})[snack_id] = None
+        favorited_by.setdefault(snack_id, set()).add(request.user_id)
+
+    return {
+        "snack_id": snack_id,
+        "snack": snack_record,
+        "added_to_favorites": request.is_favorite
+    }
+
+
+def _discard_favorited_by(snack_id: str, user_id: str):
+    users = favorited_by.get(snack_id)
+    if users is not None:
+        users.discard(user_id)
+        if not users:
+            del favorited_by[snack_id]
+
+
+def _allowed_updates(updates: Dict[str, Any], loc: Tuple = ("body", "updates")) -> Dict[str, Any]:
+    """Updatable fields, with recipe fields validated like a saved recipe; raises 422 on invalid values"""
+    allowed = {}
+    errors = []
+    for field, value in updates.items():
+        if field in ("id", "created_date", "created_by"):  # Don't allow updating these fields
             continue
+        adapter = _RECIPE_FIELD_ADAPTERS.get(field)
+        if adapter is None:
+            allowed[field] = value
+            continue
+        try:
+            allowed[field] = adapter.validate_python(value)
+        except ValidationError as e:
+            errors.extend(
+                {**error, "loc": (*loc, field, *error["loc"])}
+                for error in e.errors(include_url=False, include_context=False)
+            )
+
+    if errors:
+        raise HTTPException(status_code=422, detail=errors)
+    return allowed
+
+
+def _apply_update(snack_id: str, updates: Dict[str, Any], now_iso: str) -> Dict[str, Any]:
+    """Apply already validated field updates to a stored snack and reindex it. The new record is
+    indexed before it replaces the stored one, and indexing a record either succeeds or changes
+    nothing, so a failed update leaves both the store and the index as they were"""
+    previous = snack_database[snack_id]
+    snack = {**previous, **updates, "updated_date": now_iso, "version": previous.get("version", 1) + 1}
+    snack_index.add(snack)
+    snack_database[snack_id] = snack
+    return snack
 
-        snack_ingredients = set(ing["name"] for ing in snack["ingredients"])
-        snack_tags = set(snack.get("tags", []))
-
-        ingredient_similarity = len(target_ingredients & snack_ingredients) / len(
-            target_ingredients | snack_ingredients) if target_ingredients | snack_ingredients else 0
-
-        tag_similarity = len(target_tags & snack_tags) / len(
-            target_tags | snack_tags) if target_tags | snack_tags else 0
-
-        health_diff = abs(target_health_score - snack.get("health_score", 0))
-        health_similarity = max(0, 1 - (health_diff / 100))
-
-        similarity_score = (ingredient_similarity * 0.5 + tag_similarity * 0.3 + health_similarity * 0.2)
-
-        snack_copy = snack.copy()
-        snack_copy["similarity_score"] = similarity_score
-        similar_snacks.append(snack_copy)
-
-    similar_snacks.sort(key=lambda x: x["similarity_score"], reverse=True)
-    return similar_snacks[:limit]
-
-
-def _meets_dietary_restrictions(snack: Dict[str, Any], restrictions: List[str]) -> bool:
-    nutrition_analysis = snack.get("nutrition_analysis", {})
-    allergens = set(nutrition_analysis.get("allergens", []))
-
-    for restriction in restrictions:
-        if restriction == "vegan":
-            if any(allergen in allergens for allergen in ["milk", "eggs", "honey"]):
-                return False
-        elif restriction == "vegetarian":
-            pass
-        elif restriction == "gluten_free":
-            if "gluten" in allergens:
-                return False
-        elif restriction == "nut_free":
-            if any("nut" in allergen for allergen in allergens):
-                return False
-        elif restriction == "dairy_free":
-            if "milk" in allergens:
-                return False
-        elif restriction == "soy_free":
-            if "soy" in allergens:
-                return False
-        elif restriction == "keto":
-            nutrition = nutrition_analysis.get("nutrition_per_100g", {})
-            carbs = nutrition.get("carbohydrates_g", 0)
-            if carbs > 20:
-                return False
-        elif restriction == "low_sugar":
-            nutrition = nutrition_analysis.get("nutrition_per_100g", {})
-            sugar = nutrition.get("sugars_g", 0)
-            if sugar > 15:
-                return False
-
-    return True
\ No newline at end of file
+
+def _apply_updates(items: List[Tuple[str, Dict[str, Any]]], now_iso: str) -> List[Dict[str, Any]]:
+    """Apply several updates all or nothing; when one fails the ones before it are rolled back"""
+    replaced = []
+    snacks = []
+    try:
+        for snack_id, updates in items:
+            previous = snack_database[snack_id]
+            snacks.append(_apply_update(snack_id, updates, now_iso))
+            replaced.append(previous)
+    except Exception:
+        # Restored newest first, so a snack updated twice ends up with its original record
+        for previous in reversed(replaced):
+            snack_index.add(previous)
+            snack_database[previous["id"]] = previous
+        raise
+    return snacks
+
+
+def _invalidate_listings():
+    """Drop cached library and trending responses after any change to snacks or their ratings"""
+    get_snack_library.cache_clear()
+    get_trending_snacks.cache_clear()
+
+
+def _apply_rating(request: SnackRatingRequest, now_iso: str) -> Dict[str, Any]:
+    """Record a rating and update the snack's aggregates; the caller reindexes the snack"""
+    ratings = snack_ratings.setdefault(request.snack_id, {})
+
+    rating_record = {
+        "user_id": request.user_id,
+        "rating": request.rating,
+        "review": request.review,
+        "created_date": now_iso
+    }
+
+    # A user's new rating replaces their previous one in place
+    previous_rating = ratings.get(request.user_id)
+    ratings[request.user_id] = rating_record
+    rating_sums[request.snack_id] = (
+        rating_sums.get(request.snack_id, 0) + request.rating
+        - (previous_rating["rating"] if previous_rating else 0)
+    )
+
+    snack = snack_database[request.snack_id]
+    snack["rating_average"] = rating_sums[request.snack_id] / len(ratings)
+    snack["rating_count"] = len(ratings)
+
+    return {
+        "rating": rating_record,
+        "new_average": snack["rating_average"],
+        "total_ratings": len(ratings)
+    }
+
+
+def _dietary_rules(restrictions: List[str]) -> Optional[Tuple[Callable[[str], bool], Dict[str, float]]]:
+    """Combined allergen test and per-100g limits for the requested restrictions, or None when
+    none of them rules anything out; unknown restrictions are ignored"""
+    rules = [_DIETARY_RULES[restriction] for restriction in restrictions if restriction in _DIETARY_RULES]
+    allergen_checks = [check for check, _ in rules if check is not None]
+    max_per_100g: Dict[str, float] = {}
+    for _, limits in rules:
+        for nutrient, limit in limits.items():
+            max_per_100g[nutrient] = min(limit, max_per_100g.get(nutrient, limit))
+
+    if not allergen_checks and not max_per_100g:
+        return None
+    return (lambda allergen: any(check(allergen) for check in allergen_checks)), max_per_100g
+
+
+# Restriction -> (which allergens it rules out, per-100g nutrient limits)
+_DIETARY_RULES: Dict[str, Tuple[Optional[Callable[[str], bool]], Dict[str, float]]] = {
+    "vegan": (lambda allergen: allergen in ("milk", "eggs", "honey"), {}),
+    "vegetarian": (None, {}),
+    "gluten_free": (lambda allergen: allergen == "gluten", {}),
+    "nut_free": (lambda allergen: "nut" in allergen, {}),
+    "dairy_free": (lambda allergen: allergen == "milk", {}),
+    "soy_free": (lambda allergen: allergen == "soy", {}),
+    "keto": (None, {"carbohydrates_g": 20}),
+    "low_sugar": (None, {"sugars_g": 15})
+}
\ No newline at end of file
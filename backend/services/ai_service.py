@@ -1,23 +1,213 @@
 import logging
-from typing import Dict, List, Any, Optional
+from typing import AsyncIterator, Dict, List, Any, Optional, Tuple, Type, TypeVar
 import json
 import asyncio
+import re
+import time
+from collections import deque
+from functools import lru_cache
+import numpy as np
+from pydantic import BaseModel, Field, ValidationError
+from starlette.concurrency import run_in_threadpool
 from services.nutrition_service import NutritionService
+from utils.semantic_cache import SemanticCache, normalized_text
 
 logger = logging.getLogger(__name__)
 
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+DEFAULT_OPENAI_MODEL = "gpt-4o-mini"
+# Seconds per attempt; a slow completion falls back to the rule-based answer instead of holding the request
+_OPENAI_TIMEOUT = 30.0
+_OPENAI_CONNECT_TIMEOUT = 5.0
+_OPENAI_MAX_RETRIES = 2
+
+_ANTIOXIDANT_GOALS = frozenset({"antioxidant_rich", "increase_antioxidants"})
+_KETO_DROP = frozenset({"oats", "dates"})
+
+_EXPLANATION_FIELDS = ("protein_g", "fiber_g", "sugars_g", "sodium_mg")
+
+# Checked in order; each pattern matches its keywords anywhere in the message, as substrings
+_CHAT_TOPICS = (
+    (re.compile("protein|muscle|workout"),
+     "Protein is essential for muscle building and repair. For snacks, aim for 15-20g protein. Great sources include protein powder, Greek yogurt, nuts, seeds, and legumes. Post-workout snacks should combine protein with some carbs for optimal recovery."),
+    (re.compile("sugar|sweet|diabetes"),
+     "Natural sugars from fruits like dates are generally better than refined sugars because they come with fiber and nutrients. Try pairing sweet ingredients with protein and fiber to slow sugar absorption. For diabetic-friendly options, focus on low-glycemic ingredients like nuts, seeds, and berries."),
+    (re.compile("fiber|digestion|gut"),
+     "Fiber is crucial for digestive health and helps you feel full longer. Aim for 25-35g daily total. Great snack sources include chia seeds (10g per 2 tbsp), flax seeds, oats, and berries. Start slowly if increasing fiber intake to avoid digestive discomfort."),
+    (re.compile("fat|healthy|omega"),
+     "Healthy fats from nuts, seeds, avocados, and olive oil provide sustained energy and help absorb fat-soluble vitamins. Omega-3 fatty acids from chia seeds, walnuts, and flax are especially beneficial for brain and heart health."),
+    (re.compile("energy|tired|boost"),
+     "For sustained energy, combine complex carbs with protein and healthy fats. Avoid simple sugars that cause energy crashes. Great energizing combinations include nuts with fruit, oats with protein powder, or seeds with berries."),
+    (re.compile("weight|lose|diet"),
+     "For weight management, focus on nutrient-dense, high-fiber, high-protein snacks that keep you satisfied. Examples include protein balls, veggie sticks with nut butter, or Greek yogurt with berries. Portion control is key - aim for 150-200 calorie snacks."),
+    (re.compile("antioxidant|inflammation|health"),
+     "Antioxidants help fight inflammation and protect cells. The best sources for snacks include berries (especially blueberries), dark chocolate (70%+ cacao), nuts, seeds, and colorful fruits and vegetables."),
+    (re.compile("calcium|bone|strong"),
+     "Calcium is essential for bone health. Good snack sources include almonds, sesame seeds (tahini), leafy greens, and fortified plant milks. Pair with vitamin D for better absorption."),
+    (re.compile("iron|anemia|energy"),
+     "Iron supports oxygen transport and energy levels. Plant-based sources for snacks include pumpkin seeds, dark chocolate, quinoa, and dried fruits. Pair with vitamin C (like citrus) to enhance absorption."),
+)
+
+_EMPTY_CHAT_REPLY = "I'm here to help with your nutrition questions! What would you like to know?"
+
+_CHAT_INSTRUCTIONS = "You are a friendly nutritionist helping people design healthy snacks. Answer in a short paragraph."
+
+_DEFAULT_CHAT_REPLY = "That's a great nutrition question! I'd recommend focusing on whole food ingredients and balanced macronutrients for the healthiest snacks. What specific aspect of nutrition would you like to explore further?"
+
+# Fallback substitutes per ingredient, best first
+_SUBSTITUTION_MAP: Dict[str, Tuple[Tuple[str, str], ...]] = {
+    "almonds": (
+        ("walnuts", "Similar healthy fats and protein"),
+        ("cashews", "Creamy texture with good nutrition"),
+        ("sunflower_seeds", "Nut-free alternative with protein")
+    ),
+    "walnuts": (
+        ("almonds", "Similar protein and healthy fats"),
+        ("pecans", "Similar texture and omega-3s"),
+        ("chia_seeds", "Omega-3 rich alternative")
+    ),
+    "cashews": (
+        ("almonds", "Similar protein content"),
+        ("sunflower_seeds", "Nut-free option with minerals"),
+        ("coconut_flakes", "Creamy texture alternative")
+    ),
+    "dates": (
+        ("maple_syrup", "Natural liquid sweetener"),
+        ("honey", "Natural sweetener with enzymes"),
+        ("banana", "Natural fruit sweetness with potassium")
+    ),
+    "honey": (
+        ("maple_syrup", "Plant-based liquid sweetener"),
+        ("dates", "Whole food sweetener with fiber"),
+        ("coconut_nectar", "Low glycemic natural sweetener")
+    ),
+    "maple_syrup": (
+        ("honey", "Similar consistency and sweetness"),
+        ("dates", "Whole food alternative"),
+        ("coconut_nectar", "Similar liquid sweetener")
+    ),
+    "oats": (
+        ("quinoa", "Gluten-free grain with complete protein"),
+        ("buckwheat", "Gluten-free with similar texture"),
+        ("coconut_flakes", "Low-carb alternative")
+    ),
+    "quinoa": (
+        ("oats", "Similar hearty texture"),
+        ("millet", "Ancient grain with mild flavor"),
+        ("buckwheat", "Gluten-free grain alternative")
+    ),
+    "protein_powder_whey": (
+        ("protein_powder_plant", "Plant-based protein alternative"),
+        ("greek_yogurt_powder", "Natural protein source"),
+        ("hemp_protein", "Complete amino acid profile")
+    ),
+    "protein_powder_plant": (
+        ("protein_powder_whey", "Complete protein source"),
+        ("hemp_protein", "Raw plant protein option"),
+        ("spirulina", "Superfood protein source")
+    ),
+    "chia_seeds": (
+        ("flax_seeds", "Similar omega-3 and fiber content"),
+        ("hemp_seeds", "Protein-rich seed alternative"),
+        ("sesame_seeds", "Calcium-rich alternative")
+    ),
+    "flax_seeds": (
+        ("chia_seeds", "Similar omega-3 benefits"),
+        ("hemp_seeds", "Nutty flavor with protein"),
+        ("sunflower_seeds", "Vitamin E rich alternative")
+    ),
+    "coconut_flakes": (
+        ("almonds", "Similar healthy fats"),
+        ("cashews", "Creamy texture alternative"),
+        ("sunflower_seeds", "Different texture but good fats")
+    ),
+    "dark_chocolate_70": (
+        ("cacao_powder", "Pure chocolate without added sugar"),
+        ("carob_powder", "Caffeine-free chocolate alternative"),
+        ("cocoa_nibs", "Raw chocolate with crunch")
+    )
+}
+
+_TIP_GROUPS = (
+    (frozenset({"honey", "maple_syrup", "dates"}), (
+        "When substituting sweeteners, start with less and adjust to taste",
+        "Liquid sweeteners may require reducing other liquids in the recipe"
+    )),
+    (frozenset({"almonds", "walnuts", "cashews"}), (
+        "Different nuts provide different textures - consider the final mouthfeel",
+        "Toast substituted nuts lightly to enhance their flavor"
+    )),
+    (frozenset({"oats", "quinoa"}), (
+        "Grain substitutions may affect binding - add extra liquid if needed",
+        "Consider grinding harder grains for better integration"
+    ))
+)
+
+_PROTEIN_POWDER_TIPS = (
+    "Different protein powders have varying sweetness levels",
+    "Plant proteins may need extra flavoring compared to whey"
+)
+
+_DEFAULT_SUBSTITUTION_TIPS = (
+    "Start with small amounts when trying new ingredients",
+    "Consider how the substitution affects both nutrition and taste"
+)
+
+
+class _GeneratedIngredient(BaseModel):
+    name: str = Field(..., min_length=1)
+    amount_g: float = Field(..., gt=0)
+
+
+class _GeneratedRecommendation(BaseModel):
+    """Shape a model-written recommendation must have before it replaces the rule-based one"""
+    name: str = Field(..., min_length=1)
+    description: str
+    ingredients: List[_GeneratedIngredient] = Field(..., min_length=1)
+    instructions: List[str]
+    prep_time_minutes: int = Field(..., gt=0)
+
+
+class _GeneratedChange(BaseModel):
+    type: str
+    reason: str
+    ingredient: Optional[str] = None
+    original: Optional[str] = None
+    replacement: Optional[str] = None
+    amount_g: Optional[float] = Field(None, gt=0)
+
+
+class _GeneratedImprovements(BaseModel):
+    """Shape model-written improvements must have before they replace the rule-based ones"""
+    suggested_changes: List[_GeneratedChange]
+    expected_improvements: List[str]
+
 
 class AIService:
     def __init__(self, openai_api_key: Optional[str], nutrition_service: NutritionService,
-                 embeddings=None):
+                 embeddings=None, openai_model: str = DEFAULT_OPENAI_MODEL):
         self.nutrition_service = nutrition_service
         self.embeddings = embeddings
+        self.openai_model = openai_model
 
         self.openai_available = False
+        self._openai_client = None
         if openai_api_key:
             try:
+                import httpx
                 import openai
-                openai.api_key = openai_api_key
+                # One client for the whole process so requests share pooled keep-alive connections
+                timeout = httpx.Timeout(_OPENAI_TIMEOUT, connect=_OPENAI_CONNECT_TIMEOUT)
+                self._openai_client = openai.AsyncOpenAI(
+                    api_key=openai_api_key,
+                    timeout=timeout,
+                    max_retries=_OPENAI_MAX_RETRIES,
+                    http_client=httpx.AsyncClient(
+                        timeout=timeout,
+                        limits=httpx.Limits(max_connections=100, max_keepalive_connections=20)
+                    )
+                )
                 self.openai_available = True
                 logger.info("OpenAI API initialized successfully")
             except ImportError:
@@ -27,8 +217,14 @@ class AIService:
         else:
             logger.warning("OpenAI API key not provided, AI features will be limited")
 
-        self.conversation_history = []
         self.max_history_length = 10
+        self.conversation_history = deque(maxlen=self.max_history_length)
+
+        # Repeated questions and score breakdowns skip the AI round trip. Questions match only when
+        # their words are identical: a bag-of-words similarity would pair a question with its
+        # negation, and no sentence model is guaranteed to be loaded to do better
+        self._chat_cache = SemanticCache(maxsize=256)
+        self._explanation_cache = SemanticCache(maxsize=256)
 
     async def generate_snack_recommendation(self, user_preferences: Dict[str, Any],
                                             health_goals: List[str]) -> Dict[str, Any]:
@@ -41,20 +237,12 @@ class AIService:
 
             if "ingredients" in recommendation and recommendation["ingredients"]:
                 try:
-                    formatted_ingredients = []
-                    for ing in recommendation["ingredients"]:
-                        if isinstance(ing, dict) and "name" in ing and "amount_g" in ing:
-                            formatted_ingredients.append({
-                                "name": str(ing["name"]),
-                                "amount_g": float(ing["amount_g"])
-                            })
-
-                    if formatted_ingredients:
-                        nutrition_analysis = self.nutrition_service.calculate_snack_nutrition(
-                            formatted_ingredients
-                        )
-                        recommendation["nutrition_analysis"] = nutrition_analysis
-                        recommendation["health_score"] = nutrition_analysis["health_score"]
+                    # Both the rule-based and the validated generated ingredients are well-formed dicts
+                    nutrition_analysis = await run_in_threadpool(
+                        self.nutrition_service.calculate_snack_nutrition, recommendation["ingredients"]
+                    )
+                    recommendation["nutrition_analysis"] = nutrition_analysis
+                    recommendation["health_score"] = nutrition_analysis["health_score"]
                 except Exception as e:
                     logger.error(f"Nutrition analysis failed for recommendation: {str(e)}")
 
@@ -64,27 +252,24 @@ class AIService:
             logger.error(f"Recommendation generation failed: {str(e)}")
             return self._fallback_recommendation(user_preferences, health_goals)
 
-    async def improve_snack_recipe(self, current_recipe: List[Dict[str, Any]],
+    async def improve_snack_recipe(self, current_recipe: Tuple[List[str], np.ndarray],
                                    improvement_goals: List[str]) -> Dict[str, Any]:
+        """Improvements for a recipe given as parallel (names, amounts) arrays"""
 
         try:
-            if not current_recipe:
-                raise ValueError("Current recipe cannot be empty")
+            names, amounts = current_recipe
 
-            formatted_recipe = []
-            for ing in current_recipe:
-                if isinstance(ing, dict) and "name" in ing:
-                    formatted_recipe.append({
-                        "name": str(ing["name"]),
-                        "amount_g": float(ing.get("amount_g", 25))
-                    })
-
-            if not formatted_recipe:
-                raise ValueError("No valid ingredients found in recipe")
+            if not names:
+                raise ValueError("Current recipe cannot be empty")
 
-            current_nutrition = self.nutrition_service.calculate_snack_nutrition(formatted_recipe)
+            current_nutrition = await run_in_threadpool(
+                self.nutrition_service.calculate_snack_nutrition, (names, amounts)
+            )
 
             if self.openai_available:
+                formatted_recipe = [
+                    {"name": name, "amount_g": amount} for name, amount in zip(names, amounts.tolist())
+                ]
                 improvements = await self._ai_improvements(formatted_recipe, current_nutrition, improvement_goals)
             else:
                 improvements = self._fallback_improvements(current_nutrition, improvement_goals)
@@ -107,12 +292,19 @@ class AIService:
 
         try:
             if not user_message or not user_message.strip():
-                return "I'm here to help with your nutrition questions! What would you like to know?"
+                return _EMPTY_CHAT_REPLY
 
-            if self.openai_available:
-                response = await self._ai_chat(user_message, current_snack_context)
-            else:
-                response = self._fallback_chat_response(user_message)
+            cache_key = self._chat_cache_key(user_message, current_snack_context)
+            response = self._chat_cache.get(cache_key) if cache_key else None
+
+            if response is None:
+                if self.openai_available:
+                    response = await self._ai_chat(user_message, current_snack_context)
+                else:
+                    response = self._fallback_chat_response(user_message)
+
+                if cache_key:
+                    self._chat_cache.put(cache_key, response)
 
             self._update_conversation_history(user_message, response)
             return response
@@ -121,6 +313,45 @@ class AIService:
             logger.error(f"Chat failed: {str(e)}")
             return self._fallback_chat_response(user_message)
 
+    async def stream_chat_about_nutrition(self, user_message: str,
+                                          current_snack_context: Optional[Dict[str, Any]] = None
+                                          ) -> AsyncIterator[str]:
+        """Same answer as chat_about_nutrition, yielded in pieces as the model generates it"""
+        if not user_message or not user_message.strip():
+            yield _EMPTY_CHAT_REPLY
+            return
+
+        cache_key = self._chat_cache_key(user_message, current_snack_context)
+        response = self._chat_cache.get(cache_key) if cache_key else None
+
+        if response is None and self.openai_available:
+            chunks = []
+            try:
+                async for chunk in self._ai_chat_stream(user_message, current_snack_context):
+                    chunks.append(chunk)
+                    yield chunk
+            except Exception as e:
+                logger.error(f"Chat stream failed: {str(e)}")
+                # Once text has gone out the answer cannot be replaced, so a broken stream just ends
+                if not chunks:
+                    yield self._fallback_chat_response(user_message)
+                return
+            response = "".join(chunks)
+        else:
+            if response is None:
+                response = self._fallback_chat_response(user_message)
+            yield response
+
+        if cache_key:
+            self._chat_cache.put(cache_key, response)
+        self._update_conversation_history(user_message, response)
+
+    def _chat_cache_key(self, user_message: str, context: Optional[Dict[str, Any]]) -> Optional[str]:
+        # Answers that depend on a snack context are not reusable across requests
+        if context:
+            return None
+        return normalized_text(user_message)
+
     async def suggest_ingredient_substitutions(self, ingredient_name: str,
                                                dietary_restrictions: List[str],
                                                recipe_context: List[Dict[str, Any]]) -> Dict[str, Any]:
@@ -173,11 +404,18 @@ class AIService:
             health_score = nutrition_data.get("health_score", 0)
             nutrition = nutrition_data.get("nutrition_per_100g", {})
 
+            # Numeric inputs only need an exact key; the thresholds are strict, so no rounding
+            cache_key = (health_score, *(nutrition.get(field, 0) for field in _EXPLANATION_FIELDS))
+            explanation = self._explanation_cache.get(cache_key)
+            if explanation is not None:
+                return explanation
+
             if self.openai_available:
                 explanation = await self._ai_health_explanation(health_score, nutrition)
             else:
                 explanation = self._fallback_health_explanation(health_score, nutrition)
 
+            self._explanation_cache.put(cache_key, explanation)
             return explanation
 
         except Exception as e:
@@ -188,22 +426,107 @@ class AIService:
             )
 
 
+    async def aclose(self):
+        if self._openai_client is not None:
+            await self._openai_client.close()
+
     async def _ai_recommendation(self, preferences: Dict[str, Any], goals: List[str]) -> Dict[str, Any]:
-        return self._fallback_recommendation(preferences, goals)
+        recommendation = self._fallback_recommendation(preferences, goals)
+        generated = await self._complete_json(
+            "Design a healthy snack recipe. Reply with a JSON object with the keys name, description, "
+            "ingredients (a list of {name, amount_g}), instructions (a list of strings) and prep_time_minutes.",
+            json.dumps({"preferences": preferences, "health_goals": goals}),
+            _GeneratedRecommendation
+        )
+        # Benefits stay rule-based since they follow the requested goals
+        if generated is not None:
+            recommendation.update(generated.model_dump())
+        return recommendation
 
     async def _ai_improvements(self, recipe: List[Dict[str, Any]], nutrition: Dict[str, Any],
                                goals: List[str]) -> Dict[str, Any]:
-        return self._fallback_improvements(nutrition, goals)
+        improvements = self._fallback_improvements(nutrition, goals)
+        generated = await self._complete_json(
+            "Suggest changes to a snack recipe. Reply with a JSON object with the keys suggested_changes "
+            "(a list of {type, ingredient or original and replacement, amount_g, reason}) and expected_improvements "
+            "(a list of strings).",
+            json.dumps({"recipe": recipe, "nutrition_per_100g": nutrition.get("nutrition_per_100g", {}),
+                        "goals": goals}),
+            _GeneratedImprovements
+        )
+        if generated is not None:
+            improvements["suggested_changes"] = [
+                change.model_dump(exclude_none=True) for change in generated.suggested_changes
+            ]
+            improvements["expected_improvements"] = generated.expected_improvements
+        return improvements
 
     async def _ai_chat(self, message: str, context: Optional[Dict[str, Any]]) -> str:
-        return self._fallback_chat_response(message)
+        return await self._complete(
+            _CHAT_INSTRUCTIONS, self._chat_prompt(message, context)
+        ) or self._fallback_chat_response(message)
+
+    async def _ai_chat_stream(self, message: str, context: Optional[Dict[str, Any]]) -> AsyncIterator[str]:
+        stream = await self._openai_client.chat.completions.create(
+            model=self.openai_model,
+            messages=[
+                {"role": "system", "content": _CHAT_INSTRUCTIONS},
+                {"role": "user", "content": self._chat_prompt(message, context)}
+            ],
+            stream=True
+        )
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+    @staticmethod
+    def _chat_prompt(message: str, context: Optional[Dict[str, Any]]) -> str:
+        return message if not context else f"{message}\n\nSnack being discussed: {json.dumps(context)}"
 
     async def _ai_substitutions(self, ingredient: str, suggestions: List[Dict[str, Any]],
                                 restrictions: List[str], context: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        return suggestions
+        recipe = ", ".join(item["name"] for item in context) or "unknown"
+
+        # One completion per candidate, all in flight together on the shared client
+        reasons = await asyncio.gather(*(
+            self._complete(
+                "Explain in one sentence why an ingredient is a good substitute in a snack recipe.",
+                f"Replace {ingredient} with {suggestion['name']} in a recipe with {recipe}. "
+                f"Dietary restrictions: {', '.join(restrictions) or 'none'}."
+            )
+            for suggestion in suggestions
+        ), return_exceptions=True)
+
+        return [
+            {**suggestion, "reason": reason} if isinstance(reason, str) and reason else suggestion
+            for suggestion, reason in zip(suggestions, reasons)
+        ]
 
     async def _ai_health_explanation(self, score: int, nutrition: Dict[str, float]) -> str:
-        return self._fallback_health_explanation(score, nutrition)
+        return await self._complete(
+            "Explain a snack's health score from 0 to 100 in two or three sentences.",
+            json.dumps({"health_score": score, "nutrition_per_100g": nutrition})
+        ) or self._fallback_health_explanation(score, nutrition)
+
+    async def _complete(self, instructions: str, prompt: str, **options) -> str:
+        response = await self._openai_client.chat.completions.create(
+            model=self.openai_model,
+            messages=[
+                {"role": "system", "content": instructions},
+                {"role": "user", "content": prompt}
+            ],
+            **options
+        )
+        return (response.choices[0].message.content or "").strip()
+
+    async def _complete_json(self, instructions: str, prompt: str, schema: Type[ModelT]) -> Optional[ModelT]:
+        """Completion parsed into the schema, or None when the model's JSON does not fit it"""
+        content = await self._complete(instructions, prompt, response_format={"type": "json_object"})
+        try:
+            return schema.model_validate_json(content)
+        except ValidationError as e:
+            logger.warning(f"Discarding generated {schema.__name__}: {e.error_count()} invalid fields")
+            return None
 
 
     def _fallback_recommendation(self, preferences: Dict[str, Any], goals: List[str]) -> Dict[str, Any]:
@@ -223,18 +546,21 @@ class AIService:
         if "increase_fiber" in goals:
             base_ingredients.append({"name": "chia_seeds", "amount_g": 15})
 
-        if any(goal in goals for goal in ["antioxidant_rich", "increase_antioxidants"]):
+        if not _ANTIOXIDANT_GOALS.isdisjoint(goals):
             base_ingredients.append({"name": "blueberries_dried", "amount_g": 20})
 
         if "keto_friendly" in goals:
-            base_ingredients = [ing for ing in base_ingredients if ing["name"] not in ["oats", "dates"]]
+            base_ingredients = [ing for ing in base_ingredients if ing["name"] not in _KETO_DROP]
             base_ingredients.append({"name": "coconut_flakes", "amount_g": 25})
             base_ingredients.append({"name": "cashews", "amount_g": 35})
 
-        if preferences.get("flavors") and "chocolate" in preferences.get("flavors", []):
+        names = {ing["name"] for ing in base_ingredients}
+
+        flavors = preferences.get("flavors") or ()
+        if "chocolate" in flavors:
             base_ingredients.append({"name": "dark_chocolate_70", "amount_g": 15})
-        elif preferences.get("flavors") and "sweet" in preferences.get("flavors", []):
-            if not any(ing["name"] == "dates" for ing in base_ingredients):
+        elif "sweet" in flavors:
+            if "dates" not in names:
                 base_ingredients.append({"name": "honey", "amount_g": 15})
 
         return {
@@ -308,136 +634,45 @@ class AIService:
             "estimated_new_score": min(health_score + (len(suggestions) * 5), 100)
         }
 
-    def _fallback_chat_response(self, user_message: str) -> str:
+    @staticmethod
+    @lru_cache(maxsize=512)
+    def _fallback_chat_response(user_message: str) -> str:
         message_lower = user_message.lower()
 
-        if any(word in message_lower for word in ["protein", "muscle", "workout"]):
-            return "Protein is essential for muscle building and repair. For snacks, aim for 15-20g protein. Great sources include protein powder, Greek yogurt, nuts, seeds, and legumes. Post-workout snacks should combine protein with some carbs for optimal recovery."
-
-        elif any(word in message_lower for word in ["sugar", "sweet", "diabetes"]):
-            return "Natural sugars from fruits like dates are generally better than refined sugars because they come with fiber and nutrients. Try pairing sweet ingredients with protein and fiber to slow sugar absorption. For diabetic-friendly options, focus on low-glycemic ingredients like nuts, seeds, and berries."
-
-        elif any(word in message_lower for word in ["fiber", "digestion", "gut"]):
-            return "Fiber is crucial for digestive health and helps you feel full longer. Aim for 25-35g daily total. Great snack sources include chia seeds (10g per 2 tbsp), flax seeds, oats, and berries. Start slowly if increasing fiber intake to avoid digestive discomfort."
-
-        elif any(word in message_lower for word in ["fat", "healthy", "omega"]):
-            return "Healthy fats from nuts, seeds, avocados, and olive oil provide sustained energy and help absorb fat-soluble vitamins. Omega-3 fatty acids from chia seeds, walnuts, and flax are especially beneficial for brain and heart health."
+        for pattern, reply in _CHAT_TOPICS:
+            if pattern.search(message_lower):
+                return reply
 
-        elif any(word in message_lower for word in ["energy", "tired", "boost"]):
-            return "For sustained energy, combine complex carbs with protein and healthy fats. Avoid simple sugars that cause energy crashes. Great energizing combinations include nuts with fruit, oats with protein powder, or seeds with berries."
-
-        elif any(word in message_lower for word in ["weight", "lose", "diet"]):
-            return "For weight management, focus on nutrient-dense, high-fiber, high-protein snacks that keep you satisfied. Examples include protein balls, veggie sticks with nut butter, or Greek yogurt with berries. Portion control is key - aim for 150-200 calorie snacks."
-
-        elif any(word in message_lower for word in ["antioxidant", "inflammation", "health"]):
-            return "Antioxidants help fight inflammation and protect cells. The best sources for snacks include berries (especially blueberries), dark chocolate (70%+ cacao), nuts, seeds, and colorful fruits and vegetables."
-
-        elif any(word in message_lower for word in ["calcium", "bone", "strong"]):
-            return "Calcium is essential for bone health. Good snack sources include almonds, sesame seeds (tahini), leafy greens, and fortified plant milks. Pair with vitamin D for better absorption."
-
-        elif any(word in message_lower for word in ["iron", "anemia", "energy"]):
-            return "Iron supports oxygen transport and energy levels. Plant-based sources for snacks include pumpkin seeds, dark chocolate, quinoa, and dried fruits. Pair with vitamin C (like citrus) to enhance absorption."
-
-        else:
-            return "That's a great nutrition question! I'd recommend focusing on whole food ingredients and balanced macronutrients for the healthiest snacks. What specific aspect of nutrition would you like to explore further?"
+        return _DEFAULT_CHAT_REPLY
 
     def _fallback_substitutions(self, ingredient_name: str) -> List[Dict[str, Any]]:
-        substitution_map = {
-            "almonds": [
-                {"name": "walnuts", "reason": "Similar healthy fats and protein"},
-                {"name": "cashews", "reason": "Creamy texture with good nutrition"},
-                {"name": "sunflower_seeds", "reason": "Nut-free alternative with protein"}
-            ],
-            "walnuts": [
-                {"name": "almonds", "reason": "Similar protein and healthy fats"},
-                {"name": "pecans", "reason": "Similar texture and omega-3s"},
-                {"name": "chia_seeds", "reason": "Omega-3 rich alternative"}
-            ],
-            "cashews": [
-                {"name": "almonds", "reason": "Similar protein content"},
-                {"name": "sunflower_seeds", "reason": "Nut-free option with minerals"},
-                {"name": "coconut_flakes", "reason": "Creamy texture alternative"}
-            ],
-            "dates": [
-                {"name": "maple_syrup", "reason": "Natural liquid sweetener"},
-                {"name": "honey", "reason": "Natural sweetener with enzymes"},
-                {"name": "banana", "reason": "Natural fruit sweetness with potassium"}
-            ],
-            "honey": [
-                {"name": "maple_syrup", "reason": "Plant-based liquid sweetener"},
-                {"name": "dates", "reason": "Whole food sweetener with fiber"},
-                {"name": "coconut_nectar", "reason": "Low glycemic natural sweetener"}
-            ],
-            "maple_syrup": [
-                {"name": "honey", "reason": "Similar consistency and sweetness"},
-                {"name": "dates", "reason": "Whole food alternative"},
-                {"name": "coconut_nectar", "reason": "Similar liquid sweetener"}
-            ],
-            "oats": [
-                {"name": "quinoa", "reason": "Gluten-free grain with complete protein"},
-                {"name": "buckwheat", "reason": "Gluten-free with similar texture"},
-                {"name": "coconut_flakes", "reason": "Low-carb alternative"}
-            ],
-            "quinoa": [
-                {"name": "oats", "reason": "Similar hearty texture"},
-                {"name": "millet", "reason": "Ancient grain with mild flavor"},
-                {"name": "buckwheat", "reason": "Gluten-free grain alternative"}
-            ],
-            "protein_powder_whey": [
-                {"name": "protein_powder_plant", "reason": "Plant-based protein alternative"},
-                {"name": "greek_yogurt_powder", "reason": "Natural protein source"},
-                {"name": "hemp_protein", "reason": "Complete amino acid profile"}
-            ],
-            "protein_powder_plant": [
-                {"name": "protein_powder_whey", "reason": "Complete protein source"},
-                {"name": "hemp_protein", "reason": "Raw plant protein option"},
-                {"name": "spirulina", "reason": "Superfood protein source"}
-            ],
-            "chia_seeds": [
-                {"name": "flax_seeds", "reason": "Similar omega-3 and fiber content"},
-                {"name": "hemp_seeds", "reason": "Protein-rich seed alternative"},
-                {"name": "sesame_seeds", "reason": "Calcium-rich alternative"}
-            ],
-            "flax_seeds": [
-                {"name": "chia_seeds", "reason": "Similar omega-3 benefits"},
-                {"name": "hemp_seeds", "reason": "Nutty flavor with protein"},
-                {"name": "sunflower_seeds", "reason": "Vitamin E rich alternative"}
-            ],
-            "coconut_flakes": [
-                {"name": "almonds", "reason": "Similar healthy fats"},
-                {"name": "cashews", "reason": "Creamy texture alternative"},
-                {"name": "sunflower_seeds", "reason": "Different texture but good fats"}
-            ],
-            "dark_chocolate_70": [
-                {"name": "cacao_powder", "reason": "Pure chocolate without added sugar"},
-                {"name": "carob_powder", "reason": "Caffeine-free chocolate alternative"},
-                {"name": "cocoa_nibs", "reason": "Raw chocolate with crunch"}
-            ]
-        }
-
-        suggestions = substitution_map.get(ingredient_name, [])
-
-        formatted_suggestions = []
-        for i, sub in enumerate(suggestions):
-            formatted_suggestions.append({
-                "name": sub["name"],
+        return [
+            {
+                "name": name,
                 "similarity": 0.8 - (i * 0.1),
-                "reason": sub["reason"],
+                "reason": reason,
                 "nutrition_comparison": {
                     "protein_g": "similar",
                     "calories_per_100g": "similar",
                     "fiber_g": "similar"
                 }
-            })
-
-        return formatted_suggestions
+            }
+            for i, (name, reason) in enumerate(_SUBSTITUTION_MAP.get(ingredient_name, ()))
+        ]
 
     def _fallback_health_explanation(self, health_score: int, nutrition: Dict[str, float]) -> str:
-        protein = nutrition.get("protein_g", 0)
-        fiber = nutrition.get("fiber_g", 0)
-        sugar = nutrition.get("sugars_g", 0)
-        sodium = nutrition.get("sodium_mg", 0)
-
+        return self._health_explanation_text(
+            health_score,
+            nutrition.get("protein_g", 0),
+            nutrition.get("fiber_g", 0),
+            nutrition.get("sugars_g", 0),
+            nutrition.get("sodium_mg", 0)
+        )
+
+    @staticmethod
+    @lru_cache(maxsize=512)
+    def _health_explanation_text(health_score: int, protein: float, fiber: float, sugar: float,
+                                 sodium: float) -> str:
         explanation_parts = []
 
         if health_score >= 80:
@@ -471,6 +706,11 @@ class AIService:
 
 
     def _generate_benefits_from_goals(self, goals: List[str]) -> List[str]:
+        return list(self._benefits_for_goals(tuple(goals)))
+
+    @staticmethod
+    @lru_cache(maxsize=512)
+    def _benefits_for_goals(goals: Tuple[str, ...]) -> Tuple[str, ...]:
         benefits = []
 
         goal_benefits = {
@@ -492,51 +732,21 @@ class AIService:
         if not benefits:
             benefits = ["Natural ingredients", "Balanced nutrition", "Sustained energy"]
 
-        return benefits[:4]  # Limit to 4 benefits
+        return tuple(benefits[:4])  # Limit to 4 benefits
 
     def _generate_substitution_tips(self, original: str, suggestions: List[Dict[str, Any]]) -> List[str]:
+        for names, tips in _TIP_GROUPS:
+            if original in names:
+                return list(tips)
 
-        tips = []
-
-        if original in ["honey", "maple_syrup", "dates"]:
-            tips.extend([
-                "When substituting sweeteners, start with less and adjust to taste",
-                "Liquid sweeteners may require reducing other liquids in the recipe"
-            ])
-
-        elif original in ["almonds", "walnuts", "cashews"]:
-            tips.extend([
-                "Different nuts provide different textures - consider the final mouthfeel",
-                "Toast substituted nuts lightly to enhance their flavor"
-            ])
-
-        elif original in ["oats", "quinoa"]:
-            tips.extend([
-                "Grain substitutions may affect binding - add extra liquid if needed",
-                "Consider grinding harder grains for better integration"
-            ])
+        if "protein_powder" in original:
+            return list(_PROTEIN_POWDER_TIPS)
 
-        elif "protein_powder" in original:
-            tips.extend([
-                "Different protein powders have varying sweetness levels",
-                "Plant proteins may need extra flavoring compared to whey"
-            ])
-
-        else:
-            tips.extend([
-                "Start with small amounts when trying new ingredients",
-                "Consider how the substitution affects both nutrition and taste"
-            ])
-
-        return tips[:3]  # Limit to 3 tips
+        return list(_DEFAULT_SUBSTITUTION_TIPS)
 
     def _update_conversation_history(self, user_message: str, ai_response: str):
         self.conversation_history.append({
             "user": user_message,
             "ai": ai_response,
-            "timestamp": asyncio.get_event_loop().time() if asyncio.get_event_loop() else 0
-        })
-
-        # Keep only recent conversations
-        if len(self.conversation_history) > self.max_history_length:
-            self.conversation_history = self.conversation_history[-self.max_history_length:]
\ No newline at end of file
+            "timestamp": time.monotonic()
+        })
\ No newline at end of file
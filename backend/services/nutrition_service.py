@@ -1,16 +1,31 @@
+import copy
 import json
 import logging
+import threading
+from collections import OrderedDict
 from typing import Dict, List, Any, Optional, Tuple
 import numpy as np
+from scipy.optimize import linear_sum_assignment
 from models.health_scorer import HealthScorer
+from models.ingredient_embeddings import NUTRIENT_KEYS
+from models.similarity import cosine_matrix
 
 logger = logging.getLogger(__name__)
 
+# Recipes above this size are rare and not worth building a cache key for
+_NUTRITION_CACHE_MAX_INGREDIENTS = 64
+_NUTRITION_CACHE_SIZE = 1024
+
 
 class NutritionService:
     def __init__(self, health_scorer: HealthScorer):
         self.health_scorer = health_scorer
         self.ingredient_database = self._load_ingredient_database()
+        self._build_nutrient_profiles()
+        # Analyses keyed on (names, amounts) in recipe order, since the breakdown follows that order
+        self._nutrition_cache: "OrderedDict[Tuple, Dict[str, Any]]" = OrderedDict()
+        # Analyses also run on worker threads, so cache bookkeeping is serialized
+        self._nutrition_cache_lock = threading.Lock()
 
     def _load_ingredient_database(self) -> Dict[str, Dict[str, Any]]:
         try:
@@ -20,52 +35,123 @@ class NutritionService:
             logger.warning("Ingredient database not found, using empty database")
             return {}
 
-    def calculate_snack_nutrition(self, ingredients: List[Dict[str, Any]]) -> Dict[str, Any]:
-        if not ingredients:
-            return self._empty_nutrition()
+    def _build_nutrient_profiles(self):
+        """Per-ingredient nutrient vectors and allergen sets, built once from the static database"""
+        names = list(self.ingredient_database)
+        self.nutrient_profile_rows = {name: row for row, name in enumerate(names)}
+        self.allergens_by_ingredient = {
+            name: frozenset(self.ingredient_database[name].get("allergens", [])) for name in names
+        }
 
-        total_nutrition = self._initialize_nutrition_totals()
-        total_weight = 0
-        ingredient_details = []
-        allergens = set()
+        self.nutrient_matrix = np.array(
+            [[self.ingredient_database[name].get("nutrition", {}).get(key, 0) for key in NUTRIENT_KEYS]
+             for name in names],
+            dtype=np.float64
+        ).reshape(len(names), len(NUTRIENT_KEYS))
+        scale = self.nutrient_matrix.max(axis=0, initial=0.0)
+        scale[scale == 0] = 1.0
+        self.nutrient_profiles = self.nutrient_matrix / scale
+
+    def match_recipe_ingredients(self, version_a, version_b) -> List[Dict[str, Any]]:
+        """Pair each ingredient of one recipe with its closest nutritional counterpart in the other"""
+        names_a = [n.lower() for n in self.recipe_arrays(version_a)[0] if n.lower() in self.nutrient_profile_rows]
+        names_b = [n.lower() for n in self.recipe_arrays(version_b)[0] if n.lower() in self.nutrient_profile_rows]
+        if not names_a or not names_b:
+            return []
 
-        for ingredient in ingredients:
-            name = ingredient.get("name", "").lower()
-            amount_g = ingredient.get("amount_g", 0)
+        similarities = cosine_matrix(
+            self.nutrient_profiles[[self.nutrient_profile_rows[name] for name in names_a]],
+            self.nutrient_profiles[[self.nutrient_profile_rows[name] for name in names_b]]
+        )
+        rows, cols = linear_sum_assignment(similarities, maximize=True)
+
+        return [
+            {
+                "ingredient_a": names_a[row],
+                "ingredient_b": names_b[col],
+                "similarity": round(float(similarities[row, col]), 3)
+            }
+            for row, col in zip(rows.tolist(), cols.tolist())
+        ]
 
-            if name not in self.ingredient_database:
+    @staticmethod
+    def recipe_arrays(recipe) -> Tuple[List[str], np.ndarray]:
+        """Split a recipe into parallel name and amount arrays; accepts ingredient dicts or a (names, amounts) pair"""
+        if isinstance(recipe, tuple):
+            names, amounts = recipe
+            return list(names), np.asarray(amounts, dtype=np.float64)
+
+        return (
+            [ingredient.get("name", "") for ingredient in recipe],
+            np.fromiter((ingredient.get("amount_g", 0) for ingredient in recipe), dtype=np.float64, count=len(recipe))
+        )
+
+    def calculate_snack_nutrition(self, ingredients) -> Dict[str, Any]:
+        names, amounts = self.recipe_arrays(ingredients)
+        return self.calculate_nutrition_from_arrays(names, amounts)
+
+    def calculate_snack_nutrition_batch(self, ingredient_lists) -> List[Dict[str, Any]]:
+        """Analyses for several recipes in one call, so callers pay for a single worker-thread hop;
+        recipes repeated within or across batches are served from the analysis cache"""
+        return [self.calculate_snack_nutrition(ingredients) for ingredients in ingredient_lists]
+
+    def calculate_nutrition_from_arrays(self, names: List[str], amounts: np.ndarray) -> Dict[str, Any]:
+        if len(names) > _NUTRITION_CACHE_MAX_INGREDIENTS:
+            return self._analyze_nutrition(names, amounts)
+
+        key = (tuple(names), tuple(amounts.tolist()))
+        with self._nutrition_cache_lock:
+            analysis = self._nutrition_cache.get(key)
+            if analysis is not None:
+                self._nutrition_cache.move_to_end(key)
+
+        if analysis is None:
+            analysis = self._analyze_nutrition(names, amounts)
+            with self._nutrition_cache_lock:
+                self._nutrition_cache[key] = analysis
+                if len(self._nutrition_cache) > _NUTRITION_CACHE_SIZE:
+                    self._nutrition_cache.popitem(last=False)
+
+        # Callers decorate the analysis they get back, so never hand out the cached copy
+        return copy.deepcopy(analysis)
+
+    def _analyze_nutrition(self, names: List[str], amounts: np.ndarray) -> Dict[str, Any]:
+        if len(names) == 0:
+            return self._empty_nutrition()
+
+        known_names = []
+        known_amounts = []
+        for name, amount_g in zip((name.lower() for name in names), amounts.tolist()):
+            if name not in self.nutrient_profile_rows:
                 logger.warning(f"Ingredient '{name}' not found in database")
                 continue
+            known_names.append(name)
+            known_amounts.append(amount_g)
 
-            ingredient_data = self.ingredient_database[name]
-            nutrition_per_100g = ingredient_data["nutrition"]
-
-            multiplier = amount_g / 100.0
-            ingredient_nutrition = {}
-
-            for nutrient, value_per_100g in nutrition_per_100g.items():
-                contribution = value_per_100g * multiplier
-                total_nutrition[nutrient] += contribution
-                ingredient_nutrition[nutrient] = contribution
+        rows = [self.nutrient_profile_rows[name] for name in known_names]
+        contributions = self.nutrient_matrix[rows] * (np.asarray(known_amounts, dtype=np.float64) / 100.0)[:, None]
+        totals = contributions.sum(axis=0)
+        total_nutrition = dict(zip(NUTRIENT_KEYS, totals.tolist()))
+        total_weight = sum(known_amounts)
 
-            allergens.update(ingredient_data.get("allergens", []))
+        ingredient_details = []
+        allergens = set()
+        for name, amount_g, contribution in zip(known_names, known_amounts, contributions.tolist()):
+            ingredient_data = self.ingredient_database[name]
+            allergens |= self.allergens_by_ingredient[name]
 
             ingredient_details.append({
                 "name": name,
                 "amount_g": amount_g,
-                "nutrition": ingredient_nutrition,
+                "nutrition": dict(zip(NUTRIENT_KEYS, contribution)),
                 "properties": ingredient_data.get("properties", {}),
                 "category": ingredient_data.get("category", "unknown")
             })
 
-            total_weight += amount_g
-
         nutrition_per_serving = total_nutrition.copy()
-        nutrition_per_100g = {}
 
         if total_weight > 0:
-            for nutrient, total_value in total_nutrition.items():
-                nutrition_per_100g[nutrient] = (total_value / total_weight) * 100
+            nutrition_per_100g = dict(zip(NUTRIENT_KEYS, ((totals / total_weight) * 100).tolist()))
         else:
             nutrition_per_100g = total_nutrition.copy()
 
@@ -254,7 +340,7 @@ class NutritionService:
 
         return recommendations[:4]
 
-    def analyze_ingredient_contribution(self, ingredients: List[Dict[str, Any]]) -> Dict[str, Any]:
+    def analyze_ingredient_contribution(self, ingredients) -> Dict[str, Any]:
         total_nutrition = self.calculate_snack_nutrition(ingredients)
         total_calories = total_nutrition["nutrition_per_serving"]["calories_per_100g"]
 
@@ -394,8 +480,7 @@ class NutritionService:
 
         return suggestions
 
-    def compare_snack_versions(self, version_a: List[Dict[str, Any]],
-                               version_b: List[Dict[str, Any]]) -> Dict[str, Any]:
+    def compare_snack_versions(self, version_a, version_b) -> Dict[str, Any]:
         nutrition_a = self.calculate_snack_nutrition(version_a)
         nutrition_b = self.calculate_snack_nutrition(version_b)
 
@@ -445,4 +530,6 @@ class NutritionService:
         else:
             comparison["overall_recommendation"] = "Both versions are nutritionally similar"
 
+        comparison["ingredient_matches"] = self.match_recipe_ingredients(version_a, version_b)
+
         return comparison
@@ -0,0 +1,21 @@
+import os
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules import each other from the backend directory and read data/ relative to it, as under uvicorn
+sys.path.insert(0, BACKEND_DIR)
+os.chdir(BACKEND_DIR)
+
+
+@pytest.fixture(scope="session")
+def client():
+    """Client for the full app with its services loaded; AI routes run on the rule-based path"""
+    os.environ.pop("OPENAI_API_KEY", None)
+    from app import app
+
+    with TestClient(app) as test_client:
+        yield test_client
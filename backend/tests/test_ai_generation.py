@@ -0,0 +1,63 @@
+import asyncio
+import json
+
+from services.ai_service import AIService
+
+
+class _ScriptedAIService(AIService):
+    """AI path whose completions are fixed strings"""
+
+    def __init__(self, reply):
+        super().__init__(None, nutrition_service=None)
+        self.openai_available = True
+        self.reply = reply
+
+    async def _complete(self, instructions, prompt, **options):
+        return self.reply
+
+
+_RECOMMENDATION = {
+    "name": "Cocoa Oat Bites",
+    "description": "Chewy oat bites",
+    "ingredients": [{"name": "oats", "amount_g": 40}, {"name": "cocoa_powder", "amount_g": 5}],
+    "instructions": ["Mix", "Roll"],
+    "prep_time_minutes": 10,
+}
+
+
+def test_valid_generated_recommendation_replaces_rule_based_fields():
+    service = _ScriptedAIService(json.dumps(_RECOMMENDATION))
+
+    recommendation = asyncio.run(service._ai_recommendation({}, ["high_protein"]))
+
+    assert recommendation["name"] == "Cocoa Oat Bites"
+    assert recommendation["ingredients"][1] == {"name": "cocoa_powder", "amount_g": 5.0}
+    assert recommendation["key_benefits"] == service._fallback_recommendation({}, ["high_protein"])["key_benefits"]
+
+
+def test_generated_recommendation_with_non_numeric_amount_falls_back():
+    bad = dict(_RECOMMENDATION, ingredients=[{"name": "oats", "amount_g": "a handful"}])
+    service = _ScriptedAIService(json.dumps(bad))
+
+    recommendation = asyncio.run(service._ai_recommendation({}, []))
+
+    assert recommendation == service._fallback_recommendation({}, [])
+
+
+def test_generated_recommendation_that_is_not_json_falls_back():
+    service = _ScriptedAIService("Sure! Here is a recipe:")
+
+    assert asyncio.run(service._ai_recommendation({}, [])) == service._fallback_recommendation({}, [])
+
+
+def test_generated_improvements_with_wrong_shape_fall_back():
+    nutrition = {"nutrition_per_100g": {"protein_g": 3.0, "sugar_g": 30.0}}
+    service = _ScriptedAIService(json.dumps({"suggested_changes": "add protein", "expected_improvements": []}))
+
+    improvements = asyncio.run(service._ai_improvements([], nutrition, ["high_protein"]))
+
+    assert improvements == service._fallback_improvements(nutrition, ["high_protein"])
+
+
+def test_model_name_comes_from_configuration():
+    assert AIService(None, nutrition_service=None, openai_model="gpt-test").openai_model == "gpt-test"
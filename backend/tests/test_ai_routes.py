@@ -0,0 +1,36 @@
+import math
+
+
+def test_improve_skips_ingredients_without_a_numeric_amount(client):
+    response = client.post("/api/ai/improve", json={
+        "current_recipe": [
+            {"name": "oats", "amount_g": None},
+            {"name": "dates", "amount_g": "a handful"},
+            {"name": "almonds", "amount_g": 30},
+        ],
+        "improvement_goals": ["increase_protein"],
+    })
+
+    assert response.status_code == 200
+    data = response.json()["data"]
+    assert data["original_recipe"] == [{"name": "almonds", "amount_g": 30.0}]
+    nutrition = data["improvements"]["current_analysis"]["nutrition_per_100g"]
+    assert all(math.isfinite(value) for value in nutrition.values())
+
+
+def test_improve_rejects_recipe_with_no_numeric_amounts(client):
+    response = client.post("/api/ai/improve", json={
+        "current_recipe": [{"name": "oats", "amount_g": None}, {"name": "almonds", "amount_g": "NaN"}],
+        "improvement_goals": [],
+    })
+
+    assert response.status_code == 400
+
+
+def test_substitution_context_defaults_missing_amounts(client):
+    response = client.post("/api/ai/substitute", json={
+        "ingredient_name": "almonds",
+        "recipe_context": [{"name": "oats", "amount_g": None}, {"name": "dates"}, {"name": "honey", "amount_g": []}],
+    })
+
+    assert response.status_code == 200
@@ -0,0 +1,92 @@
+import asyncio
+from types import SimpleNamespace
+
+from services.ai_service import AIService
+
+
+def _collect(stream):
+    async def collect():
+        return [chunk async for chunk in stream]
+    return asyncio.run(collect())
+
+
+class _StreamingAIService(AIService):
+    """AI path streaming fixed chunks, optionally failing after a number of them"""
+
+    def __init__(self, chunks, fail_after=None):
+        super().__init__(None, nutrition_service=None)
+        self.openai_available = True
+        self.chunks = chunks
+        self.fail_after = fail_after
+        self.calls = 0
+
+    async def _ai_chat_stream(self, message, context):
+        self.calls += 1
+        for position, chunk in enumerate(self.chunks):
+            if position == self.fail_after:
+                raise RuntimeError("connection reset")
+            yield chunk
+
+
+def test_stream_yields_chunks_and_caches_the_joined_answer():
+    service = _StreamingAIService(["Protein ", "keeps you ", "full."])
+
+    first = _collect(service.stream_chat_about_nutrition("Why protein?"))
+    second = _collect(service.stream_chat_about_nutrition("why protein"))
+
+    assert first == ["Protein ", "keeps you ", "full."]
+    assert second == ["Protein keeps you full."]
+    assert service.calls == 1
+    assert asyncio.run(service.chat_about_nutrition("Why protein?")) == "Protein keeps you full."
+
+
+def test_stream_failing_before_any_text_falls_back_to_rule_based_answer():
+    service = _StreamingAIService(["never sent"], fail_after=0)
+
+    chunks = _collect(service.stream_chat_about_nutrition("How much protein?"))
+
+    assert chunks == [service._fallback_chat_response("How much protein?")]
+
+
+def test_stream_failing_midway_ends_without_caching_the_partial_answer():
+    service = _StreamingAIService(["Protein ", "keeps you ", "full."], fail_after=2)
+
+    assert _collect(service.stream_chat_about_nutrition("Why protein?")) == ["Protein ", "keeps you "]
+    _collect(service.stream_chat_about_nutrition("Why protein?"))
+
+    assert service.calls == 2
+
+
+def test_openai_stream_skips_empty_deltas_and_uses_configured_model():
+    requests = []
+
+    async def create(**kwargs):
+        requests.append(kwargs)
+
+        async def chunks():
+            for content in ("Oats", None, " are great"):
+                yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content))])
+            yield SimpleNamespace(choices=[])
+        return chunks()
+
+    service = AIService(None, nutrition_service=None, openai_model="gpt-test")
+    service._openai_client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+    assert _collect(service._ai_chat_stream("Oats?", None)) == ["Oats", " are great"]
+    assert requests[0]["model"] == "gpt-test"
+    assert requests[0]["stream"] is True
+
+
+def test_stream_endpoint_sends_the_same_answer_as_chat(client):
+    message = {"message": "What snacks are high in protein?"}
+
+    streamed = client.post("/api/ai/chat/stream", json=message)
+    answered = client.post("/api/ai/chat", json=message)
+
+    assert streamed.status_code == 200
+    assert streamed.headers["content-type"].startswith("text/plain")
+    assert streamed.text == answered.json()["data"]["response"]
+
+
+def test_stream_endpoint_rejects_empty_message(client):
+    assert client.post("/api/ai/chat/stream", json={"message": "   "}).status_code == 400
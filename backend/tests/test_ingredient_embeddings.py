@@ -0,0 +1,34 @@
+from models.ingredient_embeddings import IngredientEmbeddings
+
+
+def _embeddings(ingredient_data):
+    embeddings = IngredientEmbeddings()
+    embeddings.ingredient_data = ingredient_data
+    embeddings._build_lookup_tables()
+    return embeddings
+
+
+def test_recipe_profile_unions_flavors_and_allergens():
+    embeddings = _embeddings({
+        "almonds": {"flavor_profile": ["nutty", "sweet"], "allergens": ["tree_nuts"]},
+        "oats": {"flavor_profile": ["mild"], "allergens": ["gluten"]},
+    })
+    bits = embeddings.flavor_bits
+
+    mask, allergens = embeddings.recipe_profile(("almonds", "oats"))
+
+    assert mask == bits["nutty"] | bits["sweet"] | bits["mild"]
+    assert allergens == {"tree_nuts", "gluten"}
+
+
+def test_reloading_ingredient_data_resets_cached_profiles():
+    embeddings = _embeddings({"oats": {"flavor_profile": ["mild"], "allergens": []}})
+    embeddings.recipe_profile(("oats",))
+    embeddings.flavor_pair_masks((("sweet", "bitter"),))
+
+    embeddings.ingredient_data = {"oats": {"flavor_profile": ["sweet"], "allergens": ["gluten"]}}
+    embeddings._build_lookup_tables()
+
+    assert embeddings.recipe_profile(("oats",)) == (embeddings.flavor_bits["sweet"], frozenset({"gluten"}))
+    assert embeddings.flavor_pair_masks((("sweet", "bitter"),))[0] == (embeddings.flavor_bits["sweet"], 0,
+                                                                         ("sweet", "bitter"))
@@ -0,0 +1,85 @@
+import pytest
+
+from routes import ingredients, snacks
+
+_ALLERGENS = ("tree_nuts", "peanuts", "coconut", "nutmeg", "milk", "eggs", "honey", "gluten", "soy", "sesame")
+
+
+@pytest.mark.parametrize("restriction", sorted(ingredients._RESTRICTION_ALLERGEN_RULES))
+@pytest.mark.parametrize("allergen", _ALLERGENS)
+def test_ingredient_and_snack_searches_rule_out_the_same_allergens(restriction, allergen):
+    snack_forbids = snacks._DIETARY_RULES[restriction][0]
+    allowed = ingredients._meets_dietary_restrictions_ingredient(frozenset({allergen}), [restriction])
+
+    assert allowed is not snack_forbids(allergen)
+
+
+def test_nut_free_rules_out_any_nut_allergen():
+    assert not ingredients._meets_dietary_restrictions_ingredient(frozenset({"peanuts"}), ["nut_free"])
+    assert not ingredients._meets_dietary_restrictions_ingredient(frozenset({"coconut"}), ["nut_free"])
+    assert ingredients._meets_dietary_restrictions_ingredient(frozenset({"gluten"}), ["nut_free"])
+
+
+@pytest.mark.parametrize("original, substitute, ratio", [
+    ("cocoa_powder", "protein_powder_plant", "1:1 ratio"),
+    ("honey", "maple_syrup", "Use 3/4 amount of maple syrup"),
+    ("dates", "maple_syrup", "Use 1/2 the amount"),
+    ("almonds", "chia_seeds", "Start with 3/4 amount and adjust"),
+])
+def test_substitution_ratio_follows_first_matching_rule(original, substitute, ratio):
+    assert ingredients._get_substitution_ratio(original, substitute) == ratio
+
+
+def test_preparation_notes_match_keywords_anywhere_in_the_name():
+    assert ingredients._get_preparation_notes("mixed_nuts", "sunflower_seeds") == \
+        "Consider soaking seeds for softer texture"
+    assert ingredients._get_preparation_notes("oats", "dates") == \
+        "Monitor texture and adjust other ingredients as needed"
+
+
+_COMPARISON_PROPERTIES = {
+    "health_scores": {"ingredient_a": 50, "ingredient_b": 50},
+    "processing_levels": {"ingredient_a": 1, "ingredient_b": 1},
+}
+_NO_UNIQUE_ALLERGENS = {"unique_to_a": [], "unique_to_b": []}
+
+
+@pytest.mark.parametrize("protein, fiber, winner", [
+    ("higher_in_a", "equal", "a"),
+    ("higher_in_a", "higher_in_a", "a"),
+    ("higher_in_a", "higher_in_b", "tie"),
+    ("higher_in_b", "equal", "b"),
+    ("higher_in_b", "higher_in_a", "tie"),
+    ("equal", "higher_in_a", "a"),
+    ("equal", "higher_in_b", "b"),
+    ("equal", "equal", "tie"),
+])
+def test_comparison_nutrition_winner(protein, fiber, winner):
+    nutrition = {"protein_g": {"comparison": protein}, "fiber_g": {"comparison": fiber}}
+
+    summary = ingredients._generate_comparison_summary(
+        "a", "b", nutrition, _COMPARISON_PROPERTIES, _NO_UNIQUE_ALLERGENS
+    )
+
+    if winner == "tie":
+        assert summary["nutrition"] == "Both a and b offer similar nutritional benefits"
+    else:
+        assert summary["nutrition"] == f"{winner} has better overall nutrition profile"
+
+
+def test_compatibility_recommendations_follow_score_conflicts_allergens_and_category():
+    assert ingredients._generate_compatibility_recommendations(0.8, [], [], {"category": "fruits"}) == [
+        "This ingredient should work well in your recipe"
+    ]
+    assert ingredients._generate_compatibility_recommendations(
+        0.5, [("sweet", "bitter")], ["milk"], {"category": "spices"}
+    ) == [
+        "This ingredient could work but may change the flavor profile",
+        "Be mindful of potential flavor conflicts - start with small amounts",
+        "Note: This will add milk allergen(s) to your recipe",
+        "Use sparingly - a little goes a long way with spices",
+    ]
+    assert ingredients._generate_compatibility_recommendations(0.1, [], [], {"category": "protein"}) == [
+        "Consider if this ingredient fits your desired flavor profile",
+        "This will boost the protein content significantly",
+    ]
@@ -0,0 +1,45 @@
+import asyncio
+
+import pytest
+from fastapi import Depends
+from pydantic import BaseModel
+
+from utils.response_cache import _build_cache_key, cached_response
+
+
+class _Body(BaseModel):
+    name: str
+
+
+def test_cache_key_covers_models_primitives_and_containers():
+    key = _build_cache_key({"body": _Body(name="oats"), "limit": 5, "tags": ["a", "b"], "filters": {"b": 1, "a": 2}})
+
+    assert key == (
+        ("body", '{"name":"oats"}'),
+        ("filters", '{"a": 2, "b": 1}'),
+        ("limit", 5),
+        ("tags", '["a", "b"]'),
+    )
+
+
+def test_cache_key_rejects_unsupported_parameter_types():
+    with pytest.raises(TypeError, match="'service'"):
+        _build_cache_key({"service": object()})
+
+
+def test_cached_endpoint_skips_only_its_dependency_parameters():
+    calls = []
+
+    def get_service():
+        return object()
+
+    @cached_response()
+    async def endpoint(limit: int = 5, service=Depends(get_service)):
+        calls.append(limit)
+        return limit
+
+    asyncio.run(endpoint(limit=5, service=object()))
+    asyncio.run(endpoint(limit=5, service=object()))
+    asyncio.run(endpoint(limit=6, service=object()))
+
+    assert calls == [5, 6]
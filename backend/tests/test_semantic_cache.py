@@ -0,0 +1,107 @@
+import asyncio
+
+import numpy as np
+
+from services.ai_service import AIService
+from utils.semantic_cache import SemanticCache, normalized_text
+
+
+def _unit(*values):
+    vector = np.array(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+class _CountingAIService(AIService):
+    """AI path that records every question reaching the model"""
+
+    def __init__(self):
+        super().__init__(None, nutrition_service=None)
+        self.openai_available = True
+        self.asked = []
+
+    async def _ai_chat(self, message, context):
+        self.asked.append(message)
+        return f"answer {len(self.asked)}"
+
+
+def test_normalized_text_ignores_case_punctuation_and_spacing():
+    assert normalized_text("  What about   PROTEIN? ") == "what about protein"
+
+
+def test_chat_reuses_answer_for_same_question_rephrased_only_in_form():
+    service = _CountingAIService()
+
+    first = asyncio.run(service.chat_about_nutrition("What about protein?"))
+    second = asyncio.run(service.chat_about_nutrition("what about protein"))
+
+    assert first == second
+    assert service.asked == ["What about protein?"]
+
+
+def test_chat_does_not_share_answers_between_a_question_and_its_negation():
+    service = _CountingAIService()
+    question = "I want a snack before my long run tomorrow morning, is sugar good for endurance"
+
+    asyncio.run(service.chat_about_nutrition(question))
+    asyncio.run(service.chat_about_nutrition(question.replace("is sugar", "is sugar not")))
+
+    assert len(service.asked) == 2
+
+
+def test_chat_with_snack_context_is_never_cached():
+    service = _CountingAIService()
+    context = {"name": "Oat bites"}
+
+    asyncio.run(service.chat_about_nutrition("Is this healthy?", context))
+    asyncio.run(service.chat_about_nutrition("Is this healthy?", context))
+
+    assert len(service.asked) == 2
+
+
+def test_health_explanation_cached_on_exact_inputs():
+    service = _CountingAIService()
+    calls = []
+
+    async def explanation(score, nutrition):
+        calls.append(score)
+        return "explained"
+
+    service._ai_health_explanation = explanation
+    data = {"health_score": 70, "nutrition_per_100g": {"protein_g": 15.0}}
+
+    asyncio.run(service.explain_health_score(data))
+    asyncio.run(service.explain_health_score(data))
+    asyncio.run(service.explain_health_score({"health_score": 70, "nutrition_per_100g": {"protein_g": 15.04}}))
+
+    assert len(calls) == 2
+
+
+def test_cache_evicts_least_recently_used():
+    cache = SemanticCache(maxsize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+
+
+def test_vector_match_requires_threshold():
+    cache = SemanticCache(maxsize=4, threshold=0.9)
+    cache.put("a", "first", _unit(1, 0, 0))
+
+    assert cache.get("other", _unit(1, 0.1, 0)) == "first"
+    assert cache.get("other", _unit(1, 1, 0)) is None
+
+
+def test_evicted_vectors_no_longer_match_and_rows_are_reused():
+    cache = SemanticCache(maxsize=2, threshold=0.9)
+    cache.put("a", "first", _unit(1, 0, 0))
+    cache.put("b", "second", _unit(0, 1, 0))
+    cache.put("c", "third", _unit(0, 0, 1))
+
+    assert cache.get("other", _unit(1, 0, 0)) is None
+    assert cache.get("other", _unit(0, 0, 1)) == "third"
+    assert cache._rows_used == 2
@@ -0,0 +1,137 @@
+import random
+
+import numpy as np
+import pytest
+
+from models.similarity import jaccard_scores
+from models.snack_index import SnackIndex, _bitmap
+
+
+def _snack(snack_id, name="Snack", ingredients=(), tags=(), health_score=50, created_date="2026-01-01T00:00:00",
+           **fields):
+    return {
+        "id": snack_id,
+        "name": name,
+        "description": fields.pop("description", ""),
+        "ingredients": [{"name": ingredient, "amount_g": 10} for ingredient in ingredients],
+        "tags": list(tags),
+        "health_score": health_score,
+        "created_date": created_date,
+        "rating_average": 0,
+        "rating_count": 0,
+        **fields,
+    }
+
+
+def _index(*snacks):
+    index = SnackIndex()
+    for snack in snacks:
+        index.add(snack)
+    return index
+
+
+def test_ordered_matches_stable_sort_in_save_order():
+    rng = random.Random(0)
+    snacks = [_snack(f"s{i}", name=rng.choice("abc"), health_score=rng.choice([10, 20, 30])) for i in range(40)]
+    index = _index(*snacks)
+
+    for field, key in (("health_score", "health_score"), ("name", "name")):
+        for descending in (False, True):
+            expected = [snack["id"] for snack in sorted(snacks, key=lambda snack: snack[key], reverse=descending)]
+            assert list(index.ordered(field, descending)) == expected
+            subset = {snack["id"] for snack in snacks[::7]}
+            assert list(index.ordered(field, descending, subset)) == [i for i in expected if i in subset]
+
+
+def test_values_of_the_wrong_type_sort_as_the_field_default():
+    index = _index(_snack("a", health_score=40), _snack("b", health_score=None), _snack("c", name=None))
+
+    assert list(index.ordered("health_score")) == ["b", "a", "c"]
+    assert list(index.ordered("name")) == ["c", "a", "b"]
+
+
+def test_reindexing_an_updated_snack_moves_it_in_every_index():
+    index = _index(
+        _snack("a", ingredients=["oats"], tags=["vegan"], health_score=80),
+        _snack("b", ingredients=["oats"], tags=["quick"], health_score=60),
+    )
+
+    index.add(_snack("a", name="Cocoa bites", ingredients=["cocoa_powder"], tags=["quick"], health_score=40))
+
+    assert index.by_ingredient["oats"] == {"b"}
+    assert index.by_ingredient["cocoa_powder"] == {"a"}
+    assert "vegan" not in index.by_tag
+    assert index.candidates(tags=["quick"]) == {"a", "b"}
+    assert list(index.ordered("health_score")) == ["a", "b"]
+    assert index.text_matches("cocoa") == {"a"}
+    assert index.scalar_matches(min_health_score=50) == {"b"}
+    assert len(index.orders["health_score"]) == 2
+
+
+def test_removed_snacks_leave_no_postings():
+    index = _index(_snack("a", ingredients=["oats"], tags=["vegan"]))
+
+    index.remove("a")
+
+    assert len(index) == 0
+    assert not index.by_ingredient and not index.by_tag
+    assert index.text_matches("snack") == set()
+
+
+def test_candidates_intersect_required_and_drop_excluded():
+    index = _index(
+        _snack("a", ingredients=["oats", "honey"], tags=["sweet"]),
+        _snack("b", ingredients=["oats", "almonds"], tags=["sweet"]),
+        _snack("c", ingredients=["oats"]),
+    )
+
+    assert index.candidates(ingredients=["oats"], tags=["sweet"]) == {"a", "b"}
+    assert index.candidates(ingredients=["oats"], exclude_ingredients=["honey"]) == {"b", "c"}
+    assert index.candidates(exclude_ingredients=["almonds"]) == {"a", "c"}
+    assert index.candidates(ingredients=["dates"]) == set()
+    assert index.candidates() is None
+
+
+def test_text_scan_matches_each_field_but_never_across_fields_or_snacks():
+    index = _index(
+        _snack("a", name="Oat Bites", description="chewy", tags=["quick"]),
+        _snack("b", name="Bars", description="crunchy oat", tags=["vegan"]),
+        _snack("c", name="Balls", description="", tags=["oat-free"]),
+    )
+
+    assert index.text_matches("oat") == {"a", "b", "c"}
+    assert index.text_matches("chewy") == {"a"}
+    assert index.text_matches("bitesche") == set()
+    # The end of one snack's tags runs straight into the next snack's name in the corpus
+    assert index.text_matches("quickbars") == set()
+    assert index.text_matches("oat", snack_ids={"a", "c"}) == {"a", "c"}
+    assert index.text_matches("balls") == {"c"}
+
+
+@pytest.mark.parametrize("use_numba", [False, True])
+def test_bitmap_jaccard_matches_set_jaccard(use_numba):
+    rng = random.Random(1)
+    vocabulary = [f"v{i}" for i in range(150)]
+    sets = [frozenset(rng.sample(vocabulary, rng.randint(0, 12))) for _ in range(30)] + [frozenset()]
+    masks = [sum(1 << int(value[1:]) for value in values) for values in sets]
+    bits = _bitmap(masks, len(vocabulary))
+
+    for row in (0, 5, len(sets) - 1):
+        expected = [len(sets[row] & other) / len(sets[row] | other) if sets[row] | other else 0.0 for other in sets]
+        np.testing.assert_allclose(jaccard_scores(bits, row, use_numba), expected)
+
+
+def test_similar_ranks_by_ingredients_tags_and_health_score():
+    index = _index(
+        _snack("target", ingredients=["oats", "honey", "almonds"], tags=["sweet", "quick"], health_score=70),
+        _snack("close", ingredients=["oats", "honey", "almonds"], tags=["sweet"], health_score=70),
+        _snack("far", ingredients=["cocoa_powder"], tags=["bitter"], health_score=20),
+        _snack("tie_a", ingredients=["oats"], tags=[], health_score=70),
+        _snack("tie_b", ingredients=["oats"], tags=[], health_score=70),
+    )
+
+    similar = index.similar("target", 4)
+
+    assert [snack_id for snack_id, _ in similar] == ["close", "tie_a", "tie_b", "far"]
+    assert similar[0][1] == pytest.approx(0.5 + 0.3 * 0.5 + 0.2)
+    assert similar[-1][1] == pytest.approx(0.2 * 0.5)
@@ -0,0 +1,162 @@
+import pytest
+
+from models.snack_index import SnackIndex
+from routes import snacks
+
+
+@pytest.fixture(autouse=True)
+def empty_store(monkeypatch):
+    """Each test starts from an empty snack store and index"""
+    for name, value in (("snack_database", {}), ("snack_index", SnackIndex()), ("user_favorites", {}),
+                        ("favorited_by", {}), ("snack_ratings", {}), ("rating_sums", {})):
+        monkeypatch.setattr(snacks, name, value)
+    snacks._invalidate_listings()
+    yield
+    snacks._invalidate_listings()
+
+
+def _save_request(name, ingredients=(("oats", 40),), tags=(), user_id="u1"):
+    return {
+        "recipe": {
+            "name": name,
+            "ingredients": [{"name": ingredient, "amount_g": amount} for ingredient, amount in ingredients],
+            "tags": list(tags),
+        },
+        "user_id": user_id,
+    }
+
+
+def _save_batch(client, *requests):
+    response = client.post("/api/snacks/save/batch", json={"snacks": list(requests)})
+    assert response.status_code == 200
+    return [item["snack_id"] for item in response.json()["data"]["saved"]]
+
+
+def _search(client, **criteria):
+    response = client.post("/api/snacks/search", json=criteria)
+    assert response.status_code == 200
+    return {snack["id"] for snack in response.json()["data"]["snacks"]}
+
+
+def test_batch_save_stores_and_indexes_every_snack(client):
+    oat_id, almond_id = _save_batch(
+        client,
+        _save_request("Oat bites", tags=["quick"]),
+        _save_request("Almond bars", ingredients=(("almonds", 30), ("dates", 20)), tags=["quick"]),
+    )
+
+    assert snacks.snack_database[oat_id]["created_date"] == snacks.snack_database[almond_id]["created_date"]
+    assert _search(client, tags=["quick"]) == {oat_id, almond_id}
+    assert _search(client, ingredients=["almonds"]) == {almond_id}
+    assert _search(client, query="bites") == {oat_id}
+
+
+def test_batch_save_with_an_invalid_snack_saves_nothing(client):
+    response = client.post("/api/snacks/save/batch", json={"snacks": [
+        _save_request("Oat bites"),
+        {"recipe": {"name": "No ingredients"}},
+    ]})
+
+    assert response.status_code == 422
+    assert snacks.snack_database == {}
+    assert len(snacks.snack_index) == 0
+
+
+def test_batch_rating_reindexes_each_rated_snack(client):
+    first, second = _save_batch(client, _save_request("First"), _save_request("Second"))
+
+    response = client.post("/api/snacks/rate/batch", json={"ratings": [
+        {"snack_id": second, "rating": 5, "user_id": "a"},
+        {"snack_id": second, "rating": 3, "user_id": "b"},
+        {"snack_id": first, "rating": 2, "user_id": "a"},
+        {"snack_id": second, "rating": 1, "user_id": "a"},
+    ]})
+
+    assert response.status_code == 200
+    assert snacks.snack_database[second]["rating_average"] == 2
+    assert snacks.snack_database[second]["rating_count"] == 2
+    library = client.get("/api/snacks/library", params={"sort_by": "rating", "sort_order": "desc"}).json()
+    assert [snack["id"] for snack in library["data"]["snacks"]] == [first, second]
+
+
+def test_batch_rating_with_an_unknown_snack_applies_nothing(client):
+    (snack_id,) = _save_batch(client, _save_request("Oat bites"))
+
+    response = client.post("/api/snacks/rate/batch", json={"ratings": [
+        {"snack_id": snack_id, "rating": 5, "user_id": "a"},
+        {"snack_id": "missing", "rating": 4, "user_id": "a"},
+    ]})
+
+    assert response.status_code == 404
+    assert snacks.snack_database[snack_id]["rating_count"] == 0
+    assert snacks.snack_ratings == {}
+
+
+def _bulk_update(client, *updates):
+    return client.put("/api/snacks/update/bulk", json={
+        "updates": [{"snack_id": snack_id, "updates": fields} for snack_id, fields in updates]
+    })
+
+
+def test_bulk_update_recalculates_nutrition_and_reindexes(client):
+    first, second = _save_batch(client, _save_request("First"), _save_request("Second"))
+
+    response = _bulk_update(
+        client,
+        (first, {"ingredients": [{"name": "almonds", "amount_g": 30}]}),
+        (second, {"name": "Renamed", "tags": ["quick"]}),
+    )
+
+    assert response.status_code == 200
+    updated = snacks.snack_database[first]
+    assert updated["version"] == 2
+    assert updated["nutrition_analysis"]["total_weight_g"] == 30
+    assert _search(client, ingredients=["almonds"]) == {first}
+    assert _search(client, ingredients=["oats"]) == {second}
+    assert _search(client, tags=["quick"], query="renamed") == {second}
+
+
+def test_bulk_update_with_an_invalid_value_changes_nothing(client):
+    first, second = _save_batch(client, _save_request("First"), _save_request("Second"))
+    before = dict(snacks.snack_database)
+
+    response = _bulk_update(client, (first, {"name": "Renamed"}), (second, {"name": None}))
+
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["loc"] == ["body", "updates", 1, "updates", "name"]
+    assert snacks.snack_database == before
+    assert _search(client, query="renamed") == set()
+
+
+def test_bulk_update_with_an_unknown_snack_changes_nothing(client):
+    (snack_id,) = _save_batch(client, _save_request("First"))
+
+    response = _bulk_update(client, (snack_id, {"name": "Renamed"}), ("missing", {"name": "Other"}))
+
+    assert response.status_code == 404
+    assert snacks.snack_database[snack_id]["name"] == "First"
+
+
+def test_bulk_update_failing_midway_rolls_back_earlier_updates(client, monkeypatch):
+    first, second = _save_batch(client, _save_request("First", tags=["a"]), _save_request("Second"))
+    originals = dict(snacks.snack_database)
+    apply_update = snacks._apply_update
+
+    def failing_apply_update(snack_id, updates, now_iso):
+        if snack_id == second:
+            raise RuntimeError("index failure")
+        return apply_update(snack_id, updates, now_iso)
+
+    monkeypatch.setattr(snacks, "_apply_update", failing_apply_update)
+    response = _bulk_update(
+        client,
+        (first, {"name": "Renamed", "tags": ["b"]}),
+        (first, {"name": "Renamed again"}),
+        (second, {"name": "Other"}),
+    )
+
+    assert response.status_code == 500
+    assert snacks.snack_database == originals
+    assert _search(client, tags=["a"]) == {first}
+    assert _search(client, tags=["b"]) == set()
+    assert _search(client, query="renamed") == set()
@@ -0,0 +1,54 @@
+import pytest
+from starlette.requests import Request
+
+from utils.static_response import StaticJSONResponse, _accepts_gzip, _etag_matches
+
+
+def _request(**headers):
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "path": "/",
+        "headers": [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()],
+    })
+
+
+@pytest.mark.parametrize("header, expected", [
+    ('"abc"', True),
+    ('"xyz", "abc"', True),
+    ('W/"abc"', True),
+    ("*", True),
+    ('"abcd"', False),
+    ('"xabc"', False),
+    ("", False),
+])
+def test_etag_matching(header, expected):
+    assert _etag_matches(header, '"abc"') is expected
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("gzip", True),
+    ("deflate, gzip;q=0.5", True),
+    ("GZIP", True),
+    ("gzip;q=0", False),
+    ("gzip; q=0.0, br", False),
+    ("*", True),
+    ("*;q=0", False),
+    ("gzip;q=0, *", False),
+    ("identity", False),
+    ("", False),
+])
+def test_gzip_acceptance(header, expected):
+    assert _accepts_gzip(header) is expected
+
+
+def test_respond_honours_etag_lists_and_refused_gzip():
+    static = StaticJSONResponse({"value": 1})
+
+    assert static.respond(_request(if_none_match=f'"other", {static.etag}')).status_code == 304
+    assert static.respond(_request(if_none_match=static.etag[:-2] + '"')).status_code == 200
+
+    identity = static.respond(_request(accept_encoding="gzip;q=0, identity"))
+    assert "content-encoding" not in identity.headers
+    assert identity.body == static.body
+    assert static.respond(_request(accept_encoding="br, gzip")).headers["content-encoding"] == "gzip"
@@ -0,0 +1,67 @@
+import functools
+import inspect
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, FrozenSet, Optional, Tuple
+
+from fastapi import params
+from pydantic import BaseModel
+
+
+def _build_cache_key(kwargs: Dict[str, Any], skip: FrozenSet[str] = frozenset()) -> Tuple:
+    """Build a cache key from the request parameters of an endpoint call"""
+    key_parts = []
+    for name in sorted(kwargs):
+        # Dependency-injected services are shared state, not request input
+        if name in skip:
+            continue
+        value = kwargs[name]
+        if isinstance(value, BaseModel):
+            key_parts.append((name, value.model_dump_json()))
+        elif value is None or isinstance(value, (str, int, float, bool)):
+            key_parts.append((name, value))
+        elif isinstance(value, (list, tuple, dict)):
+            key_parts.append((name, json.dumps(value, sort_keys=True)))
+        else:
+            # Leaving an input out of the key would serve one request's response to another
+            raise TypeError(f"Cannot build a cache key from parameter '{name}' of type {type(value).__name__}")
+
+    return tuple(key_parts)
+
+
+def cached_response(expire: Optional[float] = None, maxsize: int = 256) -> Callable:
+    """Cache the response of a deterministic async endpoint keyed on its parameters"""
+
+    def decorator(func: Callable) -> Callable:
+        cache: "OrderedDict[Tuple, Tuple[Optional[float], Any]]" = OrderedDict()
+        dependencies = frozenset(
+            name for name, parameter in inspect.signature(func).parameters.items()
+            if isinstance(parameter.default, params.Depends)
+        )
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            key = _build_cache_key(kwargs, dependencies)
+            now = time.monotonic()
+
+            cached = cache.get(key)
+            if cached is not None:
+                expires_at, response = cached
+                if expires_at is None or expires_at > now:
+                    cache.move_to_end(key)
+                    return response
+                del cache[key]
+
+            response = await func(*args, **kwargs)
+
+            cache[key] = (now + expire if expire is not None else None, response)
+            if len(cache) > maxsize:
+                cache.popitem(last=False)
+
+            return response
+
+        wrapper.cache_clear = cache.clear
+        return wrapper
+
+    return decorator
@@ -0,0 +1,87 @@
+import re
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+import numpy as np
+
+from models.similarity import best_match
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def normalized_text(text: str) -> str:
+    """Lowercased words of a text joined by single spaces, so case, punctuation and spacing don't matter"""
+    return " ".join(_TOKEN_PATTERN.findall(text.lower()))
+
+
+class SemanticCache:
+    """LRU response cache that matches on an exact key first, then, for entries stored with a
+    unit-normalized embedding, on cosine similarity above the threshold. Only use vectors from a
+    model whose threshold has been calibrated so distinct questions never clear it"""
+
+    def __init__(self, maxsize: int = 256, threshold: float = 0.93):
+        self.maxsize = maxsize
+        self.threshold = threshold
+        # key -> (row in the vector matrix or None, response)
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        # Contiguous float32 rows, grown by doubling up to maxsize; only the first _rows_used are scanned
+        self._vectors: Optional[np.ndarray] = None
+        self._rows_used = 0
+        self._row_keys: Dict[int, Hashable] = {}
+        self._free_rows = []
+
+    def get(self, key: Hashable, vector: Optional[np.ndarray] = None) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None and vector is not None and self._row_keys:
+            best, score = best_match(self._vectors[:self._rows_used], vector)
+            if score >= self.threshold and best in self._row_keys:
+                key = self._row_keys[best]
+                entry = self._entries[key]
+
+        if entry is None:
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def put(self, key: Hashable, response: Any, vector: Optional[np.ndarray] = None):
+        if key in self._entries:
+            self._release(key)
+        elif len(self._entries) >= self.maxsize:
+            self._release(next(iter(self._entries)))
+
+        row = None
+        if vector is not None:
+            row = self._allocate_row(len(vector))
+            self._vectors[row] = vector
+            self._row_keys[row] = key
+
+        self._entries[key] = (row, response)
+
+    def clear(self):
+        self._entries.clear()
+        self._row_keys.clear()
+        self._vectors = None
+        self._rows_used = 0
+        self._free_rows = []
+
+    def _allocate_row(self, dims: int) -> int:
+        if self._free_rows:
+            return self._free_rows.pop()
+
+        if self._vectors is None:
+            self._vectors = np.zeros((min(16, self.maxsize), dims), dtype=np.float32)
+        elif self._rows_used == len(self._vectors):
+            grown = np.zeros((min(2 * len(self._vectors), self.maxsize), dims), dtype=np.float32)
+            grown[:self._rows_used] = self._vectors
+            self._vectors = grown
+
+        self._rows_used += 1
+        return self._rows_used - 1
+
+    def _release(self, key: Hashable):
+        row, _ = self._entries.pop(key)
+        if row is not None:
+            # Zeroed rows score 0 and can never clear the threshold
+            self._vectors[row] = 0.0
+            del self._row_keys[row]
+            self._free_rows.append(row)